@@ -1,15 +1,46 @@
 import logging
 
+from . import archive  # noqa
+from . import cache  # noqa
+from . import coalesce  # noqa
+from . import crawler  # noqa
+from . import directory  # noqa
+from . import enrichment  # noqa
+from . import eventlog  # noqa
+from . import export  # noqa
+from . import graph  # noqa
 from . import http_client  # noqa
+from . import ids  # noqa
+from . import mirror  # noqa
+from . import models  # noqa
+from . import outbox  # noqa
+from . import ratelimit  # noqa
+from . import receiver  # noqa
 from . import services  # noqa
+from . import storage  # noqa
 from . import utils  # noqa
 from . import exceptions  # noqa
 
+from .archive import MessageArchive, register_codec  # noqa
+from .cache import CacheInvalidator, TTLCache  # noqa
+from .coalesce import CoalescingSender, merge_messages  # noqa
 from .constants import API_BASE_URL, API_V1  # noqa
-from .exceptions import (SparkClientConfigurationError, SparkRateLimitExceeded, SparkResponseError,  # noqa
+from .crawler import CrawlResult, OrgCrawler  # noqa
+from .directory import PeopleDirectory  # noqa
+from .enrichment import EventEnricher  # noqa
+from .eventlog import EventLog, EventLogConsumer  # noqa
+from .exceptions import (SparkClientConfigurationError, SparkContentDownloadError,  # noqa
+                         SparkRateLimitExceeded, SparkResponseError,
                          SparkResponseNotReceived)  # noqa
+from .graph import MembershipGraph  # noqa
 from .http_client import HTTPClient  # noqa
+from .ids import IdInterner, decode_id, encode_id, parse_id  # noqa
+from .mirror import OrgMirror  # noqa
+from .outbox import Outbox  # noqa
 from .pagination import ResponsePaginator  # noqa
+from .ratelimit import AdaptiveLimiter, RateLimiter  # noqa
+from .receiver import WebhookReceiver  # noqa
+from .storage import ContentStore  # noqa
 from .utils import Credentials, get_access_token, refresh_access_token  # noqa
 from . __version__ import __version__  # noqa
 
@@ -17,12 +48,27 @@ logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 __all__ = (
+    archive.__all__ +  # noqa
+    cache.__all__ +  # noqa
+    coalesce.__all__ +  # noqa
+    crawler.__all__ +  # noqa
+    directory.__all__ +  # noqa
+    enrichment.__all__ +  # noqa
+    eventlog.__all__ +  # noqa
+    graph.__all__ +  # noqa
     http_client.__all__ +  # noqa
+    ids.__all__ +  # noqa
+    mirror.__all__ +  # noqa
+    outbox.__all__ +  # noqa
+    ratelimit.__all__ +  # noqa
+    receiver.__all__ +  # noqa
+    storage.__all__ +  # noqa
     utils.__all__ +  # noqa
     (
         'API_BASE_URL',
         'API_V1',
         'SparkClientConfigurationError',
+        'SparkContentDownloadError',
         'SparkRateLimitExceeded',
         'SparkResponseError',
         'SparkResponseNotReceived',
@@ -36,8 +82,13 @@ __all__ = (
 class APIClient(object):
     http_client_class = http_client.HTTPClient
 
-    def __init__(self, creds, *, loop=None, **kwargs):
-        self.http_client = self.http_client_class(creds, loop=loop)
+    def __init__(self, creds, *, loop=None, intern_ids=False, rate_limiter=None, **kwargs):
+        """
+        :param intern_ids: intern ids of listed items, see `aiociscospark.IdInterner`
+        :param rate_limiter: `aiociscospark.RateLimiter` object that limits rate of requests
+        """
+        http_client_kwargs = {'rate_limiter': rate_limiter} if rate_limiter is not None else {}
+        self.http_client = self.http_client_class(creds, loop=loop, **http_client_kwargs)
 
         self.contents = services.ApiServiceContents(self.http_client)
         self.licenses = services.ApiServiceLicenses(self.http_client)
@@ -51,6 +102,22 @@ class APIClient(object):
         self.teams = services.ApiServiceTeams(self.http_client)
         self.webhooks = services.ApiServiceWebhooks(self.http_client)
 
+        self.id_interner = ids.IdInterner() if intern_ids else None
+        if self.id_interner is not None:
+            for svc in vars(self).values():
+                if isinstance(svc, services.ApiService):
+                    svc.id_interner = self.id_interner
+
+    def enable_cache(self, maxsize=10000, ttl=None,
+                     services=('messages', 'people', 'room_memberships', 'rooms',
+                               'team_memberships', 'teams')):
+        """
+        Enables cache of entities fetched by id for given services.
+        See `ApiService.enable_cache` and `aiociscospark.CacheInvalidator`.
+        """
+        for name in services:
+            getattr(self, name).enable_cache(maxsize=maxsize, ttl=ttl)
+
 
 def get_client(credentials, *, register_response_handlers=True, loop=None, **kwargs):
     client = APIClient(credentials, loop=loop, **kwargs)
@@ -0,0 +1,214 @@
+"""
+Command-line tool for bulk operations.
+
+Usage::
+
+    python -m aiociscospark [--concurrency N] [--page-size N] [--rate N] COMMAND ...
+
+    python -m aiociscospark export people --output people.jsonl
+    python -m aiociscospark archive archive/ --codec xz --attachments contents/
+    python -m aiociscospark broadcast targets.txt --markdown '**Hello**' --checkpoint sent.txt
+    python -m aiociscospark sync-memberships desired.json --dry-run
+
+The access token is read from CISCO_SPARK_ACCESS_TOKEN environment variable unless it is
+passed with --access-token.
+"""
+import argparse
+import asyncio
+import collections
+import inspect
+import json
+import logging
+import os
+import sys
+import time
+
+import aiociscospark
+
+logger = logging.getLogger(__name__)
+
+# Name of exported resource to (service, list method).
+EXPORTS = {
+    'people': ('people', 'list_people'),
+    'rooms': ('rooms', 'list_rooms'),
+    'teams': ('teams', 'list_teams'),
+    'room-memberships': ('room_memberships', 'list_memberships'),
+    'team-memberships': ('team_memberships', 'list_memberships'),
+    'webhooks': ('webhooks', 'list_webhooks'),
+    'licenses': ('licenses', 'list_licenses'),
+    'roles': ('roles', 'list_roles'),
+}
+
+
+def _open_output(path):
+    return sys.stdout if path in (None, '-') else open(path, 'w')
+
+
+def _read_lines(path):
+    f = sys.stdin if path == '-' else open(path)
+    with f:
+        return [line.strip() for line in f if line.strip()]
+
+
+async def export(client, args, stats):
+    service, method = EXPORTS[args.resource]
+    items = getattr(getattr(client, service), method)(limit=args.page_size)
+    output = _open_output(args.output)
+    try:
+        async for item, _ in items:
+            output.write(json.dumps(item) + '\n')
+            stats['exported'] += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+async def archive(client, args, stats):
+    store = aiociscospark.ContentStore(args.attachments) if args.attachments else None
+    message_archive = aiociscospark.MessageArchive(client, args.root, codec=args.codec,
+                                                   concurrency=args.concurrency, store=store)
+    report = await message_archive.archive(args.room or None, limit=args.page_size)
+    stats['rooms'] += len(report['archived'])
+    stats['archived'] += sum(report['archived'].values())
+    stats['failed'] += len(report['failed'])
+    for room_id, error in report['failed'].items():
+        logger.error('Failed to archive room %s: %s', room_id, error)
+
+
+async def broadcast(client, args, stats):
+    targets = _read_lines(args.targets)
+    sent = set()
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        sent.update(_read_lines(args.checkpoint))
+    stats['skipped'] += sum(1 for target in targets if target in sent)
+    targets = [target for target in targets if target not in sent]
+    checkpoint = open(args.checkpoint, 'a') if args.checkpoint else None
+    try:
+        async for result in client.messages.broadcast(
+                targets, text=args.text, markdown=args.markdown, concurrency=args.concurrency,
+                stats=stats):
+            if result['error'] is not None:
+                logger.error('Failed to send message to %s: %s', result['target'],
+                             result['error'])
+            elif checkpoint is not None:
+                checkpoint.write(result['target'] + '\n')
+                checkpoint.flush()
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+
+async def sync_memberships(client, args, stats):
+    with open(args.desired) as f:
+        desired = json.load(f)
+    service = client.team_memberships if args.teams else client.room_memberships
+    reports = await service.reconcile_memberships(desired, prune=not args.no_prune,
+                                                  dry_run=args.dry_run,
+                                                  concurrency=args.concurrency)
+    for parent_id, report in reports.items():
+        stats['created'] += len(report['created'])
+        stats['deleted'] += len(report['deleted'])
+        stats['failed'] += len(report['failed'])
+        for action, item, error in report['failed']:
+            logger.error('Failed to %s membership of %s: %s', action, parent_id, error)
+    if args.dry_run:
+        json.dump(reports, sys.stdout, indent=2, default=str)
+        sys.stdout.write('\n')
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='python -m aiociscospark',
+                                     description='Bulk operations on Cisco Spark API.')
+    parser.add_argument('--access-token', help='access token, CISCO_SPARK_ACCESS_TOKEN '
+                                               'environment variable by default')
+    parser.add_argument('--concurrency', type=int, default=10,
+                        help='maximum number of concurrent requests (default: %(default)s)')
+    parser.add_argument('--page-size', type=int, default=None,
+                        help='number of items per page of list requests')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='maximum number of requests per second')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    export_parser = subparsers.add_parser('export', help='export items as JSON lines')
+    export_parser.add_argument('resource', choices=sorted(EXPORTS))
+    export_parser.add_argument('--output', '-o', help='output file, stdout by default')
+    export_parser.set_defaults(func=export)
+
+    archive_parser = subparsers.add_parser('archive', help='archive messages of rooms')
+    archive_parser.add_argument('root', help='archive directory, checkpoints are kept there')
+    archive_parser.add_argument('--room', action='append',
+                                help='id of room to archive (all rooms by default)')
+    archive_parser.add_argument('--codec', default='gzip',
+                                choices=sorted(aiociscospark.archive.CODECS),
+                                help='compression codec (default: %(default)s)')
+    archive_parser.add_argument('--attachments', help='directory to download attachments to')
+    archive_parser.set_defaults(func=archive)
+
+    broadcast_parser = subparsers.add_parser('broadcast',
+                                             help='send a message to many rooms or people')
+    broadcast_parser.add_argument('targets', help='file with room ids, person ids or emails, '
+                                                  'one per line ("-" for stdin)')
+    message_group = broadcast_parser.add_mutually_exclusive_group(required=True)
+    message_group.add_argument('--text')
+    message_group.add_argument('--markdown')
+    broadcast_parser.add_argument('--checkpoint',
+                                  help='file of targets the message was sent to, they are '
+                                       'skipped when the command is run again')
+    broadcast_parser.set_defaults(func=broadcast)
+
+    sync_parser = subparsers.add_parser('sync-memberships',
+                                        help='make members of rooms match desired people')
+    sync_parser.add_argument('desired', help='JSON file that maps room ids to lists of emails '
+                                             'or person ids')
+    sync_parser.add_argument('--teams', action='store_true',
+                             help='ids in the file are ids of teams')
+    sync_parser.add_argument('--no-prune', action='store_true',
+                             help='do not remove members who are not desired')
+    sync_parser.add_argument('--dry-run', action='store_true',
+                             help='print changes instead of applying them')
+    sync_parser.set_defaults(func=sync_memberships)
+    return parser
+
+
+def print_stats(stats, elapsed, file=sys.stderr):
+    stats.pop('elapsed', None)
+    for name, value in sorted(stats.items()):
+        print(f'{name}: {value} ({value / elapsed:.1f}/s)' if elapsed else f'{name}: {value}',
+              file=file)
+    print(f'elapsed: {elapsed:.1f}s', file=file)
+
+
+async def run(args, loop=None):
+    credentials = aiociscospark.Credentials()
+    if args.access_token:
+        credentials = {'access_token': args.access_token}
+    rate_limiter = aiociscospark.RateLimiter(args.rate) if args.rate else None
+    client = aiociscospark.get_client(credentials, loop=loop, rate_limiter=rate_limiter)
+    stats = collections.Counter()
+    started_at = time.monotonic()
+    try:
+        await args.func(client, args, stats)
+    finally:
+        closed = client.http_client.close_session()
+        if inspect.isawaitable(closed):
+            await closed
+        print_stats(stats, time.monotonic() - started_at)
+    return stats
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    loop = asyncio.get_event_loop()
+    try:
+        stats = loop.run_until_complete(run(args, loop=loop))
+    except aiociscospark.SparkClientConfigurationError as e:
+        parser.error(str(e))
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
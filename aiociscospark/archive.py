@@ -0,0 +1,200 @@
+import asyncio
+import bz2
+import gzip
+import json
+import logging
+import lzma
+import os
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'MessageArchive',
+    'register_codec',
+)
+
+# Name of codec to (function that opens a file like `gzip.open(path, mode)`, file extension).
+# Codecs must allow appending to a file, i.e. a concatenation of compressed streams must be
+# a valid compressed stream.
+CODECS = {
+    'none': (open, ''),
+    'gzip': (gzip.open, '.gz'),
+    'bz2': (bz2.open, '.bz2'),
+    'xz': (lzma.open, '.xz'),
+}
+
+
+def register_codec(name, open_func, extension):
+    """
+    Registers compression codec that can be used by `MessageArchive`, e.g.::
+
+        register_codec('zstd', functools.partial(zstandard.open, read_across_frames=True),
+                       '.zst')
+
+    :param name: name of the codec
+    :param open_func: function that takes a path and a mode ("ab" or "rb") and returns
+    a file object
+    :param extension: extension of archive files, e.g. ".gz"
+    """
+    CODECS[name] = (open_func, extension)
+
+
+class MessageArchive(object):
+    """
+    Resumable archive of messages of rooms, stored as compressed JSON lines.
+
+    Messages of each room are written to "<root>/rooms/<room id>.jsonl<extension>" newest
+    first, in batches. Every batch is encoded, compressed and appended in an executor, so the
+    event loop is not blocked, and then the checkpoint of the room ("<root>/checkpoints/<room
+    id>.json") records the oldest archived message and the size of the file. An interrupted
+    archive continues from the checkpoint: data written after it is truncated and listing
+    starts before the oldest archived message. Rooms are archived concurrently.
+
+    Files attached to messages are downloaded to `aiociscospark.ContentStore` if `store` is set.
+
+    Usage::
+
+        archive = MessageArchive(client, 'archive', codec='gzip', concurrency=8)
+        report = await archive.archive()
+    """
+    batch_size = 1000
+
+    def __init__(self, client, root, codec='gzip', concurrency=4, store=None, executor=None):
+        """
+        :param client: `aiociscospark.APIClient` object
+        :param root: path of the archive directory
+        :param codec: name of compression codec, see `register_codec`
+        :param concurrency: maximum number of rooms archived concurrently
+        :param store: `aiociscospark.ContentStore` object to download attachments to
+        :param executor: `concurrent.futures.Executor` object used for writing, the default
+        executor of the event loop by default
+        """
+        if codec not in CODECS:
+            raise ValueError(f'Unknown codec: {codec}')
+        self.client = client
+        self.root = root
+        self.codec = codec
+        self.concurrency = concurrency
+        self.store = store
+        self.executor = executor
+        self._open, self._extension = CODECS[codec]
+        os.makedirs(os.path.join(root, 'rooms'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'checkpoints'), exist_ok=True)
+
+    def get_path(self, room_id):
+        return os.path.join(self.root, 'rooms', f'{room_id}.jsonl{self._extension}')
+
+    def _get_checkpoint_path(self, room_id):
+        return os.path.join(self.root, 'checkpoints', f'{room_id}.json')
+
+    def get_checkpoint(self, room_id):
+        """
+        :return: dict with keys "before_message" (id of the oldest archived message), "size"
+        (size of the archive file), "count" (number of archived messages) and "done", or `None`
+        if the room was not archived
+        """
+        path = self._get_checkpoint_path(room_id)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_checkpoint(self, room_id, checkpoint):
+        path = self._get_checkpoint_path(room_id)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+
+    def _write_batch(self, path, messages, size):
+        # Drops data written after the last checkpoint.
+        if os.path.exists(path) and os.path.getsize(path) != size:
+            with open(path, 'r+b') as f:
+                f.truncate(size)
+        data = ''.join(json.dumps(message) + '\n' for message in messages).encode()
+        with self._open(path, 'ab') as f:
+            f.write(data)
+        return os.path.getsize(path)
+
+    def iter_messages(self, room_id):
+        """
+        Reads archived messages of the room, newest first.
+        """
+        path = self.get_path(room_id)
+        if not os.path.exists(path):
+            return
+        with self._open(path, 'rb') as f:
+            for line in f:
+                yield json.loads(line)
+
+    async def archive_room(self, room_id, **kwargs):
+        """
+        Archives messages of the room, continues from the checkpoint if there is one.
+
+        :return: number of messages archived by this call
+        """
+        checkpoint = self.get_checkpoint(room_id) or {
+            'before_message': None, 'size': 0, 'count': 0, 'done': False}
+        if checkpoint['done']:
+            logger.debug('Room %s is already archived', room_id)
+            return 0
+        path = self.get_path(room_id)
+        loop = asyncio.get_event_loop()
+        archived = 0
+
+        async def write(batch):
+            nonlocal archived
+            if self.store is not None:
+                manifest = await self.client.contents.download_attachments(batch, self.store)
+                for paths in manifest.values():
+                    # The batch is archived again, without downloaded files, on the next run.
+                    errors = [path for path in paths if isinstance(path, BaseException)]
+                    if errors:
+                        raise errors[0]
+            checkpoint['size'] = await loop.run_in_executor(
+                self.executor, self._write_batch, path, batch, checkpoint['size'])
+            checkpoint['before_message'] = batch[-1]['id']
+            checkpoint['count'] += len(batch)
+            self._save_checkpoint(room_id, checkpoint)
+            archived += len(batch)
+
+        messages = self.client.messages.list_messages(
+            room_id, before_message=checkpoint['before_message'], **kwargs)
+        batch = []
+        async for message, _ in messages:
+            batch.append(message)
+            if len(batch) >= self.batch_size:
+                await write(batch)
+                batch = []
+        if batch:
+            await write(batch)
+        checkpoint['done'] = True
+        self._save_checkpoint(room_id, checkpoint)
+        logger.debug('Archived %s messages of room %s', archived, room_id)
+        return archived
+
+    async def archive(self, room_ids=None, **kwargs):
+        """
+        Archives rooms (all rooms by default) concurrently, failures do not stop other rooms.
+
+        :return: dict with "archived" dict of room id to number of archived messages and
+        "failed" dict of room id to exception
+        """
+        if room_ids is None:
+            room_ids = [room['id'] async for room, _ in self.client.rooms.list_rooms()]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def archive_room(room_id):
+            async with semaphore:
+                return await self.archive_room(room_id, **kwargs)
+
+        results = await asyncio.gather(*[archive_room(room_id) for room_id in room_ids],
+                                       return_exceptions=True)
+        report = {'archived': {}, 'failed': {}}
+        for room_id, result in zip(room_ids, results):
+            if isinstance(result, Exception):
+                logger.warning('Failed to archive room %s: %s', room_id, result)
+                report['failed'][room_id] = result
+            else:
+                report['archived'][room_id] = result
+        return report
@@ -0,0 +1,129 @@
+import logging
+import time
+
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'CacheInvalidator',
+    'TTLCache',
+)
+
+_missing = object()
+
+
+class TTLCache(object):
+    """
+    A simple LRU cache with optional expiration of entries.
+
+    When the cache is full the least recently used entry is evicted.
+    """
+    def __init__(self, maxsize=1024, ttl=None, timer=time.monotonic):
+        """
+        :param maxsize: maximum number of entries, `None` means unbounded
+        :param ttl: default time to live of entries in seconds, `None` means never expire
+        :param timer: function that returns current time in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            expires_at, value = self._data[key]
+        except KeyError:
+            return default
+        if expires_at is not None and expires_at <= self._timer():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self._timer() + ttl if ttl is not None else None
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        value = self.get(key, _missing)
+        self._data.pop(key, None)
+        return default if value is _missing else value
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def __getitem__(self, key):
+        value = self.get(key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheInvalidator(object):
+    """
+    Keeps entity caches of the client (see `ApiService.enable_cache`) fresh using webhook
+    events, so caches may use long TTLs without periodic revalidation.
+
+    - rooms and memberships: cached entities are replaced by the event data
+    - messages: deleted messages are evicted, the room of a new message is evicted because
+      its "lastActivity" has changed
+    - deleted entities of any resource are evicted
+
+    Usage::
+
+        client.enable_cache(ttl=3600)
+        receiver.add_handler(CacheInvalidator(client).handle)
+    """
+    services = {
+        'memberships': 'room_memberships',
+        'messages': 'messages',
+        'rooms': 'rooms',
+    }
+    # Resources which webhook events contain full representation of entities.
+    full_resources = ('memberships', 'rooms')
+
+    def __init__(self, client):
+        self.client = client
+
+    def _get_cache(self, resource):
+        svc = getattr(self.client, self.services.get(resource, ''), None)
+        return getattr(svc, 'cache', None)
+
+    def handle(self, event):
+        resource = event.get('resource')
+        event_type = event.get('event') or event.get('type')
+        data = event.get('data') or {}
+        entity_id = data.get('id')
+
+        cache = self._get_cache(resource)
+        if cache is not None and entity_id:
+            if event_type == 'deleted':
+                logger.debug('Evicting deleted %s entity: %s', resource, entity_id)
+                cache.pop(entity_id)
+            elif resource in self.full_resources:
+                if entity_id in cache:
+                    cache[entity_id] = dict(data)
+            else:
+                cache.pop(entity_id)
+
+        rooms_cache = self._get_cache('rooms')
+        if resource == 'messages' and rooms_cache is not None and data.get('roomId'):
+            rooms_cache.pop(data['roomId'])
@@ -0,0 +1,146 @@
+import asyncio
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'CoalescingSender',
+    'merge_messages',
+)
+
+
+def merge_messages(messages):
+    """
+    Default merge function of `CoalescingSender`: joins texts (or markdowns, if any message has
+    markdown) of the messages.
+
+    :param messages: list of dictionaries with keys "text" and "markdown"
+    :return: dictionary of `create_message` parameters
+    """
+    if any(message.get('markdown') for message in messages):
+        return {'markdown': '\n\n'.join(message.get('markdown') or message.get('text') or ''
+                                        for message in messages)}
+    return {'text': '\n'.join(message.get('text') or '' for message in messages)}
+
+
+class CoalescingSender(object):
+    """
+    Buffers messages sent to the same target (room, person id or email) and sends them as one
+    message, so bursts of small notifications take a few API requests instead of many.
+
+    Buffered messages of a target are merged and sent `window` seconds after the first of them
+    was buffered, or at once when there are `max_messages` messages or the merged message would
+    be longer than `max_length` characters. `close` sends all buffered messages. Failures are
+    logged, callers that need the created message pass `return_future=True`.
+
+    Usage::
+
+        sender = CoalescingSender(client, window=5)
+        sender.send(room_id=room_id, markdown='**CPU** is above 90%')
+        ...
+        message = await sender.send(room_id=room_id, text='Deployed', return_future=True)
+        await sender.close()
+    """
+    max_length = 7000
+    # Length of the separator that `merge` puts between messages ("\n\n" of `merge_messages`).
+    separator_length = 2
+
+    def __init__(self, client, window=5, max_messages=20, merge=merge_messages):
+        """
+        :param client: `aiociscospark.APIClient` object
+        :param window: how long messages are buffered, in seconds
+        :param max_messages: maximum number of messages merged into one
+        :param merge: function that takes a list of messages (dictionaries with keys "text" and
+        "markdown") and returns a dictionary of `create_message` parameters
+        """
+        self.client = client
+        self.window = window
+        self.max_messages = max_messages
+        self.merge = merge
+        self.stats = collections.Counter()
+        self._buffers = {}
+        self._tasks = set()
+
+    def send(self, room_id=None, to_person_id=None, to_person_email=None, text=None,
+             markdown=None, return_future=False):
+        """
+        Buffers the message.
+
+        :param return_future: whether to return a future of the result
+        :return: `asyncio.Future` object resolved with the created (merged) message if
+        `return_future` is True, otherwise `None`
+        """
+        key = (room_id, to_person_id, to_person_email)
+        message = {'text': text, 'markdown': markdown}
+        length = len(markdown or text or '')
+        buffer = self._buffers.get(key)
+        if buffer is not None and (
+                buffer['length'] + self.separator_length + length > self.max_length):
+            self.flush(key)
+            buffer = None
+        if buffer is None:
+            loop = asyncio.get_event_loop()
+            buffer = self._buffers[key] = {
+                'messages': [],
+                'futures': [],
+                'length': 0,
+                'timer': loop.call_later(self.window, self.flush, key),
+            }
+        future = None
+        if return_future:
+            future = asyncio.get_event_loop().create_future()
+            buffer['futures'].append(future)
+        if buffer['messages']:
+            buffer['length'] += self.separator_length
+        buffer['messages'].append(message)
+        buffer['length'] += length
+        self.stats['received'] += 1
+        if len(buffer['messages']) >= self.max_messages:
+            self.flush(key)
+        return future
+
+    def flush(self, key=None):
+        """
+        Sends buffered messages of the target (of all targets by default) in background.
+
+        :param key: tuple of (room_id, to_person_id, to_person_email)
+        """
+        keys = list(self._buffers) if key is None else [key]
+        for key in keys:
+            buffer = self._buffers.pop(key, None)
+            if buffer is None:
+                continue
+            buffer['timer'].cancel()
+            task = asyncio.ensure_future(self._send(key, buffer))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, key, buffer):
+        room_id, to_person_id, to_person_email = key
+        params = self.merge(buffer['messages'])
+        try:
+            message = await self.client.messages.create_message(
+                room_id=room_id, to_person_id=to_person_id, to_person_email=to_person_email,
+                **params
+            )
+        except Exception as e:
+            logger.error('Failed to send %s messages to %s: %s', len(buffer['messages']),
+                         key, e)
+            self.stats['failed'] += len(buffer['messages'])
+            for future in buffer['futures']:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            self.stats['sent'] += 1
+            for future in buffer['futures']:
+                if not future.done():
+                    future.set_result(message)
+
+    async def close(self):
+        """
+        Sends all buffered messages and waits until they are sent.
+        """
+        self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
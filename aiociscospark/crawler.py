@@ -0,0 +1,147 @@
+import asyncio
+import collections
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'CrawlResult',
+    'OrgCrawler',
+)
+
+LEVELS = ('teams', 'rooms', 'memberships')
+
+CrawlResult = collections.namedtuple('CrawlResult', ['level', 'parent_id', 'item'])
+
+
+class OrgCrawler(object):
+    """
+    Crawler of teams, rooms of every team and memberships of every room.
+
+    The concurrency budget is split between levels of the hierarchy by `shares`, so listing of
+    teams and rooms can not take all request slots from listing of memberships and the other
+    way round. Children of an item are crawled as soon as the item is listed and results are
+    streamed as they arrive; at most `max_queued_results` results wait for the consumer, when
+    it is slower listings are paused.
+
+    If `checkpoint` is set, listings that completed are appended to the checkpoint file (JSON
+    lines) with ids of listed items. An interrupted crawl started with the same checkpoint
+    does not list them again and descends to their children, so only unfinished listings are
+    repeated (and their items are produced again).
+
+    Usage::
+
+        crawler = OrgCrawler(client, concurrency=20, checkpoint='crawl.jsonl')
+        async for level, parent_id, item in crawler.crawl():
+            ...
+    """
+    max_queued_results = 1000
+
+    def __init__(self, client, concurrency=12, shares=(1, 2, 3), max_depth=3, checkpoint=None):
+        """
+        :param client: `aiociscospark.APIClient` object
+        :param concurrency: maximum number of concurrent API requests
+        :param shares: shares of the concurrency budget of levels (teams, rooms, memberships)
+        :param max_depth: number of crawled levels: 1 - teams, 2 - teams and rooms, 3 - teams,
+        rooms and memberships
+        :param checkpoint: path of the checkpoint file
+        """
+        if not 1 <= max_depth <= len(LEVELS):
+            raise ValueError(f'max_depth must be between 1 and {len(LEVELS)}')
+        self.client = client
+        self.max_depth = max_depth
+        shares = shares[:max_depth]
+        self.limits = [max(1, concurrency * share // sum(shares)) for share in shares]
+        self.checkpoint = checkpoint
+        self.stats = collections.Counter()
+        self.errors = []
+        self._done = self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        done = {}
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return done
+        with open(self.checkpoint) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line may be incomplete if the crawl was interrupted.
+                    continue
+                done[record['node']] = record['children']
+        logger.debug('Loaded %s completed listings from checkpoint', len(done))
+        return done
+
+    def _save_node(self, node, children):
+        self._done[node] = children
+        if self.checkpoint is not None:
+            with open(self.checkpoint, 'a') as f:
+                f.write(json.dumps({'node': node, 'children': children}) + '\n')
+
+    def _list(self, level, parent_id, **kwargs):
+        if level == 0:
+            return self.client.teams.list_teams(**kwargs)
+        if level == 1:
+            return self.client.rooms.list_rooms(team_id=parent_id, **kwargs)
+        return self.client.room_memberships.list_memberships(room_id=parent_id, **kwargs)
+
+    async def crawl(self, **kwargs):
+        """
+        Crawls the hierarchy.
+
+        :return: async_generator object that produces `CrawlResult` tuples of (level name,
+        parent id, item); failed listings are collected to `errors` as (level name, parent id,
+        exception) triples
+        """
+        semaphores = [asyncio.Semaphore(limit) for limit in self.limits]
+        results = asyncio.Queue(self.max_queued_results)
+        finished = object()
+        tasks = set()
+        pending = 0
+
+        def visit(level, parent_id):
+            nonlocal pending
+            pending += 1
+            task = asyncio.ensure_future(crawl_node(level, parent_id))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        async def crawl_node(level, parent_id):
+            nonlocal pending
+            node = f'{LEVELS[level]}:{parent_id or ""}'
+            try:
+                children = self._done.get(node)
+                if children is None:
+                    children = []
+                    async with semaphores[level]:
+                        async for item, _ in self._list(level, parent_id, **kwargs):
+                            self.stats[LEVELS[level]] += 1
+                            await results.put(CrawlResult(LEVELS[level], parent_id, item))
+                            children.append(item['id'])
+                            if level + 1 < self.max_depth:
+                                visit(level + 1, item['id'])
+                    self._save_node(node, children)
+                elif level + 1 < self.max_depth:
+                    for child_id in children:
+                        visit(level + 1, child_id)
+            except Exception as e:
+                logger.warning('Failed to list %s of %s: %s', LEVELS[level], parent_id, e)
+                self.errors.append((LEVELS[level], parent_id, e))
+            finally:
+                pending -= 1
+                if not pending:
+                    await results.put(finished)
+
+        visit(0, None)
+        try:
+            while True:
+                result = await results.get()
+                if result is finished:
+                    break
+                yield result
+        finally:
+            for task in list(tasks):
+                task.cancel()
+        logger.debug('Crawled %s', dict(self.stats))
@@ -0,0 +1,196 @@
+import asyncio
+import bisect
+import logging
+
+from .cache import TTLCache
+from .exceptions import SparkResponseError
+from .models import Person
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'PeopleDirectory',
+)
+
+
+class PeopleDirectory(object):
+    """
+    In-memory directory of people built from `list_people`.
+
+    People are stored as compact `aiociscospark.models.Person` records indexed by id, by every
+    email and by lowercase display name (sorted, for prefix search), so lookups do not need
+    API requests. `get_person` and `find_person` fall back to the API on miss; emails that
+    are not found are remembered for `negative_ttl` seconds.
+
+    Usage::
+
+        directory = PeopleDirectory(client)
+        await directory.build()
+        directory.start_refresh(interval=3600)
+        person = await directory.find_person('user@example.com')
+    """
+    def __init__(self, client, negative_ttl=300):
+        """
+        :param client: `aiociscospark.APIClient` object
+        :param negative_ttl: how long emails and ids missing in the API are not looked up again
+        """
+        self.client = client
+        self._by_id = {}
+        self._by_email = {}
+        self._names = []
+        self._missing = TTLCache(maxsize=10000, ttl=negative_ttl)
+        self._refresh_task = None
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, person_id):
+        return person_id in self._by_id
+
+    @staticmethod
+    def _name_key(person):
+        return ((person.display_name or '').lower(), person.id)
+
+    def add(self, person):
+        """
+        Adds or replaces person (dict or `Person`) in the directory.
+        """
+        if not isinstance(person, Person):
+            person = Person(person)
+        old = self._by_id.get(person.id)
+        if old is not None:
+            self._remove_from_indexes(old)
+        self._by_id[person.id] = person
+        for email in person.emails or ():
+            self._by_email[email.lower()] = person
+        bisect.insort(self._names, self._name_key(person))
+        return person
+
+    def remove(self, person_id):
+        person = self._by_id.pop(person_id, None)
+        if person is not None:
+            self._remove_from_indexes(person)
+
+    def _remove_from_indexes(self, person):
+        for email in person.emails or ():
+            if self._by_email.get(email.lower()) is person:
+                del self._by_email[email.lower()]
+        key = self._name_key(person)
+        index = bisect.bisect_left(self._names, key)
+        if index < len(self._names) and self._names[index] == key:
+            del self._names[index]
+
+    def _replace(self, people):
+        by_id = {}
+        by_email = {}
+        for person in people:
+            by_id[person.id] = person
+            for email in person.emails or ():
+                by_email[email.lower()] = person
+        self._by_id = by_id
+        self._by_email = by_email
+        self._names = sorted(self._name_key(person) for person in by_id.values())
+
+    async def build(self, **kwargs):
+        """
+        Crawls all people of the organization, replaces the content of the directory.
+        """
+        people = [person async for person, _ in
+                  self.client.people.list_people(model=True, **kwargs)]
+        self._replace(people)
+        logger.debug('People directory is built: %s people', len(people))
+
+    async def refresh(self, **kwargs):
+        """
+        Re-crawls people and applies the changes: new and changed people are indexed, people
+        that are not listed anymore are removed.
+        """
+        listed = {}
+        async for person, _ in self.client.people.list_people(model=True, **kwargs):
+            listed[person.id] = person
+        added = changed = 0
+        for person_id, person in listed.items():
+            current = self._by_id.get(person_id)
+            if current is None:
+                added += 1
+                self.add(person)
+            elif current != person:
+                changed += 1
+                self.add(person)
+        removed = [person_id for person_id in self._by_id if person_id not in listed]
+        for person_id in removed:
+            self.remove(person_id)
+        logger.debug('People directory is refreshed: %s added, %s changed, %s removed',
+                     added, changed, len(removed))
+        return {'added': added, 'changed': changed, 'removed': len(removed)}
+
+    def start_refresh(self, interval=3600, **kwargs):
+        """
+        Starts refreshing the directory every `interval` seconds in background.
+        """
+        async def refresh_periodically():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.refresh(**kwargs)
+                except Exception:
+                    logger.exception('Failed to refresh people directory')
+
+        self.stop_refresh()
+        self._refresh_task = asyncio.ensure_future(refresh_periodically())
+        return self._refresh_task
+
+    def stop_refresh(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    # Local lookups
+
+    def get(self, person_id):
+        return self._by_id.get(person_id)
+
+    def get_by_email(self, email):
+        return self._by_email.get(email.lower())
+
+    def search(self, prefix, limit=None):
+        """
+        Returns people whose display names start with the prefix (case insensitive), sorted
+        by display name.
+        """
+        prefix = prefix.lower()
+        index = bisect.bisect_left(self._names, (prefix,))
+        found = []
+        while index < len(self._names) and (limit is None or len(found) < limit):
+            name, person_id = self._names[index]
+            if not name.startswith(prefix):
+                break
+            found.append(self._by_id[person_id])
+            index += 1
+        return found
+
+    # Lookups with fallback to the API
+
+    async def get_person(self, person_id, **kwargs):
+        person = self._by_id.get(person_id)
+        if person is not None or person_id in self._missing:
+            return person
+        try:
+            data = await self.client.people.get_person(person_id, **kwargs)
+        except SparkResponseError as e:
+            if e.status != 404:
+                raise
+            self._missing[person_id] = True
+            return None
+        return self.add(data)
+
+    async def find_person(self, email, **kwargs):
+        key = email.lower()
+        person = self._by_email.get(key)
+        if person is not None or key in self._missing:
+            return person
+        found = [data async for data, _ in self.client.people.list_people(email=email, **kwargs)]
+        if not found:
+            self._missing[key] = True
+            return None
+        return self.add(found[0])
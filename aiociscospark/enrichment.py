@@ -0,0 +1,99 @@
+import asyncio
+import logging
+
+from .exceptions import SparkResponseError
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'EventEnricher',
+)
+
+
+class EventEnricher(object):
+    """
+    Resolves ids referenced by webhook events to the full API objects.
+
+    Used by `aiociscospark.WebhookReceiver` to enrich events that arrive within `window`
+    seconds in one go: referenced ids are deduplicated across events, messages and rooms are
+    fetched concurrently and people are fetched in batches with a single list request.
+    Resolved objects are attached to events as `event['resolved']`, e.g.
+    {'message': {...}, 'room': {...}, 'person': {...}}. An object that can not be fetched
+    (e.g. message was deleted) is resolved to `None`.
+    """
+    def __init__(self, client, window=0.05, max_batch=100, concurrency=10):
+        """
+        :param client: `aiociscospark.APIClient` object
+        :param window: how long to wait for more events before enriching a batch, in seconds
+        :param max_batch: maximum number of events enriched at once
+        :param concurrency: maximum number of concurrent API requests
+        """
+        self.client = client
+        self.window = window
+        self.max_batch = max_batch
+        self.concurrency = concurrency
+
+    @staticmethod
+    def get_references(event):
+        """
+        Returns a list of (name, kind, id) triples of objects referenced by the event.
+        """
+        data = event.get('data') or {}
+        resource = event.get('resource')
+        event_type = event.get('event') or event.get('type')
+        references = []
+        if resource == 'messages' and event_type != 'deleted':
+            references.append(('message', 'messages', data.get('id')))
+        if resource == 'rooms':
+            references.append(('room', 'rooms', data.get('id')))
+        else:
+            references.append(('room', 'rooms', data.get('roomId')))
+        references.append(('person', 'people', data.get('personId')))
+        return [reference for reference in references if reference[2]]
+
+    async def enrich(self, events):
+        wanted = {'messages': set(), 'people': set(), 'rooms': set()}
+        references = [self.get_references(event) for event in events]
+        for event_references in references:
+            for _, kind, _id in event_references:
+                wanted[kind].add(_id)
+        resolved = await self.resolve(wanted)
+        for event, event_references in zip(events, references):
+            event['resolved'] = {name: resolved[kind].get(_id)
+                                 for name, kind, _id in event_references}
+        return events
+
+    async def resolve(self, wanted):
+        """
+        Fetches objects by ids.
+
+        :param wanted: dict that maps kinds ("messages", "people", "rooms") to sets of ids
+        :return: dict that maps kinds to dicts of fetched objects by ids
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        resolved = {kind: {} for kind in wanted}
+
+        async def fetch_one(kind, func, _id):
+            async with semaphore:
+                try:
+                    resolved[kind][_id] = await func(_id)
+                except SparkResponseError as e:
+                    logger.warning('Failed to fetch %s %s: %s', kind, _id, e)
+
+        async def fetch_people(person_ids):
+            async with semaphore:
+                try:
+                    async for person, _ in self.client.people.list_people_by_ids(person_ids):
+                        resolved['people'][person['id']] = person
+                except SparkResponseError as e:
+                    logger.warning('Failed to fetch %s people: %s', len(person_ids), e)
+
+        people = sorted(wanted.get('people', ()))
+        batch_size = self.client.people.max_ids_per_request
+        coros = [fetch_people(people[i:i + batch_size]) for i in range(0, len(people), batch_size)]
+        coros.extend(fetch_one('messages', self.client.messages.get_message, _id)
+                     for _id in wanted.get('messages', ()))
+        coros.extend(fetch_one('rooms', self.client.rooms.get_room, _id)
+                     for _id in wanted.get('rooms', ()))
+        await asyncio.gather(*coros)
+        return resolved
@@ -0,0 +1,311 @@
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'EventLog',
+    'EventLogConsumer',
+)
+
+# offset, timestamp, key (sha1 digest), length of data
+RECORD_HEADER = struct.Struct('>Qd20sI')
+SEGMENT_SUFFIX = '.log'
+
+
+def get_event_key(event):
+    """
+    Returns the deduplication key of webhook event.
+
+    Webhook payloads do not have ids of events, so redelivered events are recognized by
+    the resource, event type and data.
+    """
+    event_type = event.get('event') or event.get('type')
+    data = json.dumps([event.get('resource'), event_type, event.get('data')], sort_keys=True)
+    return hashlib.sha1(data.encode()).digest()
+
+
+class Segment(object):
+    def __init__(self, path, base_offset):
+        self.path = path
+        self.base_offset = base_offset
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path)
+
+    @property
+    def mtime(self):
+        return os.path.getmtime(self.path)
+
+    def iter_records(self, decode_from=None):
+        """
+        Yields (offset, timestamp, key, event, end position) of records using memory-mapped
+        file.
+
+        Only events with offsets starting from `decode_from` are decoded, other records are
+        skipped by their headers and yielded with `None` event.
+        """
+        size = self.size
+        if not size:
+            return
+        with open(self.path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            position = 0
+            while position + RECORD_HEADER.size <= size:
+                offset, timestamp, key, length = RECORD_HEADER.unpack_from(mm, position)
+                start = position + RECORD_HEADER.size
+                position = start + length
+                if position > size:
+                    # The process was killed while writing the record.
+                    break
+                event = None
+                if decode_from is not None and offset >= decode_from:
+                    event = json.loads(mm[start:position].decode())
+                yield offset, timestamp, key, event, position
+
+
+class EventLog(object):
+    """
+    Durable append-only log of webhook events.
+
+    Events are written to segment files "<directory>/<first offset>.log" and get sequential
+    offsets. Redelivered events are detected (see `get_event_key`) and not written again.
+    Segments are read through memory-mapped files, so replaying from an offset is fast, and
+    the oldest segments are removed according to `retention_bytes` and `retention_seconds`.
+
+    Use `WebhookReceiver(event_log=...)` to feed the log and `EventLogConsumer` to read it
+    from many local consumers.
+    """
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, retention_bytes=None,
+                 retention_seconds=None, dedup_window=600, fsync=False, key=get_event_key,
+                 timer=time.time):
+        """
+        :param directory: directory of segment files
+        :param segment_size: size after which a new segment is started
+        :param retention_bytes: maximum total size of segments
+        :param retention_seconds: maximum age of segments
+        :param dedup_window: how long (in seconds) an appended event is remembered, events with
+        the same key appended within this time are duplicates (redeliveries)
+        :param fsync: whether to call `os.fsync` after every append
+        :param key: function that returns deduplication key (20 bytes) of event
+        :param timer: function that returns current time in seconds
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self.fsync = fsync
+        self.dedup_window = dedup_window
+        self._key = key
+        self._timer = timer
+        # Pairs of (timestamp, key) of recent events and the last timestamp of every key.
+        self._recent_keys = collections.deque()
+        self._keys = {}
+        # Events of followers, set on every append.
+        self._waiters = set()
+        os.makedirs(directory, exist_ok=True)
+        self.segments = self._load_segments()
+        self.next_offset = self._recover()
+        self._file = open(self.segments[-1].path, 'ab')
+
+    def _get_segment_path(self, base_offset):
+        return os.path.join(self.directory, f'{base_offset:020d}{SEGMENT_SUFFIX}')
+
+    def _load_segments(self):
+        segments = [
+            Segment(os.path.join(self.directory, name), int(name[:-len(SEGMENT_SUFFIX)]))
+            for name in sorted(os.listdir(self.directory)) if name.endswith(SEGMENT_SUFFIX)
+        ]
+        if not segments:
+            path = self._get_segment_path(0)
+            open(path, 'ab').close()
+            segments.append(Segment(path, 0))
+        return segments
+
+    def _recover(self):
+        """
+        Truncates incomplete record of the active segment and restores the deduplication
+        window. Returns the next offset.
+        """
+        active = self.segments[-1]
+        next_offset = active.base_offset
+        valid_size = 0
+        for offset, _, _, _, valid_size in active.iter_records():
+            next_offset = offset + 1
+        if active.size != valid_size:
+            logger.warning('Truncating incomplete record of event log segment: %s', active.path)
+            with open(active.path, 'r+b') as f:
+                f.truncate(valid_size)
+
+        expires_before = self._timer() - self.dedup_window
+        for segment in reversed(self.segments):
+            recent = [(timestamp, key) for _, timestamp, key, _, _ in segment.iter_records()
+                      if timestamp >= expires_before]
+            self._recent_keys.extendleft(reversed(recent))
+            if segment.mtime < expires_before:
+                break
+        self._keys = {key: timestamp for timestamp, key in self._recent_keys}
+        return next_offset
+
+    def _expire_keys(self, now):
+        expires_before = now - self.dedup_window
+        while self._recent_keys and self._recent_keys[0][0] < expires_before:
+            timestamp, key = self._recent_keys.popleft()
+            if self._keys.get(key) == timestamp:
+                del self._keys[key]
+
+    @property
+    def first_offset(self):
+        return self.segments[0].base_offset
+
+    def contains(self, event):
+        self._expire_keys(self._timer())
+        return self._key(event) in self._keys
+
+    def append(self, event):
+        """
+        Appends event to the log.
+
+        :return: offset of the event or `None` if the event is a duplicate
+        """
+        now = self._timer()
+        self._expire_keys(now)
+        key = self._key(event)
+        if key in self._keys:
+            return None
+        data = json.dumps(event, separators=(',', ':')).encode()
+        offset = self.next_offset
+        self._file.write(RECORD_HEADER.pack(offset, now, key, len(data)) + data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.next_offset += 1
+
+        self._recent_keys.append((now, key))
+        self._keys[key] = now
+
+        if self._file.tell() >= self.segment_size:
+            self._roll()
+        for waiter in self._waiters:
+            waiter.set()
+        return offset
+
+    def _roll(self):
+        self._file.close()
+        path = self._get_segment_path(self.next_offset)
+        self._file = open(path, 'ab')
+        self.segments.append(Segment(path, self.next_offset))
+        self.apply_retention()
+
+    def apply_retention(self):
+        """
+        Removes the oldest segments (except the active one) that exceed retention limits.
+        """
+        now = time.time()
+        total_size = sum(segment.size for segment in self.segments)
+        while len(self.segments) > 1:
+            oldest = self.segments[0]
+            too_big = self.retention_bytes is not None and total_size > self.retention_bytes
+            too_old = self.retention_seconds is not None and \
+                oldest.mtime < now - self.retention_seconds
+            if not (too_big or too_old):
+                break
+            logger.debug('Removing event log segment: %s', oldest.path)
+            total_size -= oldest.size
+            os.remove(oldest.path)
+            self.segments.pop(0)
+
+    def read(self, offset=0, limit=None):
+        """
+        Yields pairs of (offset, event) starting from the given offset.
+        """
+        count = 0
+        for index, segment in enumerate(self.segments):
+            next_segment = self.segments[index + 1] if index + 1 < len(self.segments) else None
+            if next_segment is not None and next_segment.base_offset <= offset:
+                continue
+            for record_offset, _, _, event, _ in segment.iter_records(decode_from=offset):
+                if record_offset < offset:
+                    continue
+                if limit is not None and count >= limit:
+                    return
+                yield record_offset, event
+                count += 1
+
+    async def follow(self, offset=0):
+        """
+        Yields pairs of (offset, event) starting from the given offset and waits for
+        new events when all existing events are read.
+        """
+        waiter = asyncio.Event()
+        self._waiters.add(waiter)
+        try:
+            while True:
+                waiter.clear()
+                for offset, event in self.read(offset):
+                    yield offset, event
+                    offset += 1
+                offset = max(offset, self.first_offset)
+                if offset >= self.next_offset:
+                    await waiter.wait()
+        finally:
+            self._waiters.discard(waiter)
+
+    def consumer(self, name):
+        return EventLogConsumer(self, name)
+
+    def close(self):
+        self._file.close()
+
+
+class EventLogConsumer(object):
+    """
+    Reads events of `EventLog` and keeps the committed offset in
+    "<directory>/consumers/<name>.offset", so a consumer continues where it stopped after
+    restart. Each consumer reads the log independently.
+    """
+    def __init__(self, log, name):
+        self.log = log
+        self.name = name
+        consumers_dir = os.path.join(log.directory, 'consumers')
+        os.makedirs(consumers_dir, exist_ok=True)
+        self.path = os.path.join(consumers_dir, f'{name}.offset')
+        self.offset = self._load_offset()
+
+    def _load_offset(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                return int(f.read().strip() or 0)
+        return 0
+
+    def commit(self, offset):
+        """
+        Marks events up to the given offset (inclusive) as processed.
+        """
+        self.offset = offset + 1
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(self.offset))
+        os.replace(tmp_path, self.path)
+
+    def poll(self, limit=None):
+        """
+        Returns a list of pairs (offset, event) which were not committed yet.
+        """
+        return list(self.log.read(max(self.offset, self.log.first_offset), limit=limit))
+
+    async def follow(self):
+        """
+        Yields pairs of (offset, event) which were not committed yet and waits for new events.
+        Offsets have to be committed by the caller.
+        """
+        async for offset, event in self.log.follow(max(self.offset, self.log.first_offset)):
+            yield offset, event
@@ -61,3 +61,7 @@ class SparkResponseNotReceived(Exception):
 class SparkClientConfigurationError(Exception):
     def __init__(self, msg):
         Exception.__init__(self, msg)
+
+
+class SparkContentDownloadError(Exception):
+    pass
@@ -0,0 +1,99 @@
+import logging
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'iter_batches',
+)
+
+
+class BatchBuilder(object):
+    """
+    Accumulates items into columns, one list per field.
+
+    If fields are not given, they are discovered from items: a field that appears in the
+    middle of a batch is backfilled with `None` for preceding items and is kept in
+    subsequent batches.
+    """
+    def __init__(self, fields=None):
+        self.fixed_fields = fields is not None
+        self.columns = {field: [] for field in fields or ()}
+        self.size = 0
+
+    def add(self, item):
+        if not self.fixed_fields:
+            for field in item.keys() if isinstance(item, dict) else item.to_dict().keys():
+                if field not in self.columns:
+                    self.columns[field] = [None] * self.size
+        for field, column in self.columns.items():
+            column.append(item.get(field))
+        self.size += 1
+
+    def flush(self):
+        columns = self.columns
+        self.columns = {field: [] for field in columns}
+        self.size = 0
+        return columns
+
+
+def to_arrays(columns, datetime_fields=()):
+    """
+    Converts timestamps (to "datetime64[ms]", missing values become "NaT") and booleans
+    (columns without missing values) to NumPy arrays, other columns are left as lists.
+    """
+    if numpy is None:
+        raise RuntimeError('NumPy is required to export arrays')
+    arrays = {}
+    for field, column in columns.items():
+        if field in datetime_fields:
+            arrays[field] = numpy.array([value.rstrip('Z') if value else 'NaT'
+                                         for value in column], dtype='datetime64[ms]')
+        elif column and all(isinstance(value, bool) for value in column):
+            arrays[field] = numpy.array(column, dtype=bool)
+        else:
+            arrays[field] = column
+    return arrays
+
+
+async def iter_batches(items, batch_size=10000, fields=None, model=None, datetime_fields=None,
+                       use_numpy=False):
+    """
+    Accumulates items produced by `ApiService.get_items` (e.g. `list_people`) into columnar
+    batches, so results can be passed to dataframes without converting them row by row::
+
+        async for batch in iter_batches(client.people.list_people(), use_numpy=True):
+            df = pandas.DataFrame(batch)
+
+    :param items: async iterable of items or (item, cursor) pairs
+    :param batch_size: number of items in a batch (the last batch may be smaller)
+    :param fields: fields (API keys) to export, discovered from items by default
+    :param model: `aiociscospark.models.Model` subclass that defines fields and timestamps
+    :param datetime_fields: fields with timestamps, taken from the model by default
+    :param use_numpy: convert timestamps and booleans to NumPy arrays, see `to_arrays`
+    :return: async generator of dicts that map fields to columns
+    """
+    if fields is None and model is not None:
+        fields = list(model._keys)
+    if datetime_fields is None:
+        datetime_fields = model.datetime_fields if model is not None else ()
+    builder = BatchBuilder(fields)
+
+    def flush():
+        columns = builder.flush()
+        return to_arrays(columns, datetime_fields) if use_numpy else columns
+
+    async for item in items:
+        if isinstance(item, tuple):
+            item = item[0]
+        builder.add(item)
+        if builder.size >= batch_size:
+            logger.debug('Exporting batch of %s items', batch_size)
+            yield flush()
+    if builder.size:
+        logger.debug('Exporting batch of %s items', builder.size)
+        yield flush()
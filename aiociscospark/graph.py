@@ -0,0 +1,198 @@
+import asyncio
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'MembershipGraph',
+)
+
+
+class MembershipGraph(object):
+    """
+    In-memory bipartite index of room memberships: room to people and person to rooms.
+
+    Ids are encoded to small integers, so adjacency sets are compact and set operations are
+    fast. The graph is built by a concurrent crawl of room memberships (`crawl`), kept current
+    by membership webhook events (`apply_event`) or by a periodic delta pass (`refresh`) and
+    answers queries like "which rooms do these people share" locally.
+
+    Query methods accept and return Spark ids.
+    """
+    def __init__(self, client, concurrency=10):
+        """
+        :param client: `aiociscospark.APIClient` object
+        :param concurrency: maximum number of concurrent API requests
+        """
+        self.client = client
+        self.concurrency = concurrency
+        self._codes = {}
+        self._ids = []
+        self._room_people = collections.defaultdict(set)
+        self._person_rooms = collections.defaultdict(set)
+        self._room_activity = {}
+        # Last activity of rooms whose memberships are to be crawled.
+        self._pending_activity = {}
+
+    # Encoding of ids
+
+    def _encode(self, _id):
+        code = self._codes.get(_id)
+        if code is None:
+            code = self._codes[_id] = len(self._ids)
+            self._ids.append(_id)
+        return code
+
+    def _decode_all(self, codes):
+        return {self._ids[code] for code in codes}
+
+    def _codes_of(self, ids):
+        return [self._codes.get(_id) for _id in ids]
+
+    # Updating
+
+    def add_membership(self, room_id, person_id):
+        room, person = self._encode(room_id), self._encode(person_id)
+        self._room_people[room].add(person)
+        self._person_rooms[person].add(room)
+
+    def remove_membership(self, room_id, person_id):
+        room, person = self._codes.get(room_id), self._codes.get(person_id)
+        if room is None or person is None:
+            return
+        self._room_people.get(room, set()).discard(person)
+        self._person_rooms.get(person, set()).discard(room)
+
+    def set_room_members(self, room_id, person_ids):
+        """
+        Replaces members of the room.
+        """
+        self._clear_room(self._codes.get(room_id))
+        room = self._encode(room_id)
+        people = self._room_people[room]
+        for person_id in person_ids:
+            person = self._encode(person_id)
+            people.add(person)
+            self._person_rooms[person].add(room)
+
+    def remove_room(self, room_id):
+        self._clear_room(self._codes.get(room_id))
+        self._room_activity.pop(room_id, None)
+        self._pending_activity.pop(room_id, None)
+
+    def _clear_room(self, room):
+        for person in self._room_people.pop(room, ()):
+            self._person_rooms[person].discard(room)
+
+    def apply_event(self, event):
+        """
+        Updates the graph from webhook event, can be used as `WebhookReceiver` handler.
+        """
+        resource = event.get('resource')
+        event_type = event.get('event') or event.get('type')
+        data = event.get('data') or {}
+        if resource == 'memberships' and data.get('roomId') and data.get('personId'):
+            if event_type == 'deleted':
+                self.remove_membership(data['roomId'], data['personId'])
+            else:
+                self.add_membership(data['roomId'], data['personId'])
+        elif resource == 'rooms' and event_type == 'deleted' and data.get('id'):
+            self.remove_room(data['id'])
+
+    # Crawling
+
+    async def crawl(self, room_ids=None):
+        """
+        Fetches memberships of the given rooms (of all rooms by default) concurrently.
+        """
+        if room_ids is None:
+            rooms = [room async for room, _ in self.client.rooms.list_rooms()]
+            room_ids = [room['id'] for room in rooms]
+            self._pending_activity.update((room['id'], room.get('lastActivity'))
+                                          for room in rooms)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def crawl_room(room_id):
+            async with semaphore:
+                person_ids = [membership['personId'] async for membership, _ in
+                              self.client.room_memberships.list_memberships(room_id=room_id)]
+            self.set_room_members(room_id, person_ids)
+            if room_id in self._pending_activity:
+                self._room_activity[room_id] = self._pending_activity.pop(room_id)
+
+        results = await asyncio.gather(*[crawl_room(room_id) for room_id in room_ids],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        logger.debug('Crawled memberships of %s rooms', len(room_ids))
+
+    async def refresh(self):
+        """
+        Delta pass: re-crawls memberships of rooms with activity since the last crawl (rooms
+        are listed sorted by last activity) and of rooms whose crawl failed before.
+
+        :return: list of ids of re-crawled rooms
+        """
+        async for room, _ in self.client.rooms.list_rooms(sort_by='lastactivity'):
+            last_activity = room.get('lastActivity')
+            if self._room_activity.get(room['id'], False) == last_activity:
+                break
+            self._pending_activity[room['id']] = last_activity
+        changed = list(self._pending_activity)
+        await self.crawl(changed)
+        return changed
+
+    # Queries
+
+    def get_room_people(self, room_id):
+        return self._decode_all(self._room_people.get(self._codes.get(room_id), ()))
+
+    def get_person_rooms(self, person_id):
+        return self._decode_all(self._person_rooms.get(self._codes.get(person_id), ()))
+
+    def is_member(self, room_id, person_id):
+        person = self._codes.get(person_id)
+        return person is not None and person in self._room_people.get(self._codes.get(room_id), ())
+
+    def count_room_people(self, room_id):
+        return len(self._room_people.get(self._codes.get(room_id), ()))
+
+    def count_person_rooms(self, person_id):
+        return len(self._person_rooms.get(self._codes.get(person_id), ()))
+
+    def _intersection(self, index, ids):
+        sets = sorted((index.get(code, set()) for code in self._codes_of(ids)), key=len)
+        if not sets:
+            return set()
+        # Start from the smallest set to keep intermediate results small.
+        return self._decode_all(sets[0].intersection(*sets[1:]))
+
+    def _union(self, index, ids):
+        sets = [index.get(code, ()) for code in self._codes_of(ids)]
+        return self._decode_all(set().union(*sets))
+
+    def shared_rooms(self, person_ids):
+        """
+        Returns rooms shared by all the given people.
+        """
+        return self._intersection(self._person_rooms, person_ids)
+
+    def any_rooms(self, person_ids):
+        """
+        Returns rooms of any of the given people.
+        """
+        return self._union(self._person_rooms, person_ids)
+
+    def common_people(self, room_ids):
+        """
+        Returns people that are members of all the given rooms.
+        """
+        return self._intersection(self._room_people, room_ids)
+
+    def all_people(self, room_ids):
+        """
+        Returns people that are members of any of the given rooms.
+        """
+        return self._union(self._room_people, room_ids)
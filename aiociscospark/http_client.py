@@ -6,7 +6,7 @@ from aiohttp.client import DEFAULT_TIMEOUT
 
 from .exceptions import (SparkResponseError, SparkResponseNotReceived, SparkRateLimitExceeded,
                          SparkClientConfigurationError)
-from .utils import refresh_access_token
+from .utils import _parse_retry_after, refresh_access_token
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +37,8 @@ class HTTPClient(object):
         401: 'handle_unauthorized_error',
     }
 
-    def __init__(self, creds, loop=None, conn_timeout=None, read_timeout=DEFAULT_TIMEOUT):
+    def __init__(self, creds, loop=None, conn_timeout=None, read_timeout=DEFAULT_TIMEOUT,
+                 rate_limiter=None):
         """
         A thin wrapper around `aiohttp.ClientSession` module that allows registering of response
         handlers and has built-in support for retrying failed requests.
@@ -47,6 +48,7 @@ class HTTPClient(object):
         :param loop: an event loop
         :param conn_timeout: the connection timeout
         :param read_timeout: the read timeout
+        :param rate_limiter: `aiociscospark.RateLimiter` object that limits rate of requests
         """
         if not creds.get('access_token', None):
             raise SparkClientConfigurationError('"access_token" is required')
@@ -54,6 +56,7 @@ class HTTPClient(object):
         self._loop = loop
         self._conn_timeout = conn_timeout
         self._read_timeout = read_timeout
+        self.rate_limiter = rate_limiter
 
         self._registered_response_handlers = {}
 
@@ -98,6 +101,9 @@ class HTTPClient(object):
             return
 
         if resp.status == 429:
+            retry_after = _parse_retry_after(resp.headers.get('Retry-After'), None)
+            if self.rate_limiter is not None and retry_after:
+                self.rate_limiter.pause(retry_after)
             raise await SparkRateLimitExceeded.get(resp, session=self.session)
         raise await SparkResponseError.get(resp, session=self.session)
 
@@ -135,6 +141,8 @@ class HTTPClient(object):
         attempts_counter = 0
         for attempts_counter in range(1, self.max_retries + 1):
             logger.debug('%s %s (attempt #%s)', method, url, attempts_counter)
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
             try:
                 response = await self.session.request(method, url, **kwargs)
             except (aiohttp.client_exceptions.ServerTimeoutError,
@@ -0,0 +1,103 @@
+import base64
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'IdInterner',
+    'decode_id',
+    'encode_id',
+    'parse_id',
+)
+
+ID_PREFIX = 'ciscospark://'
+DEFAULT_REGION = 'us'
+
+
+def parse_id(spark_id):
+    """
+    Splits Spark id, e.g. "Y2lzY29zcGFyazovL3VzL1BFT1BMRS9m...", into resource type and value.
+
+    Ids are URL-safe base64 encoded (without padding) "ciscospark://<region>/<TYPE>/<value>"
+    strings, the value is an UUID for most resources.
+
+    :return: pair of (type, value), e.g. ('PEOPLE', 'f7e6754b-...')
+    :raises ValueError: if the string is not a Spark id
+    """
+    padded = spark_id + '=' * (-len(spark_id) % 4)
+    try:
+        decoded = base64.urlsafe_b64decode(padded.replace('+', '-').replace('/', '_')).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f'Invalid Spark id: {spark_id}') from None
+    parts = decoded.split('/', 4)
+    if not decoded.startswith(ID_PREFIX) or len(parts) != 5:
+        raise ValueError(f'Invalid Spark id: {spark_id}')
+    return parts[3], parts[4]
+
+
+def decode_id(spark_id):
+    """
+    Decodes Spark id to resource type and 16 bytes of UUID.
+
+    :return: pair of (type, bytes), e.g. ('PEOPLE', b'...')
+    :raises ValueError: if the string is not a Spark id or its value is not an UUID
+    (e.g. ids of memberships embed two UUIDs)
+    """
+    resource_type, value = parse_id(spark_id)
+    return resource_type, uuid.UUID(value).bytes
+
+
+def encode_id(resource_type, value, region=DEFAULT_REGION):
+    """
+    Encodes resource type and value (16 bytes of UUID, `uuid.UUID` or string) to Spark id.
+    Reverse of `decode_id` and `parse_id`.
+    """
+    if isinstance(value, bytes):
+        value = uuid.UUID(bytes=value)
+    decoded = f'{ID_PREFIX}{region}/{resource_type}/{value}'
+    return base64.urlsafe_b64encode(decoded.encode()).decode().rstrip('=')
+
+
+class IdInterner(object):
+    """
+    Table of ids that makes equal ids share one string object.
+
+    Items of API responses are decoded separately, so the same "roomId", "personId" or
+    "orgId" is stored as many equal strings. Interning makes them a single object which
+    reduces memory of crawled data and makes dict lookups by ids cheaper. Only references
+    to other resources are interned: the own "id" of an item is unique (e.g. of a message),
+    so interning it would only keep it in the table.
+
+    Pass `intern_ids=True` to `aiociscospark.APIClient` to intern ids of all listed items.
+    """
+    # Keys (besides "*Id") that contain lists of ids.
+    id_list_keys = ('licenses', 'mentionedPeople', 'roles')
+
+    def __init__(self):
+        self._ids = {}
+
+    def intern(self, value):
+        return self._ids.setdefault(value, value)
+
+    def intern_item(self, item):
+        """
+        Interns ids referenced by the item in place, the own "id" of the item is left as is.
+        """
+        intern = self._ids.setdefault
+        for key, value in item.items():
+            if isinstance(value, str):
+                if key.endswith('Id'):
+                    item[key] = intern(value, value)
+            elif key in self.id_list_keys and isinstance(value, list):
+                item[key] = [intern(_id, _id) for _id in value]
+        return item
+
+    def clear(self):
+        self._ids.clear()
+
+    def __contains__(self, value):
+        return value in self._ids
+
+    def __len__(self):
+        return len(self._ids)
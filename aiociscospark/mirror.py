@@ -0,0 +1,322 @@
+import asyncio
+import json
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'OrgMirror',
+)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS people (
+    id TEXT PRIMARY KEY,
+    display_name TEXT,
+    org_id TEXT,
+    last_activity TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS person_emails (
+    email TEXT PRIMARY KEY,
+    person_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS person_emails_person_id ON person_emails (person_id);
+CREATE TABLE IF NOT EXISTS rooms (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    type TEXT,
+    team_id TEXT,
+    last_activity TEXT,
+    data TEXT NOT NULL,
+    crawled_activity TEXT
+);
+CREATE INDEX IF NOT EXISTS rooms_team_id ON rooms (team_id);
+CREATE TABLE IF NOT EXISTS teams (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS room_memberships (
+    id TEXT PRIMARY KEY,
+    room_id TEXT NOT NULL,
+    person_id TEXT,
+    person_email TEXT,
+    is_moderator INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS room_memberships_room_id ON room_memberships (room_id);
+CREATE INDEX IF NOT EXISTS room_memberships_person_id ON room_memberships (person_id);
+CREATE INDEX IF NOT EXISTS room_memberships_person_email ON room_memberships (person_email);
+CREATE TABLE IF NOT EXISTS team_memberships (
+    id TEXT PRIMARY KEY,
+    team_id TEXT NOT NULL,
+    person_id TEXT,
+    person_email TEXT,
+    is_moderator INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS team_memberships_team_id ON team_memberships (team_id);
+CREATE INDEX IF NOT EXISTS team_memberships_person_id ON team_memberships (person_id);
+'''
+
+
+class OrgMirror(object):
+    """
+    Local SQLite mirror of people, rooms, teams, room memberships and team memberships.
+
+    `crawl` fetches everything (memberships of rooms and teams are fetched concurrently),
+    `refresh` re-fetches only rooms with new activity (rooms are listed sorted by last
+    activity) and their memberships, and `apply_event` updates the mirror from webhook events,
+    so most lookups (e.g. `get_room_members`, `get_person_rooms`) do not need API requests.
+
+    Usage::
+
+        mirror = OrgMirror(client, 'org.sqlite')
+        await mirror.crawl()
+        receiver.add_handler(mirror.apply_event)
+    """
+    def __init__(self, client, path=':memory:', concurrency=10):
+        """
+        :param client: `aiociscospark.APIClient` object
+        :param path: path of the database file
+        :param concurrency: maximum number of concurrent API requests
+        """
+        self.client = client
+        self.concurrency = concurrency
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    # Writing
+
+    def save_people(self, people):
+        people = list(people)
+        with self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO people VALUES (?, ?, ?, ?, ?)',
+                [(p['id'], p.get('displayName'), p.get('orgId'), p.get('lastActivity'),
+                  json.dumps(p)) for p in people]
+            )
+            self.db.executemany('DELETE FROM person_emails WHERE person_id = ?',
+                                [(p['id'],) for p in people])
+            self.db.executemany(
+                'INSERT OR REPLACE INTO person_emails VALUES (?, ?)',
+                [(email.lower(), p['id']) for p in people for email in p.get('emails') or ()]
+            )
+
+    def save_rooms(self, rooms):
+        with self.db:
+            # Keeps the last activity of the room at the time its memberships were crawled.
+            self.db.executemany(
+                'INSERT OR REPLACE INTO rooms VALUES (?, ?, ?, ?, ?, ?, '
+                '(SELECT crawled_activity FROM rooms WHERE id = ?))',
+                [(r['id'], r.get('title'), r.get('type'), r.get('teamId'), r.get('lastActivity'),
+                  json.dumps(r), r['id']) for r in rooms]
+            )
+
+    def save_teams(self, teams):
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO teams VALUES (?, ?, ?)',
+                                [(t['id'], t.get('name'), json.dumps(t)) for t in teams])
+
+    def save_room_memberships(self, memberships, room_id=None):
+        """
+        Saves memberships, all existing memberships of the room are replaced if `room_id` is set.
+        """
+        self._save_memberships('room_memberships', 'roomId', memberships, room_id)
+
+    def save_team_memberships(self, memberships, team_id=None):
+        """
+        Saves memberships, all existing memberships of the team are replaced if `team_id` is set.
+        """
+        self._save_memberships('team_memberships', 'teamId', memberships, team_id)
+
+    def _save_memberships(self, table, parent_key, memberships, parent_id):
+        parent_column = 'room_id' if parent_key == 'roomId' else 'team_id'
+        with self.db:
+            if parent_id is not None:
+                self.db.execute(f'DELETE FROM {table} WHERE {parent_column} = ?', (parent_id,))
+            self.db.executemany(
+                f'INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?, ?, ?)',
+                [(m['id'], m[parent_key], m.get('personId'), (m.get('personEmail') or '').lower(),
+                  m.get('isModerator'), json.dumps(m)) for m in memberships]
+            )
+
+    def delete(self, table, _id):
+        with self.db:
+            self.db.execute(f'DELETE FROM {table} WHERE id = ?', (_id,))
+            if table == 'rooms':
+                self.db.execute('DELETE FROM room_memberships WHERE room_id = ?', (_id,))
+            elif table == 'people':
+                self.db.execute('DELETE FROM person_emails WHERE person_id = ?', (_id,))
+
+    # Crawling
+
+    async def crawl(self, people=True):
+        """
+        Fetches people (unless `people` is False), rooms, teams and memberships of all rooms and
+        teams.
+        """
+        if people:
+            self.save_people([p async for p, _ in self.client.people.list_people()])
+        rooms = [r async for r, _ in self.client.rooms.list_rooms()]
+        teams = [t async for t, _ in self.client.teams.list_teams()]
+        with self.db:
+            self.db.execute('DELETE FROM rooms')
+            self.db.execute('DELETE FROM teams')
+        self.save_rooms(rooms)
+        self.save_teams(teams)
+        await self._crawl_memberships({r['id']: r.get('lastActivity') for r in rooms},
+                                      [t['id'] for t in teams])
+        logger.debug('Crawled %s rooms and %s teams', len(rooms), len(teams))
+
+    async def refresh(self):
+        """
+        Fetches rooms with activity newer than at the time of the last crawl of their
+        memberships, memberships of these rooms (and of rooms whose memberships failed to be
+        crawled before), teams and team memberships.
+
+        :return: list of ids of refreshed rooms
+        """
+        crawled = dict(self.db.execute('SELECT id, crawled_activity FROM rooms'))
+        changed = []
+        async for room, _ in self.client.rooms.list_rooms(sort_by='lastactivity'):
+            if crawled.get(room['id']) == (room.get('lastActivity') or ''):
+                # Rooms are sorted by last activity, so other rooms have not changed.
+                break
+            changed.append(room)
+        self.save_rooms(changed)
+        with self.db:
+            self.db.executemany('UPDATE rooms SET crawled_activity = NULL WHERE id = ?',
+                                [(r['id'],) for r in changed])
+        # Rooms without crawled activity are changed, new or their memberships failed to be
+        # crawled before.
+        pending = {room_id: json.loads(data).get('lastActivity') for room_id, data in
+                   self.db.execute('SELECT id, data FROM rooms WHERE crawled_activity IS NULL')}
+        teams = [t async for t, _ in self.client.teams.list_teams()]
+        self.save_teams(teams)
+        await self._crawl_memberships(pending, [t['id'] for t in teams])
+        logger.debug('Refreshed %s rooms', len(pending))
+        return list(pending)
+
+    async def _crawl_memberships(self, room_activities, team_ids):
+        """
+        :param room_activities: dict of room id to its last activity, which is saved as
+        crawled activity when memberships of the room are saved
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def crawl_room(room_id):
+            async with semaphore:
+                memberships = [m async for m, _ in
+                               self.client.room_memberships.list_memberships(room_id=room_id)]
+            self.save_room_memberships(memberships, room_id=room_id)
+            with self.db:
+                self.db.execute('UPDATE rooms SET crawled_activity = ? WHERE id = ?',
+                                (room_activities[room_id] or '', room_id))
+
+        async def crawl_team(team_id):
+            async with semaphore:
+                memberships = [m async for m, _ in
+                               self.client.team_memberships.list_memberships(team_id=team_id)]
+            self.save_team_memberships(memberships, team_id=team_id)
+
+        results = await asyncio.gather(*[crawl_room(_id) for _id in room_activities],
+                                       *[crawl_team(_id) for _id in team_ids],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+    def apply_event(self, event):
+        """
+        Updates the mirror from webhook event, can be used as `WebhookReceiver` handler.
+        """
+        resource = event.get('resource')
+        event_type = event.get('event') or event.get('type')
+        data = event.get('data') or {}
+        if not data.get('id'):
+            return
+        if resource == 'memberships':
+            if event_type == 'deleted':
+                self.delete('room_memberships', data['id'])
+            else:
+                self.save_room_memberships([data])
+        elif resource == 'rooms':
+            if event_type == 'deleted':
+                self.delete('rooms', data['id'])
+            else:
+                self.save_rooms([data])
+        elif resource == 'messages' and event_type == 'created' and data.get('roomId'):
+            with self.db:
+                self.db.execute(
+                    'UPDATE rooms SET last_activity = ? '
+                    'WHERE id = ? AND (last_activity IS NULL OR last_activity < ?)',
+                    (data.get('created'), data['roomId'], data.get('created'))
+                )
+
+    # Queries
+
+    def _get(self, query, params):
+        row = self.db.execute(query, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _all(self, query, params):
+        return [json.loads(row[0]) for row in self.db.execute(query, params)]
+
+    def get_person(self, person_id):
+        return self._get('SELECT data FROM people WHERE id = ?', (person_id,))
+
+    def find_person(self, email):
+        return self._get('SELECT p.data FROM people p JOIN person_emails e ON e.person_id = p.id '
+                         'WHERE e.email = ?', (email.lower(),))
+
+    def get_room(self, room_id):
+        return self._get('SELECT data FROM rooms WHERE id = ?', (room_id,))
+
+    def get_team(self, team_id):
+        return self._get('SELECT data FROM teams WHERE id = ?', (team_id,))
+
+    def get_room_team(self, room_id):
+        """
+        Returns team that owns the room or `None`.
+        """
+        return self._get('SELECT t.data FROM teams t JOIN rooms r ON r.team_id = t.id '
+                         'WHERE r.id = ?', (room_id,))
+
+    def get_team_rooms(self, team_id):
+        return self._all('SELECT data FROM rooms WHERE team_id = ?', (team_id,))
+
+    def get_room_members(self, room_id):
+        """
+        Returns memberships of the room.
+        """
+        return self._all('SELECT data FROM room_memberships WHERE room_id = ?', (room_id,))
+
+    def get_team_members(self, team_id):
+        """
+        Returns memberships of the team.
+        """
+        return self._all('SELECT data FROM team_memberships WHERE team_id = ?', (team_id,))
+
+    def get_person_rooms(self, person_id=None, person_email=None):
+        """
+        Returns rooms the person (by id or email) is a member of.
+        """
+        if person_id is not None:
+            condition, param = 'm.person_id = ?', person_id
+        else:
+            condition, param = 'm.person_email = ?', person_email.lower()
+        return self._all('SELECT r.data FROM rooms r JOIN room_memberships m ON m.room_id = r.id '
+                         f'WHERE {condition}', (param,))
+
+    def is_member(self, room_id, person_id=None, person_email=None):
+        if person_id is not None:
+            condition, param = 'person_id = ?', person_id
+        else:
+            condition, param = 'person_email = ?', person_email.lower()
+        query = f'SELECT 1 FROM room_memberships WHERE room_id = ? AND {condition} LIMIT 1'
+        return self.db.execute(query, (room_id, param)).fetchone() is not None
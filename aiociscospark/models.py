@@ -0,0 +1,228 @@
+import datetime
+import logging
+import re
+import sys
+
+from .ids import parse_id
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'License',
+    'Membership',
+    'Message',
+    'Model',
+    'Organization',
+    'Person',
+    'Role',
+    'Room',
+    'Team',
+    'TeamMembership',
+    'Webhook',
+    'parse_datetime',
+)
+
+_missing = object()
+
+
+def parse_datetime(value):
+    """
+    Parses timestamp of API object, e.g. "2017-09-30T19:37:58.808Z", to aware datetime.
+    """
+    if value is None:
+        return None
+    fmt = '%Y-%m-%dT%H:%M:%S.%fZ' if '.' in value else '%Y-%m-%dT%H:%M:%SZ'
+    return datetime.datetime.strptime(value, fmt).replace(tzinfo=datetime.timezone.utc)
+
+
+def _intern(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [_intern(item) for item in value]
+    return value
+
+
+def _to_snake_case(key):
+    return re.sub('([A-Z])', r'_\1', key).lower()
+
+
+class _DatetimeField(object):
+    """
+    Descriptor that parses timestamp on the first access and keeps the result.
+    """
+    def __init__(self, raw_slot, parsed_slot):
+        self.raw_slot = raw_slot
+        self.parsed_slot = parsed_slot
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = getattr(instance, self.parsed_slot, _missing)
+        if value is _missing:
+            value = parse_datetime(getattr(instance, self.raw_slot))
+            setattr(instance, self.parsed_slot, value)
+        return value
+
+
+class ModelMeta(type):
+    """
+    Builds `__slots__` of models from `fields`, so instances do not have `__dict__`.
+
+    API keys are mapped to snake case attributes (e.g. "displayName" to `display_name`).
+    Fields listed in `datetime_fields` keep raw strings and are parsed lazily by attributes.
+    Values of `shared_fields` (ids of referenced objects and enumerations repeated by many
+    objects) are interned, so equal values are stored once.
+    """
+    def __new__(mcs, name, bases, namespace):
+        slots = list(namespace.get('__slots__', ()))
+        keys = {}
+        for base in bases:
+            keys.update(getattr(base, '_keys', {}))
+        datetime_fields = namespace.get('datetime_fields', ())
+        for key in namespace.get('fields', ()):
+            attr = _to_snake_case(key)
+            if key in datetime_fields:
+                slot = f'_{attr}'
+                slots.extend((slot, f'_{attr}_parsed'))
+                namespace[attr] = _DatetimeField(slot, f'_{attr}_parsed')
+            else:
+                slot = attr
+                slots.append(slot)
+            keys[key] = slot
+        shared_fields = set(namespace.get('shared_fields', ()))
+        for base in bases:
+            shared_fields.update(getattr(base, '_shared_keys', ()))
+        namespace['__slots__'] = tuple(slots)
+        namespace['_keys'] = keys
+        namespace['_shared_keys'] = frozenset(shared_fields)
+        return super().__new__(mcs, name, bases, namespace)
+
+
+class Model(object, metaclass=ModelMeta):
+    """
+    Base class of compact API objects.
+
+    Models use much less memory than dicts returned by `resp.json()`, timestamps are parsed
+    on the first access (e.g. `room.created` is `datetime.datetime`). Models also support
+    read-only dict-like access by API keys (`room['title']`, `room.get('title')`), so they
+    can be used where dicts are expected, and `to_dict` returns the original representation.
+    Keys unknown to the model are kept in `extra`.
+
+    Pass `model=True` to methods of services to get models instead of dicts.
+    """
+    __slots__ = ('extra',)
+    fields = ('id',)
+    datetime_fields = ()
+    shared_fields = ()
+
+    def __init__(self, data):
+        keys = self._keys
+        shared_keys = self._shared_keys
+        for key, slot in keys.items():
+            value = data.get(key)
+            if key in shared_keys and value is not None:
+                value = _intern(value)
+            setattr(self, slot, value)
+        extra = {key: value for key, value in data.items() if key not in keys}
+        self.extra = extra or None
+
+    @property
+    def uuid(self):
+        """
+        UUID embedded into `id`, decoded lazily (see `aiociscospark.ids.parse_id`).
+        """
+        return parse_id(self.id)[1] if self.id else None
+
+    def get(self, key, default=None):
+        slot = self._keys.get(key)
+        if slot is None:
+            return self.extra.get(key, default) if self.extra else default
+        value = getattr(self, slot)
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _missing) is not _missing
+
+    def to_dict(self):
+        data = {key: getattr(self, slot) for key, slot in self._keys.items()
+                if getattr(self, slot) is not None}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __eq__(self, other):
+        if isinstance(other, Model):
+            other = other.to_dict()
+        return isinstance(other, dict) and self.to_dict() == other
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(id={self.id!r})'
+
+
+class Person(Model):
+    fields = ('emails', 'displayName', 'nickName', 'firstName', 'lastName', 'avatar', 'orgId',
+              'roles', 'licenses', 'created', 'lastActivity', 'status', 'invitePending',
+              'loginEnabled', 'type', 'timezone')
+    datetime_fields = ('created', 'lastActivity')
+    shared_fields = ('orgId', 'roles', 'licenses', 'status', 'type', 'timezone')
+
+
+class Room(Model):
+    fields = ('title', 'type', 'isLocked', 'teamId', 'lastActivity', 'creatorId', 'created')
+    datetime_fields = ('created', 'lastActivity')
+    shared_fields = ('type', 'teamId', 'creatorId')
+
+
+class Message(Model):
+    fields = ('roomId', 'roomType', 'toPersonId', 'toPersonEmail', 'text', 'markdown', 'html',
+              'files', 'personId', 'personEmail', 'mentionedPeople', 'created')
+    datetime_fields = ('created',)
+    shared_fields = ('roomId', 'roomType', 'personId', 'personEmail')
+
+
+class Membership(Model):
+    fields = ('roomId', 'personId', 'personEmail', 'personDisplayName', 'personOrgId',
+              'isModerator', 'isMonitor', 'created')
+    datetime_fields = ('created',)
+    shared_fields = ('roomId', 'personId', 'personEmail', 'personDisplayName', 'personOrgId')
+
+
+class TeamMembership(Model):
+    fields = ('teamId', 'personId', 'personEmail', 'personDisplayName', 'personOrgId',
+              'isModerator', 'created')
+    datetime_fields = ('created',)
+    shared_fields = ('teamId', 'personId', 'personEmail', 'personDisplayName', 'personOrgId')
+
+
+class Team(Model):
+    fields = ('name', 'creatorId', 'created')
+    datetime_fields = ('created',)
+    shared_fields = ('creatorId',)
+
+
+class Webhook(Model):
+    fields = ('name', 'targetUrl', 'resource', 'event', 'filter', 'secret', 'status', 'orgId',
+              'createdBy', 'appId', 'ownedBy', 'created')
+    datetime_fields = ('created',)
+    shared_fields = ('targetUrl', 'resource', 'event', 'status', 'orgId', 'createdBy', 'appId',
+                     'ownedBy')
+
+
+class License(Model):
+    fields = ('name', 'totalUnits', 'consumedUnits')
+
+
+class Role(Model):
+    fields = ('name',)
+
+
+class Organization(Model):
+    fields = ('displayName', 'created')
+    datetime_fields = ('created',)
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+
+import aiohttp
+
+from .exceptions import SparkRateLimitExceeded, SparkResponseError, SparkResponseNotReceived
+from .utils import _parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'Outbox',
+)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    sent_at REAL,
+    message_id TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_status_next_attempt_at ON outbox (status, next_attempt_at);
+'''
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+class Outbox(object):
+    """
+    Persistent queue of outgoing messages stored in SQLite.
+
+    `enqueue` only writes a row, messages are sent by a pool of workers (`start`/`stop` or
+    `drain`) with `ApiServiceMessages.create_message`. Every message has an idempotency key:
+    enqueueing a message with a key that is already in the outbox does nothing, and sent
+    messages are never sent again, so the producer can safely re-enqueue after restart.
+    Messages which were being sent when the process stopped are sent again on the next start.
+
+    Rate limited messages are postponed for "Retry-After" seconds (and all workers pause),
+    server and connection errors are retried with exponential backoff up to `max_attempts`,
+    other errors fail the message.
+
+    Usage::
+
+        outbox = Outbox(client, 'outbox.sqlite')
+        outbox.start()
+        outbox.enqueue(room_id=room_id, markdown='**Deployed**', key=f'deploy-{build_id}')
+        ...
+        await outbox.stop()
+    """
+    retry_delay = 1
+    max_retry_delay = 300
+    idle_timeout = 1
+
+    def __init__(self, client, path=':memory:', workers=4, max_attempts=5, timer=time.time):
+        """
+        :param client: `aiociscospark.APIClient` object
+        :param path: path of the database file
+        :param workers: number of concurrent workers
+        :param max_attempts: maximum number of attempts to send a message
+        :param timer: function that returns current time in seconds
+        """
+        self.client = client
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._timer = timer
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        with self.db:
+            recovered = self.db.execute('UPDATE outbox SET status = ? WHERE status = ?',
+                                        (PENDING, SENDING)).rowcount
+        if recovered:
+            logger.warning('%s messages were being sent when outbox stopped, resending them',
+                           recovered)
+        self._paused_until = 0
+        self._wakeup = None
+        self._tasks = []
+
+    def close(self):
+        self.db.close()
+
+    def enqueue(self, room_id=None, to_person_id=None, to_person_email=None, text=None,
+                markdown=None, files=None, key=None):
+        """
+        Adds message to the outbox, parameters are the parameters of `create_message`.
+
+        :param key: idempotency key, random by default
+        :return: id of the queued message or `None` if a message with the key is already queued
+        """
+        params = {
+            'room_id': room_id,
+            'to_person_id': to_person_id,
+            'to_person_email': to_person_email,
+            'text': text,
+            'markdown': markdown,
+            'files': files,
+        }
+        params = {name: value for name, value in params.items() if value is not None}
+        key = key or uuid.uuid4().hex
+        now = self._timer()
+        with self.db:
+            cursor = self.db.execute(
+                'INSERT OR IGNORE INTO outbox (key, params, created_at, next_attempt_at) '
+                'VALUES (?, ?, ?, ?)', (key, json.dumps(params), now, now)
+            )
+        if not cursor.rowcount:
+            logger.debug('Message with key %s is already in the outbox', key)
+            return None
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return cursor.lastrowid
+
+    def get(self, key):
+        """
+        Returns state of the message with the given idempotency key or `None`.
+        """
+        row = self.db.execute(
+            'SELECT id, status, attempts, created_at, sent_at, message_id, error '
+            'FROM outbox WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        names = ('id', 'status', 'attempts', 'created_at', 'sent_at', 'message_id', 'error')
+        return dict(zip(names, row))
+
+    def metrics(self):
+        """
+        :return: dictionary with numbers of messages by status ("pending", "sending", "sent",
+        "failed") and "oldest_pending_age", age of the oldest pending message in seconds
+        """
+        result = dict.fromkeys((PENDING, SENDING, SENT, FAILED), 0)
+        result.update(self.db.execute('SELECT status, count(*) FROM outbox GROUP BY status'))
+        oldest, = self.db.execute('SELECT min(created_at) FROM outbox WHERE status IN (?, ?)',
+                                  (PENDING, SENDING)).fetchone()
+        result['oldest_pending_age'] = 0 if oldest is None else self._timer() - oldest
+        return result
+
+    def purge(self, older_than):
+        """
+        Deletes messages that were sent more than `older_than` seconds ago. Their keys are
+        forgotten, so messages with the same keys can be queued again.
+        """
+        with self.db:
+            return self.db.execute('DELETE FROM outbox WHERE status = ? AND sent_at < ?',
+                                   (SENT, self._timer() - older_than)).rowcount
+
+    def _claim(self):
+        now = self._timer()
+        if self._paused_until > now:
+            return None
+        with self.db:
+            row = self.db.execute(
+                'SELECT id, params, attempts FROM outbox WHERE status = ? AND next_attempt_at <= ? '
+                'ORDER BY next_attempt_at, id LIMIT 1', (PENDING, now)
+            ).fetchone()
+            if row is not None:
+                self.db.execute('UPDATE outbox SET status = ?, attempts = attempts + 1 '
+                                'WHERE id = ?', (SENDING, row[0]))
+        return row
+
+    def _next_delay(self):
+        next_attempt_at, = self.db.execute(
+            'SELECT min(next_attempt_at) FROM outbox WHERE status = ?', (PENDING,)
+        ).fetchone()
+        if next_attempt_at is None:
+            return None
+        return max(next_attempt_at, self._paused_until) - self._timer()
+
+    def _retry(self, _id, error, delay, count_attempt=True):
+        with self.db:
+            self.db.execute(
+                'UPDATE outbox SET status = ?, next_attempt_at = ?, error = ?, '
+                'attempts = attempts - ? WHERE id = ?',
+                (PENDING, self._timer() + delay, error, 0 if count_attempt else 1, _id)
+            )
+
+    def _finish(self, _id, status, message_id=None, error=None):
+        with self.db:
+            self.db.execute(
+                'UPDATE outbox SET status = ?, sent_at = ?, message_id = ?, error = ? '
+                'WHERE id = ?', (status, self._timer(), message_id, error, _id)
+            )
+
+    async def _send(self, row):
+        _id, params, attempts = row
+        attempts += 1
+        try:
+            message = await self.client.messages.create_message(**json.loads(params))
+        except SparkRateLimitExceeded as e:
+            retry_after = _parse_retry_after(e.headers.get('Retry-After'), self.retry_delay)
+            logger.debug('Rate limited, pausing outbox for %s seconds', retry_after)
+            self._paused_until = max(self._paused_until, self._timer() + retry_after)
+            # Rate limited attempts are not counted.
+            self._retry(_id, str(e), retry_after, count_attempt=False)
+        except (SparkResponseError, SparkResponseNotReceived, aiohttp.ClientError,
+                asyncio.TimeoutError) as e:
+            transient = not isinstance(e, SparkResponseError) or e.status >= 500
+            if transient and attempts < self.max_attempts:
+                delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+                logger.warning('Failed to send message %s (attempt %s), retrying in %s seconds',
+                               _id, attempts, delay)
+                self._retry(_id, str(e), delay)
+            else:
+                logger.error('Failed to send message %s: %s', _id, e)
+                self._finish(_id, FAILED, error=str(e))
+        except Exception as e:
+            # Unexpected errors must not kill the worker and leave the message in "sending".
+            logger.exception('Failed to send message %s', _id)
+            self._finish(_id, FAILED, error=repr(e))
+        else:
+            self._finish(_id, SENT, message_id=message.get('id'))
+
+    async def _worker(self, stop_when_empty):
+        while True:
+            row = self._claim()
+            if row is not None:
+                await self._send(row)
+                continue
+            delay = self._next_delay()
+            if delay is None and stop_when_empty:
+                if not self.db.execute('SELECT 1 FROM outbox WHERE status = ? LIMIT 1',
+                                       (SENDING,)).fetchone():
+                    return
+                delay = self.idle_timeout
+            timeout = self.idle_timeout if delay is None else min(max(delay, 0), self.idle_timeout)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """
+        Starts workers that send queued messages in background.
+        """
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if not self._tasks:
+            self._tasks = [asyncio.ensure_future(self._worker(stop_when_empty=False))
+                           for _ in range(self.workers)]
+        return self._tasks
+
+    async def stop(self):
+        """
+        Stops workers, messages which are being sent are sent again on the next start.
+        """
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        with self.db:
+            self.db.execute('UPDATE outbox SET status = ? WHERE status = ?', (PENDING, SENDING))
+
+    async def drain(self):
+        """
+        Sends queued messages (including postponed ones) and returns when the outbox is empty.
+        """
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        results = await asyncio.gather(
+            *[self._worker(stop_when_empty=True) for _ in range(self.workers)],
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'AdaptiveLimiter',
+    'RateLimiter',
+)
+
+
+class RateLimiter(object):
+    """
+    Token bucket that limits the rate of requests.
+
+    Pass it to `aiociscospark.HTTPClient` (or `get_client(..., rate_limiter=...)`) to limit
+    all requests of the client; the client also pauses the limiter for "Retry-After" seconds
+    when Spark responds with "429 Too Many Requests".
+    """
+    def __init__(self, rate, burst=None, timer=time.monotonic):
+        """
+        :param rate: number of requests per second
+        :param burst: maximum number of requests made at once, defaults to `rate`
+        :param timer: function that returns current time in seconds
+        """
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self._timer = timer
+        self._tokens = self.burst
+        self._updated_at = timer()
+        self._paused_until = 0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        while True:
+            now = self._timer()
+            if self._paused_until > now:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds):
+        """
+        Stops giving out tokens for the given number of seconds.
+        """
+        logger.debug('Pausing requests for %s seconds', seconds)
+        self._paused_until = max(self._paused_until, self._timer() + seconds)
+
+
+class AdaptiveLimiter(object):
+    """
+    Concurrency limiter that adapts the limit to the rate limit of the API (AIMD): the limit
+    grows by one after `limit` successful operations and is halved when an operation is rate
+    limited, in which case new operations also wait for "Retry-After" seconds.
+
+    Usage::
+
+        async with limiter:
+            try:
+                ...
+            except SparkRateLimitExceeded as e:
+                limiter.on_rate_limited(e.retry_after)
+            else:
+                limiter.on_success()
+    """
+    def __init__(self, initial=4, minimum=1, maximum=32, timer=time.monotonic):
+        """
+        :param initial: initial number of concurrent operations
+        :param minimum: minimum number of concurrent operations
+        :param maximum: maximum number of concurrent operations
+        :param timer: function that returns current time in seconds
+        """
+        self.limit = min(max(initial, minimum), maximum)
+        self.minimum = minimum
+        self.maximum = maximum
+        self._timer = timer
+        self._active = 0
+        self._successes = 0
+        self._paused_until = 0
+        self._condition = None
+
+    async def acquire(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._active < self.limit)
+            self._active += 1
+        delay = self._paused_until - self._timer()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(self):
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.release()
+
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            self.limit = min(self.limit + 1, self.maximum)
+
+    def on_rate_limited(self, retry_after=None):
+        self._successes = 0
+        self.limit = max(self.limit // 2, self.minimum)
+        logger.debug('Rate limited, concurrency limit is decreased to %s', self.limit)
+        if retry_after:
+            self._paused_until = max(self._paused_until, self._timer() + retry_after)
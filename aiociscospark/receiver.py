@@ -0,0 +1,215 @@
+import asyncio
+import collections
+import hashlib
+import hmac
+import inspect
+import json
+import logging
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'WebhookReceiver',
+)
+
+ANY = '*'
+
+
+class WebhookReceiver(object):
+    """
+    Receives webhook events sent by Spark.
+
+    Verifies "X-Spark-Signature" of requests, acknowledges them as soon as the event is put
+    onto a bounded queue and dispatches queued events to registered handlers using a pool of
+    workers. When the queue is full the request waits for a free slot up to `enqueue_timeout`
+    seconds and is rejected with "503 Service Unavailable" afterwards, so Spark retries
+    the delivery later.
+
+    If `enricher` (see `aiociscospark.EventEnricher`) is set, workers take batches of events
+    arrived within the enricher's window and enrich them before dispatching.
+
+    If `event_log` (see `aiociscospark.EventLog`) is set, accepted events are appended to
+    the log and events redelivered by Spark are acknowledged without dispatching.
+
+    Documentation: https://developer.ciscospark.com/webhooks-explained.html
+    """
+    signature_header = 'X-Spark-Signature'
+
+    def __init__(self, secret=None, *, queue_size=1000, workers=4, enqueue_timeout=1.0,
+                 enricher=None, event_log=None):
+        """
+        :param secret: secret used to create webhooks, signatures are not verified if not set
+        :param queue_size: maximum number of events waiting to be dispatched
+        :param workers: number of workers that dispatch events to handlers
+        :param enqueue_timeout: how long a request may wait for a free slot in the queue
+        :param enricher: `aiociscospark.EventEnricher` object
+        :param event_log: `aiociscospark.EventLog` object
+        """
+        if secret is not None:
+            if isinstance(secret, str):
+                secret = secret.encode()
+            # Hashing of the key is done once, requests use copies of this object.
+            self._hmac = hmac.new(secret, digestmod=hashlib.sha1)
+        else:
+            self._hmac = None
+        self._queue_size = queue_size
+        self._workers_count = workers
+        self._enqueue_timeout = enqueue_timeout
+        self.enricher = enricher
+        self.event_log = event_log
+        self._handlers = collections.defaultdict(list)
+        self._workers = []
+        self.queue = None
+        self.stats = collections.Counter()
+
+    def add_handler(self, handler, resource=ANY, event=ANY):
+        """
+        Registers (coroutine) function that is called with every event of given resource and
+        event type, "*" matches any resource or event type.
+        """
+        self._handlers[(resource, event)].append(handler)
+
+    def on(self, resource=ANY, event=ANY):
+        """
+        Decorator that registers event handler, see `add_handler`.
+        """
+        def decorator(handler):
+            self.add_handler(handler, resource=resource, event=event)
+            return handler
+        return decorator
+
+    def get_handlers(self, resource, event):
+        keys = ((resource, event), (resource, ANY), (ANY, event), (ANY, ANY))
+        return [handler for key in keys for handler in self._handlers.get(key, ())]
+
+    def verify_signature(self, body, signature):
+        if self._hmac is None:
+            return True
+        if not signature:
+            return False
+        digest = self._hmac.copy()
+        digest.update(body)
+        return hmac.compare_digest(digest.hexdigest(), signature)
+
+    async def receive(self, body, signature=None):
+        """
+        Verifies and enqueues raw webhook event.
+
+        :return: HTTP status code of the response
+        """
+        self.stats['received'] += 1
+        if not self.verify_signature(body, signature):
+            self.stats['rejected'] += 1
+            logger.warning('Invalid webhook signature')
+            return 401
+        try:
+            event = json.loads(body)
+        except ValueError:
+            self.stats['rejected'] += 1
+            logger.warning('Invalid webhook payload')
+            return 400
+        if self.event_log is not None and self.event_log.contains(event):
+            self.stats['duplicates'] += 1
+            logger.debug('Duplicate webhook event is skipped')
+            return 200
+        status = await self.enqueue(event)
+        if status == 200 and self.event_log is not None:
+            self.event_log.append(event)
+        return status
+
+    async def enqueue(self, event):
+        """
+        Puts event onto the queue.
+
+        :return: HTTP status code of the response
+        """
+        if self.queue is None:
+            raise RuntimeError('Receiver is not started')
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self.queue.put(event), self._enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.stats['dropped'] += 1
+                logger.warning('Webhook events queue is full, event is dropped')
+                return 503
+        self.stats['queued'] += 1
+        return 200
+
+    async def handle_request(self, request):
+        """
+        `aiohttp.web` request handler.
+        """
+        body = await request.read()
+        status = await self.receive(body, request.headers.get(self.signature_header))
+        return web.Response(status=status)
+
+    async def dispatch(self, event):
+        resource = event.get('resource')
+        event_type = event.get('event') or event.get('type')
+        for handler in self.get_handlers(resource, event_type):
+            result = handler(event)
+            if inspect.isawaitable(result):
+                await result
+
+    async def _get_events(self):
+        events = [await self.queue.get()]
+        if self.enricher is None:
+            return events
+        if self.queue.qsize() < self.enricher.max_batch - 1:
+            await asyncio.sleep(self.enricher.window)
+        while len(events) < self.enricher.max_batch and not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+    async def _worker(self):
+        while True:
+            events = await self._get_events()
+            try:
+                if self.enricher is not None:
+                    try:
+                        await self.enricher.enrich(events)
+                    except Exception:
+                        logger.exception('Failed to enrich %s webhook events', len(events))
+                for event in events:
+                    try:
+                        await self.dispatch(event)
+                        self.stats['processed'] += 1
+                    except Exception:
+                        self.stats['failed'] += 1
+                        logger.exception('Failed to process webhook event')
+            finally:
+                for _ in events:
+                    self.queue.task_done()
+
+    async def start(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self._queue_size)
+        self._workers = [asyncio.ensure_future(self._worker())
+                         for _ in range(self._workers_count)]
+
+    async def stop(self, timeout=None):
+        """
+        Waits until queued events are processed (up to `timeout` seconds) and stops workers.
+        """
+        if self.queue is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning('%s webhook events were not processed', self.queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def setup(self, app, path='/webhooks'):
+        """
+        Adds route and startup/cleanup hooks of receiver to `aiohttp.web.Application`.
+        """
+        app.router.add_post(path, self.handle_request)
+        app.on_startup.append(lambda app: self.start())
+        app.on_cleanup.append(lambda app: self.stop())
+        return app
@@ -0,0 +1,296 @@
+import asyncio
+import functools
+import logging
+
+from ..exceptions import SparkRateLimitExceeded, SparkResponseError
+from ..utils import _parse_retry_after
+from .people import ApiServicePeople
+
+logger = logging.getLogger(__name__)
+
+
+class BulkMembershipsMixin(object):
+    """
+    Bulk operations on memberships of a room or a team.
+
+    People are given by emails (strings with "@") or person ids. Existing memberships are
+    listed once and the changes are applied concurrently; rate limited requests are retried
+    after "Retry-After" seconds and other failures do not stop the operation but are reported.
+    """
+    bulk_concurrency = 10
+    bulk_max_attempts = 3
+    # Parameter of `list_memberships` and `create_membership` that identifies the parent (room
+    # or team) of memberships, set by subclasses.
+    _parent_param = None
+
+    @staticmethod
+    def get_person_key(person):
+        """
+        Returns ("personEmail", lowercase email) for emails and ("personId", id) for ids.
+        """
+        if '@' in person:
+            return 'personEmail', person.lower()
+        return 'personId', person
+
+    @staticmethod
+    def _index_memberships(memberships):
+        index = {}
+        for membership in memberships:
+            index[('personId', membership.get('personId'))] = membership
+            index[('personEmail', (membership.get('personEmail') or '').lower())] = membership
+        return index
+
+    async def _list_parent_memberships(self, parent_id, **kwargs):
+        params = {self._parent_param: parent_id}
+        return [membership async for membership, _ in self.list_memberships(**params, **kwargs)]
+
+    async def _get_memberships_index(self, parent_id, **kwargs):
+        return self._index_memberships(await self._list_parent_memberships(parent_id, **kwargs))
+
+    async def _apply_bulk(self, operations, concurrency=None, semaphore=None):
+        """
+        Runs operations concurrently.
+
+        :param operations: iterable of (person, coroutine function) pairs
+        :param semaphore: `asyncio.Semaphore` object shared with other operations, created
+        from `concurrency` by default
+        :return: list of (person, result or exception) pairs
+        """
+        semaphore = semaphore or asyncio.Semaphore(concurrency or self.bulk_concurrency)
+
+        async def apply(person, func):
+            attempts = 0
+            while True:
+                attempts += 1
+                async with semaphore:
+                    try:
+                        return person, await func()
+                    except SparkRateLimitExceeded as e:
+                        if attempts >= self.bulk_max_attempts:
+                            return person, e
+                        retry_after = _parse_retry_after(e.headers.get('Retry-After'), 1)
+                    except Exception as e:
+                        return person, e
+                logger.debug('Rate limited, retrying in %s seconds', retry_after)
+                await asyncio.sleep(retry_after)
+
+        return await asyncio.gather(*[apply(person, func) for person, func in operations])
+
+    async def bulk_add_members(self, parent_id, people, is_moderator=None, concurrency=None,
+                               **kwargs):
+        """
+        Adds people who are not members yet.
+
+        :param parent_id: id of the room or the team
+        :param people: iterable of emails and person ids
+        :param is_moderator: whether new members are moderators
+        :param concurrency: maximum number of concurrent requests
+        :return: dict with lists of "created" memberships, "duplicates" (people who are already
+        members) and "failed" list of (person, exception) pairs
+        """
+        index = await self._get_memberships_index(parent_id, **kwargs)
+        report = {'created': [], 'duplicates': [], 'failed': []}
+        operations = []
+        seen = set()
+        for person in people:
+            key = self.get_person_key(person)
+            if key in index or key in seen:
+                report['duplicates'].append(person)
+                continue
+            seen.add(key)
+            params = {self._parent_param: parent_id, 'is_moderator': is_moderator,
+                      'person_email' if key[0] == 'personEmail' else 'person_id': person}
+            operations.append((person, functools.partial(self.create_membership, **params,
+                                                         **kwargs)))
+        logger.debug('Adding %s members to %s', len(operations), parent_id)
+        for person, result in await self._apply_bulk(operations, concurrency):
+            if isinstance(result, SparkResponseError) and result.status == 409:
+                report['duplicates'].append(person)
+            elif isinstance(result, Exception):
+                report['failed'].append((person, result))
+            else:
+                report['created'].append(result)
+        return report
+
+    async def bulk_remove_members(self, parent_id, people, concurrency=None, **kwargs):
+        """
+        Removes memberships of people.
+
+        :param parent_id: id of the room or the team
+        :param people: iterable of emails and person ids
+        :param concurrency: maximum number of concurrent requests
+        :return: dict with lists of "deleted" memberships, "missing" (people who are not
+        members) and "failed" list of (person, exception) pairs
+        """
+        index = await self._get_memberships_index(parent_id, **kwargs)
+        report = {'deleted': [], 'missing': [], 'failed': []}
+        memberships = {}
+        deleting = set()
+        operations = []
+        for person in people:
+            membership = index.get(self.get_person_key(person))
+            if membership is None or membership['id'] in deleting:
+                report['missing'].append(person)
+                continue
+            deleting.add(membership['id'])
+            memberships[person] = membership
+            operations.append((person, functools.partial(self.delete_membership,
+                                                         membership['id'], **kwargs)))
+        logger.debug('Removing %s members from %s', len(operations), parent_id)
+        for person, result in await self._apply_bulk(operations, concurrency):
+            if isinstance(result, SparkResponseError) and result.status == 404:
+                report['missing'].append(person)
+            elif isinstance(result, Exception):
+                report['failed'].append((person, result))
+            else:
+                report['deleted'].append(memberships[person])
+        return report
+
+    async def bulk_update_moderators(self, parent_id, people, is_moderator=True,
+                                     concurrency=None, **kwargs):
+        """
+        Makes people moderators (or not moderators if `is_moderator` is False).
+
+        :param parent_id: id of the room or the team
+        :param people: iterable of emails and person ids
+        :param concurrency: maximum number of concurrent requests
+        :return: dict with lists of "updated" memberships, "unchanged" memberships, "missing"
+        (people who are not members) and "failed" list of (person, exception) pairs
+        """
+        index = await self._get_memberships_index(parent_id, **kwargs)
+        report = {'updated': [], 'unchanged': [], 'missing': [], 'failed': []}
+        operations = []
+        for person in people:
+            membership = index.get(self.get_person_key(person))
+            if membership is None:
+                report['missing'].append(person)
+            elif bool(membership.get('isModerator')) == is_moderator:
+                report['unchanged'].append(membership)
+            else:
+                operations.append((person, functools.partial(
+                    self.update_membership, membership['id'], is_moderator=is_moderator, **kwargs
+                )))
+        logger.debug('Updating %s members of %s', len(operations), parent_id)
+        for person, result in await self._apply_bulk(operations, concurrency):
+            if isinstance(result, SparkResponseError) and result.status == 404:
+                report['missing'].append(person)
+            elif isinstance(result, Exception):
+                report['failed'].append((person, result))
+            else:
+                report['updated'].append(result)
+        return report
+
+    @classmethod
+    def diff_memberships(cls, people, memberships, prune=True, keep=()):
+        """
+        Computes changes that make members of a room or a team match the desired people.
+
+        :param people: iterable of emails and person ids of desired members
+        :param memberships: iterable of existing memberships
+        :param prune: whether to delete memberships of people who are not desired
+        :param keep: iterable of emails and person ids whose memberships are never deleted
+        :return: dict with lists of people to "create", memberships to "delete" and "unchanged"
+        memberships
+        """
+        memberships = list(memberships)
+        index = cls._index_memberships(memberships)
+        kept_people = {cls.get_person_key(person) for person in keep}
+        plan = {'create': [], 'delete': [], 'unchanged': []}
+        kept = set()
+        creating = set()
+        for person in people:
+            key = cls.get_person_key(person)
+            membership = index.get(key)
+            if membership is not None:
+                if membership['id'] not in kept:
+                    kept.add(membership['id'])
+                    plan['unchanged'].append(membership)
+            elif key not in creating:
+                creating.add(key)
+                plan['create'].append(person)
+        for membership in memberships:
+            if membership['id'] in kept:
+                continue
+            protected = any(key in kept_people for key in cls._index_memberships([membership]))
+            plan['delete' if prune and not protected else 'unchanged'].append(membership)
+        return plan
+
+    async def reconcile_memberships(self, desired, prune=True, dry_run=False, concurrency=None,
+                                    **kwargs):
+        """
+        Makes members of many rooms (or teams) match the desired people.
+
+        Memberships of all rooms are listed concurrently, minimal diffs are computed (see
+        `diff_memberships`) and applied concurrently. All requests share one concurrency
+        budget. Failures do not stop the reconciliation and are reported per room. Membership
+        of the authenticated person is never deleted, so the caller does not leave rooms
+        which are missing from its desired people.
+
+        :param desired: dict of room (team) id to iterable of emails and person ids
+        :param prune: whether to delete memberships of people who are not desired
+        :param dry_run: only compute the diffs, nothing is changed
+        :param concurrency: maximum number of concurrent requests
+        :return: dict of room (team) id to report: dict with lists of "created", "deleted" and
+        "unchanged" memberships (people to create in dry run) and "failed" list of (action,
+        person or membership, exception) triples
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.bulk_concurrency)
+        keep = []
+        if prune:
+            me = await ApiServicePeople(self.http_client).me(**kwargs)
+            keep = [me['id'], *me.get('emails', ())]
+
+        async def reconcile(parent_id, people):
+            report = {'created': [], 'deleted': [], 'unchanged': [], 'failed': []}
+            try:
+                async with semaphore:
+                    memberships = await self._list_parent_memberships(parent_id, **kwargs)
+            except Exception as e:
+                logger.warning('Failed to list memberships of %s: %s', parent_id, e)
+                report['failed'].append(('list', None, e))
+                return report
+            plan = self.diff_memberships(people, memberships, prune=prune, keep=keep)
+            report['unchanged'] = plan['unchanged']
+            if dry_run:
+                report['created'] = plan['create']
+                report['deleted'] = plan['delete']
+                return report
+
+            create_operations = []
+            for person in plan['create']:
+                key = self.get_person_key(person)
+                params = {self._parent_param: parent_id,
+                          'person_email' if key[0] == 'personEmail' else 'person_id': person}
+                create_operations.append((person, functools.partial(self.create_membership,
+                                                                    **params, **kwargs)))
+            delete_operations = [
+                (membership, functools.partial(self.delete_membership, membership['id'],
+                                               **kwargs))
+                for membership in plan['delete']
+            ]
+            created, deleted = await asyncio.gather(
+                self._apply_bulk(create_operations, semaphore=semaphore),
+                self._apply_bulk(delete_operations, semaphore=semaphore),
+            )
+            for person, result in created:
+                if isinstance(result, SparkResponseError) and result.status == 409:
+                    continue
+                if isinstance(result, Exception):
+                    report['failed'].append(('create', person, result))
+                else:
+                    report['created'].append(result)
+            for membership, result in deleted:
+                if isinstance(result, Exception) and not (
+                        isinstance(result, SparkResponseError) and result.status == 404):
+                    report['failed'].append(('delete', membership, result))
+                else:
+                    report['deleted'].append(membership)
+            logger.debug('Reconciled memberships of %s: %s created, %s deleted, %s failed',
+                         parent_id, len(report['created']), len(report['deleted']),
+                         len(report['failed']))
+            return report
+
+        desired = dict(desired)
+        reports = await asyncio.gather(*[reconcile(parent_id, people)
+                                         for parent_id, people in desired.items()])
+        return dict(zip(desired, reports))
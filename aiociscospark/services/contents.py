@@ -1,6 +1,15 @@
+import asyncio
+import inspect
+import json
 import logging
+import os
 import re
 
+import aiohttp
+
+from ..cache import TTLCache
+from ..exceptions import SparkContentDownloadError
+from ..utils import _aiter
 from .service import ApiResource, ApiService
 
 logger = logging.getLogger(__name__)
@@ -8,27 +17,330 @@ logger = logging.getLogger(__name__)
 
 class ApiServiceContents(ApiService):
     _resource = ApiResource('contents', 'cursor')
+    download_chunk_size = 64 * 1024
+    download_part_size = 8 * 1024 * 1024
+    download_concurrency = 4
+    content_info_cache_size = 10000
+    content_info_cache_ttl = None
+    content_info_concurrency = 10
+
+    def __init__(self, http_client):
+        super().__init__(http_client)
+        self.content_info_cache = TTLCache(maxsize=self.content_info_cache_size,
+                                           ttl=self.content_info_cache_ttl)
+        self._content_info_pending = {}
 
     def _get_content_url(self, content_id=None, content_url=None):
         if not (content_id or content_url):
             raise ValueError('Either "content_id" or "content_url" of content is required')
         return self.get_resource_url(id_or_path=content_id) if content_id else content_url
 
+    @staticmethod
+    def _parse_content_info(headers):
+        match = re.match(r'^attachment; filename="(?P<file_name>.*?)"$',
+                         headers.get('Content-Disposition', ''))
+        content_size = headers.get('Content-Length')
+        return {
+            'content_name': match.groupdict()['file_name'] if match else None,
+            'content_size': int(content_size) if content_size is not None else None,
+            'content_type': headers.get('Content-Type'),
+        }
+
     async def get_content_info(self, content_id=None, content_url=None, **kwargs):
         logger.debug('Getting content info: content_id="%s", content_url="%s"',
                      content_id, content_url)
         url = self._get_content_url(content_id=content_id, content_url=content_url)
         resp = await self.http_client.head(url, **kwargs)
-        match = re.match(r'^attachment; filename="(?P<file_name>.*?)"$',
-                         resp.headers['Content-Disposition'])
-        return {
-            'content_name': match.groupdict()['file_name'],
-            'content_size': int(resp.headers['Content-Length']),
-            'content_type': resp.headers['Content-Type'],
-        }
+        info = self._parse_content_info(resp.headers)
+        self.content_info_cache[url] = info
+        return dict(info)
+
+    async def get_content_info_many(self, content_ids=None, content_urls=None, concurrency=None,
+                                    **kwargs):
+        """
+        Gets info of many contents concurrently.
+
+        Duplicate ids and URLs are probed once, results are stored in `content_info_cache`
+        so subsequent calls do not perform HEAD requests for already known contents.
+
+        :param content_ids: iterable of content ids
+        :param content_urls: iterable of content URLs
+        :param concurrency: maximum number of concurrent HEAD requests
+        :return: dict that maps given content ids and URLs to content info or to the exception
+        if the request for the content failed (e.g. `SparkResponseError` with status 404)
+        """
+        keys = {content_id: self._get_content_url(content_id=content_id)
+                for content_id in content_ids or ()}
+        keys.update((content_url, content_url) for content_url in content_urls or ())
+        urls = set(keys.values())
+        logger.debug('Getting info of %s contents', len(urls))
+
+        semaphore = asyncio.Semaphore(concurrency or self.content_info_concurrency)
+
+        async def probe(url):
+            async with semaphore:
+                return await self.get_content_info(content_url=url, **kwargs)
+
+        infos = await asyncio.gather(*[self._get_cached_content_info(url, probe) for url in urls],
+                                     return_exceptions=True)
+        infos = dict(zip(urls, infos))
+        failed = sum(1 for info in infos.values() if isinstance(info, Exception))
+        if failed:
+            logger.warning('Failed to get info of %s of %s contents', failed, len(urls))
+        return {key: infos[url] for key, url in keys.items()}
+
+    async def _get_cached_content_info(self, url, probe):
+        info = self.content_info_cache.get(url)
+        if info is not None:
+            return dict(info)
+        # Concurrent lookups of the same URL share a single request.
+        future = self._content_info_pending.get(url)
+        if future is None:
+            future = asyncio.ensure_future(probe(url))
+            self._content_info_pending[url] = future
+            future.add_done_callback(lambda f: self._content_info_pending.pop(url, None))
+        info = await asyncio.shield(future)
+        return dict(info)
 
     async def get_content(self, content_id=None, content_url=None, **kwargs):
         logger.debug('Getting content: content_id="%s", content_url="%s"', content_id, content_url)
         url = self._get_content_url(content_id=content_id, content_url=content_url)
         resp = await self.http_client.get(url, **kwargs)
         return await resp.text()
+
+    async def download_content(self, destination, content_id=None, content_url=None,
+                               chunk_size=None, **kwargs):
+        """
+        Streams content to the destination chunk by chunk, the whole content is never
+        loaded into memory and binary files are written as is.
+
+        :param destination: a file path, a binary file object or a (coroutine) function that
+        accepts chunks of bytes
+        :param chunk_size: size of chunks read from the response
+        :return: dict with content info (see `get_content_info`) and "bytes_written" key
+        """
+        logger.debug('Downloading content: content_id="%s", content_url="%s"',
+                     content_id, content_url)
+        url = self._get_content_url(content_id=content_id, content_url=content_url)
+        resp = await self.http_client.get(url, **kwargs)
+        try:
+            info = self._parse_content_info(resp.headers)
+            if isinstance(destination, (str, bytes, os.PathLike)):
+                info['bytes_written'] = await self._download_to_path(resp, destination,
+                                                                     chunk_size)
+            else:
+                info['bytes_written'] = await self._stream_response(resp, destination,
+                                                                    chunk_size)
+        finally:
+            resp.release()
+        return info
+
+    async def download_content_ranged(self, path, content_id=None, content_url=None,
+                                      part_size=None, concurrency=None, chunk_size=None,
+                                      **kwargs):
+        """
+        Downloads content to the file using concurrent requests for byte ranges.
+
+        The content is written to "<path>.part" and the completed ranges are recorded in
+        "<path>.part.json", so calling this method again after a failure downloads only the
+        ranges that are still missing. Falls back to a single streaming request when the
+        content is small or the server does not honor the "Range" header.
+
+        :param path: path of the destination file
+        :param part_size: size of a single byte range
+        :param concurrency: maximum number of concurrent requests
+        :return: dict with content info (see `get_content_info`) and "bytes_written" key
+        (number of bytes downloaded by this call)
+        """
+        url = self._get_content_url(content_id=content_id, content_url=content_url)
+        part_size = part_size or self.download_part_size
+        info = await self.get_content_info(content_url=url, **kwargs)
+        size = info['content_size']
+        if not size or size <= part_size:
+            return await self.download_content(path, content_url=url, chunk_size=chunk_size,
+                                               **kwargs)
+
+        logger.debug('Downloading content by ranges: url="%s", size=%s', url, size)
+        part_path = f'{path}.part'
+        state_path = f'{part_path}.json'
+        starts = set(range(0, size, part_size))
+        completed = self._load_ranges_state(part_path, state_path, size, part_size)
+        ranges = [(start, min(start + part_size, size) - 1)
+                  for start in sorted(starts - completed)]
+
+        bytes_written = 0
+        if ranges and not completed:
+            # The first range tells whether the server honors "Range" header at all.
+            start, end = ranges.pop(0)
+            resp = await self.http_client.get(url, headers={'Range': f'bytes={start}-{end}'},
+                                              **kwargs)
+            if resp.status != 206:
+                logger.debug('Range requests are not supported: url="%s"', url)
+                try:
+                    bytes_written = await self._download_to_path(resp, part_path, chunk_size)
+                finally:
+                    resp.release()
+                completed, ranges = starts, []
+            else:
+                bytes_written += await self._write_range(resp, part_path, start, end, chunk_size)
+                completed.add(start)
+                self._save_ranges_state(state_path, size, part_size, completed)
+
+        semaphore = asyncio.Semaphore(concurrency or self.download_concurrency)
+
+        async def fetch(start, end):
+            async with semaphore:
+                written = await self._fetch_range(url, part_path, start, end, chunk_size,
+                                                  **kwargs)
+            completed.add(start)
+            self._save_ranges_state(state_path, size, part_size, completed)
+            return written
+
+        results = await asyncio.gather(*[fetch(start, end) for start, end in ranges],
+                                       return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+        bytes_written += sum(results)
+
+        actual_size = os.path.getsize(part_path)
+        if completed != starts or actual_size != size:
+            raise SparkContentDownloadError(
+                f'Downloaded {actual_size} bytes, but expected {size} bytes: {url}'
+            )
+        os.replace(part_path, path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        info['bytes_written'] = bytes_written
+        return info
+
+    async def download_attachments(self, messages, store, concurrency=None, **kwargs):
+        """
+        Downloads files attached to messages into the content-addressed store.
+
+        Contents that are already in the store are not downloaded again, a file attached to
+        many messages is downloaded once and contents with the same hash are stored once.
+
+        :param messages: iterable or async iterable of messages (or pairs of (message, cursor)
+        as produced by `ApiServiceMessages.list_messages`)
+        :param store: `aiociscospark.ContentStore` object
+        :param concurrency: maximum number of concurrent downloads
+        :return: dict that maps message ids to lists of paths of stored files, a file that
+        failed to download is reported by its exception instead of the path
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.download_concurrency)
+        downloads = {}
+        manifest = {}
+
+        async def download(url):
+            try:
+                writer = store.open_writer()
+                try:
+                    info = await self.download_content(writer, content_url=url, **kwargs)
+                except BaseException:
+                    writer.discard()
+                    raise
+                return writer.commit(url, info)
+            finally:
+                semaphore.release()
+
+        try:
+            async for message in _aiter(messages):
+                if isinstance(message, tuple):
+                    message, _ = message
+                urls = message.get('files') or []
+                for url in urls:
+                    if url not in downloads and url not in store:
+                        # Stops consuming messages while all download slots are busy.
+                        await semaphore.acquire()
+                        downloads[url] = asyncio.ensure_future(download(url))
+                manifest[message['id']] = urls
+
+            logger.debug('Downloading %s attachments', len(downloads))
+            results = await asyncio.gather(*downloads.values(), return_exceptions=True)
+        finally:
+            # Downloads are not left running if consuming of messages failed.
+            pending = [task for task in downloads.values() if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        errors = {url: result for url, result in zip(downloads, results)
+                  if isinstance(result, BaseException)}
+        for url, error in errors.items():
+            logger.warning('Failed to download attachment "%s": %s', url, error)
+        return {message_id: [errors[url] if url in errors else store.get_path(url)
+                             for url in urls]
+                for message_id, urls in manifest.items()}
+
+    @staticmethod
+    def _load_ranges_state(part_path, state_path, size, part_size):
+        if os.path.exists(part_path) and os.path.exists(state_path):
+            with open(state_path) as f:
+                state = json.load(f)
+            if state.get('size') == size and state.get('part_size') == part_size:
+                return set(state['completed'])
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+        return set()
+
+    @staticmethod
+    def _save_ranges_state(state_path, size, part_size, completed):
+        tmp_path = f'{state_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'size': size, 'part_size': part_size, 'completed': sorted(completed)}, f)
+        os.replace(tmp_path, state_path)
+
+    async def _fetch_range(self, url, part_path, start, end, chunk_size=None, **kwargs):
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                resp = await self.http_client.get(url, headers={'Range': f'bytes={start}-{end}'},
+                                                  **kwargs)
+                if resp.status != 206:
+                    resp.release()
+                    raise SparkContentDownloadError(
+                        f'Range bytes={start}-{end} is not honored by server: {url}'
+                    )
+                return await self._write_range(resp, part_path, start, end, chunk_size)
+            except (aiohttp.ClientPayloadError, aiohttp.ServerDisconnectedError,
+                    asyncio.TimeoutError):
+                if self.http_client.has_no_more_attempts(attempts):
+                    raise
+                logger.warning('Retrying range bytes=%s-%s of "%s"', start, end, url)
+
+    async def _write_range(self, resp, part_path, start, end, chunk_size=None):
+        try:
+            with open(part_path, 'r+b') as f:
+                f.seek(start)
+                written = await self._stream_response(resp, f, chunk_size)
+        finally:
+            resp.release()
+        if written != end - start + 1:
+            raise SparkContentDownloadError(
+                f'Range bytes={start}-{end}: received {written} bytes of {end - start + 1}'
+            )
+        return written
+
+    async def _download_to_path(self, resp, path, chunk_size=None):
+        try:
+            with open(path, 'wb') as f:
+                return await self._stream_response(resp, f, chunk_size)
+        except BaseException:
+            # Do not leave partially downloaded files behind.
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+    async def _stream_response(self, resp, sink, chunk_size=None):
+        write = sink.write if hasattr(sink, 'write') else sink
+        if not callable(write):
+            raise TypeError(f'Unsupported destination: {sink!r}')
+        bytes_written = 0
+        async for chunk in resp.content.iter_chunked(chunk_size or self.download_chunk_size):
+            result = write(chunk)
+            if inspect.isawaitable(result):
+                await result
+            bytes_written += len(chunk)
+        return bytes_written
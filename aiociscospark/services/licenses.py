@@ -1,5 +1,6 @@
 import logging
 
+from .. import models
 from .service import ApiResource, ApiService
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,7 @@ class ApiServiceLicenses(ApiService):
     Documentation: https://developer.ciscospark.com/resource-licenses.html
     """
     _resource = ApiResource('licenses', 'cursor')
+    _model = models.License
 
     def list_licenses(self, org_id=None, limit=None, cursor=None, paginate=True, **kwargs):
         """
@@ -1,15 +1,104 @@
+import asyncio
+import collections
+import inspect
 import logging
+import mimetypes
+import mmap
+import os
+import time
 
+import aiohttp
+
+from .. import models
+from ..exceptions import SparkRateLimitExceeded, SparkResponseError, SparkResponseNotReceived
+from ..ids import parse_id
+from ..ratelimit import AdaptiveLimiter
+from ..utils import _aiter, _parse_retry_after
 from .service import ApiResource, ApiService
 
 logger = logging.getLogger(__name__)
 
+# Bytes-like sources, memory-mapped files also have `read` but are not sent as file objects.
+BUFFER_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+
+class FileUploadPayload(aiohttp.payload.Payload):
+    """
+    Streams a local file as a part of multipart/form-data request.
+
+    Supported sources are a file path, a binary file object, a bytes-like object (including
+    memory-mapped files) and an async iterable of bytes. The source is read chunk by chunk,
+    so the whole file is never loaded into memory.
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, source, *, progress=None, chunk_size=None, **kwargs):
+        super().__init__(source, **kwargs)
+        self._progress = progress
+        self._chunk_size = chunk_size or self.chunk_size
+        self._size = self._get_source_size(source)
+        self._offset = None
+        if self._is_file_object(source) and getattr(source, 'seekable', lambda: False)():
+            self._offset = source.tell()
+
+    @staticmethod
+    def _is_file_object(source):
+        return hasattr(source, 'read') and not isinstance(source, BUFFER_TYPES)
+
+    @staticmethod
+    def _get_source_size(source):
+        if isinstance(source, (str, os.PathLike)):
+            return os.path.getsize(source)
+        if FileUploadPayload._is_file_object(source):
+            try:
+                return os.fstat(source.fileno()).st_size - source.tell()
+            except (AttributeError, OSError, ValueError):
+                return None
+        if hasattr(source, '__aiter__'):
+            return None
+        return memoryview(source).nbytes
+
+    async def _iter_chunks(self):
+        source = self._value
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                for chunk in iter(lambda: f.read(self._chunk_size), b''):
+                    yield chunk
+        elif self._is_file_object(source):
+            if self._offset is not None:
+                # Allows to send the same payload again when the request is retried.
+                source.seek(self._offset)
+            for chunk in iter(lambda: source.read(self._chunk_size), b''):
+                yield chunk
+        elif hasattr(source, '__aiter__'):
+            async for chunk in source:
+                yield chunk
+        else:
+            view = memoryview(source).cast('B')
+            for offset in range(0, len(view), self._chunk_size):
+                yield bytes(view[offset:offset + self._chunk_size])
+
+    def decode(self, encoding='utf-8', errors='strict'):
+        raise TypeError('Streamed file upload can not be decoded')
+
+    async def write(self, writer):
+        bytes_sent = 0
+        async for chunk in self._iter_chunks():
+            await writer.write(chunk)
+            bytes_sent += len(chunk)
+            if self._progress is not None:
+                result = self._progress(bytes_sent, self._size)
+                if inspect.isawaitable(result):
+                    await result
+
 
 class ApiServiceMessages(ApiService):
     """
     Documentation: https://developer.ciscospark.com/resource-messages.html
     """
     _resource = ApiResource('messages', 'beforeMessage')
+    _model = models.Message
+    broadcast_concurrency = 16
 
     def list_messages(self, room_id, mentioned_people=None, before_date=None, before_message=None,
                       limit=None, cursor=None, paginate=True, **kwargs):
@@ -34,7 +123,8 @@ class ApiServiceMessages(ApiService):
         return self.get(message_id, **kwargs)
 
     def create_message(self, room_id=None, to_person_id=None, to_person_email=None,
-                       text=None, markdown=None, files=None, **kwargs):
+                       text=None, markdown=None, files=None, file=None, file_name=None,
+                       content_type=None, progress=None, **kwargs):
         """
         Create new message.
 
@@ -42,6 +132,13 @@ class ApiServiceMessages(ApiService):
         multipart/form-data request rather than JSON. If you have a file available via a
         publicly-accessible URL that you wish to share, you can use the URL as the value in the
         files JSON parameter instead of attaching your local file in a multipart message.
+
+        :param file: local file to upload (see `FileUploadPayload` for supported sources).
+        Uploads from an async iterable can not be retried by the HTTP client.
+        :param file_name: name of the uploaded file, guessed from the source by default
+        :param content_type: content type of the uploaded file, guessed from its name by default
+        :param progress: (coroutine) function called with (bytes_sent, total_bytes) while
+        the file is being uploaded, total_bytes is None if the size of the source is unknown
         """
         data = {
             'roomId': room_id,
@@ -51,9 +148,140 @@ class ApiServiceMessages(ApiService):
             'markdown': markdown,
             'files': files
         }
+        if file is not None:
+            logger.debug('Creating message with file upload: %s', data)
+            return self._post_multipart(data, file, file_name=file_name,
+                                        content_type=content_type, progress=progress, **kwargs)
         logger.debug('Creating message: %s', data)
         return self.post(data=data, **kwargs)
 
+    async def _post_multipart(self, data, file, file_name=None, content_type=None, progress=None,
+                              model=False, **kwargs):
+        if file_name is None:
+            name = file if isinstance(file, (str, os.PathLike)) else getattr(file, 'name', None)
+            file_name = os.path.basename(name) if isinstance(name, (str, os.PathLike)) else 'file'
+        content_type = content_type or mimetypes.guess_type(file_name)[0] or \
+            'application/octet-stream'
+
+        form = aiohttp.FormData()
+        for name, value in data.items():
+            if value is not None and name != 'files':
+                form.add_field(name, value)
+        payload = FileUploadPayload(file, progress=progress, filename=file_name,
+                                    content_type=content_type)
+        form.add_field('files', payload, filename=file_name)
+        body = form()
+        resp = await self.http_client.post(self.get_resource_url(), data=body,
+                                           headers={'Content-Type': body.content_type},
+                                           **kwargs)
+        data = await resp.json()
+        return self._to_model(data) if model else data
+
     def delete_message(self, message_id, **kwargs):
         logger.debug('Deleting message: %s', message_id)
         return self.delete(message_id, **kwargs)
+
+    @staticmethod
+    def get_target_params(target):
+        """
+        Returns parameters of `create_message` for the broadcast target: a dictionary of
+        parameters is returned as is, a string with "@" is an email, an id of a person is
+        a person id, any other string is a room id.
+        """
+        if isinstance(target, dict):
+            return target
+        if '@' in target:
+            return {'to_person_email': target}
+        try:
+            resource_type, _ = parse_id(target)
+        except ValueError:
+            resource_type = None
+        if resource_type == 'PEOPLE':
+            return {'to_person_id': target}
+        return {'room_id': target}
+
+    async def broadcast(self, targets, text=None, markdown=None, files=None, concurrency=None,
+                        max_attempts=3, stats=None, **kwargs):
+        """
+        Sends the same message to many targets (room ids, person ids or emails).
+
+        Messages are sent concurrently, the number of concurrent requests adapts to the rate
+        limit: it is halved and new requests wait for "Retry-After" seconds when the API responds
+        with "429 Too Many Requests", and it grows back while requests succeed. Rate limited
+        requests, server errors and connection errors are retried.
+
+        Usage::
+
+            stats = collections.Counter()
+            async for result in client.messages.broadcast(emails, text='Hello', stats=stats):
+                if result['error'] is not None:
+                    ...
+
+        :param targets: (async) iterable of targets, see `get_target_params`
+        :param concurrency: maximum number of concurrent requests or `AdaptiveLimiter` object
+        :param max_attempts: maximum number of attempts to send the message to one target
+        :param stats: `collections.Counter` object, updated with numbers of "sent", "failed",
+        "retried" and "rate_limited" messages and "elapsed" seconds
+        :return: async_generator object that produces results with keys "target", "message"
+        (created message or None), "error" (the last exception or None) and "attempts", in
+        order of completion.
+        """
+        if isinstance(concurrency, AdaptiveLimiter):
+            limiter = concurrency
+        else:
+            limiter = AdaptiveLimiter(maximum=concurrency or self.broadcast_concurrency)
+        stats = collections.Counter() if stats is None else stats
+        started_at = time.monotonic()
+
+        async def send(target):
+            params = dict(self.get_target_params(target), text=text, markdown=markdown,
+                          files=files, **kwargs)
+            result = {'target': target, 'message': None, 'error': None, 'attempts': 0}
+            while result['attempts'] < max_attempts:
+                result['attempts'] += 1
+                delay = 0
+                async with limiter:
+                    try:
+                        result['message'] = await self.create_message(**params)
+                    except SparkRateLimitExceeded as e:
+                        stats['rate_limited'] += 1
+                        limiter.on_rate_limited(_parse_retry_after(e.headers.get('Retry-After'), 0))
+                        result['error'] = e
+                    except SparkResponseError as e:
+                        if e.status < 500:
+                            result['error'] = e
+                            break
+                        result['error'] = e
+                        delay = 2 ** (result['attempts'] - 1)
+                    except (SparkResponseNotReceived, aiohttp.ClientError,
+                            asyncio.TimeoutError) as e:
+                        result['error'] = e
+                        delay = 2 ** (result['attempts'] - 1)
+                    else:
+                        limiter.on_success()
+                        result['error'] = None
+                        break
+                if result['attempts'] < max_attempts:
+                    stats['retried'] += 1
+                    logger.debug('Retrying message to %s: %s', target, result['error'])
+                    await asyncio.sleep(delay)
+            stats['failed' if result['error'] is not None else 'sent'] += 1
+            return result
+
+        pending = set()
+        try:
+            async for target in _aiter(targets):
+                if len(pending) >= limiter.maximum:
+                    done, pending = await asyncio.wait(pending,
+                                                       return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+                pending.add(asyncio.ensure_future(send(target)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            stats['elapsed'] = time.monotonic() - started_at
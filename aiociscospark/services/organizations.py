@@ -1,5 +1,6 @@
 import logging
 
+from .. import models
 from .service import ApiResource, ApiService
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,7 @@ class ApiServiceOrganizations(ApiService):
     Documentation: https://developer.ciscospark.com/resource-organizations.html
     """
     _resource = ApiResource('organizations', 'cursor')
+    _model = models.Organization
 
     def list_organizations(self, limit=None, cursor=None, paginate=True, **kwargs):
         """
@@ -1,5 +1,6 @@
 import logging
 
+from .. import models
 from .service import ApiResource, ApiService
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,8 @@ class ApiServicePeople(ApiService):
     Documentation: https://developer.ciscospark.com/resource-people.html
     """
     _resource = ApiResource('people', 'cursor')
+    _model = models.Person
+    max_ids_per_request = 85
 
     def list_people(self, email=None, display_name=None, limit=None, cursor=None,
                     paginate=True, **kwargs):
@@ -27,6 +30,18 @@ class ApiServicePeople(ApiService):
         logger.debug('Getting people using parameters: %s', params)
         return self.get_items(params, paginate=paginate, **kwargs)
 
+    def list_people_by_ids(self, person_ids, paginate=True, **kwargs):
+        """
+        List people with given ids. API accepts up to `max_ids_per_request` ids.
+
+        :return: async_generator object that produces the list of items.
+        """
+        params = {
+            'id': ','.join(person_ids),
+        }
+        logger.debug('Getting people using parameters: %s', params)
+        return self.get_items(params, paginate=paginate, **kwargs)
+
     def get_person(self, person_id, **kwargs):
         logger.debug('Getting person details: %s', person_id)
         return self.get(person_id, **kwargs)
@@ -1,5 +1,6 @@
 import logging
 
+from .. import models
 from .service import ApiResource, ApiService
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,7 @@ class ApiServiceRoles(ApiService):
     Documentation: https://developer.ciscospark.com/endpoint-rooms-get.html
     """
     _resource = ApiResource('roles', 'cursor')
+    _model = models.Role
 
     def list_roles(self, limit=None, cursor=None, paginate=True, **kwargs):
         """
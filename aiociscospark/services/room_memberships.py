@@ -1,15 +1,19 @@
 import logging
 
+from .. import models
+from .bulk import BulkMembershipsMixin
 from .service import ApiResource, ApiService
 
 logger = logging.getLogger(__name__)
 
 
-class ApiServiceRoomMemberships(ApiService):
+class ApiServiceRoomMemberships(BulkMembershipsMixin, ApiService):
     """
     Documentation: https://developer.ciscospark.com/resource-memberships.html
     """
     _resource = ApiResource('memberships', 'cursor')
+    _parent_param = 'room_id'
+    _model = models.Membership
 
     def list_memberships(self, room_id=None, person_id=None, person_email=None, limit=None,
                          cursor=None, paginate=True, **kwargs):
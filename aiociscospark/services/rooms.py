@@ -1,5 +1,6 @@
 import logging
 
+from .. import models
 from .service import ApiResource, ApiService
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,7 @@ class ApiServiceRooms(ApiService):
     Documentation: https://developer.ciscospark.com/resource-rooms.html
     """
     _resource = ApiResource('rooms', 'cursor')
+    _model = models.Room
 
     def list_rooms(self, team_id=None, room_type=None, limit=None, sort_by=None, cursor=None,
                    paginate=True, **kwargs):
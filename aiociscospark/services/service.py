@@ -1,10 +1,15 @@
+import asyncio
+import inspect
 import itertools
 import logging
 
 from collections import namedtuple
 
+from ..cache import TTLCache
 from ..constants import API_BASE_URL, API_V1
+from ..exceptions import SparkRateLimitExceeded, SparkResponseError
 from ..pagination import ResponsePaginator
+from ..utils import _aiter, _parse_retry_after
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +26,13 @@ class ApiService(object):
     _version = API_V1
     _resource = ApiResource(None, 'cursor')
     _paginator = ResponsePaginator
+    # `aiociscospark.models.Model` subclass returned when `model=True` is passed.
+    _model = None
+    cache = None
+    # `aiociscospark.IdInterner` used to intern ids of listed items.
+    id_interner = None
+    delete_concurrency = 10
+    delete_max_attempts = 3
 
     def __init__(self, http_client):
         self._resource_url = f'{self._base_url}/{self._version}/{self._resource.name}'
@@ -35,8 +47,21 @@ class ApiService(object):
             return f'{self._resource_url}/{id_or_path}'
         return self._resource_url
 
+    def enable_cache(self, maxsize=10000, ttl=None):
+        """
+        Enables cache of entities fetched by id (eg. `get_room`).
+
+        Cached entities are replaced by responses of PUT requests and evicted by DELETE requests
+        made through this service. Use `aiociscospark.CacheInvalidator` to keep the cache fresh
+        using webhook events.
+
+        :return: `aiociscospark.TTLCache` object
+        """
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        return self.cache
+
     async def request(self, method, id_or_path, params=None, data=None, json_response=True,
-                      **kwargs):
+                      model=False, **kwargs):
         """
         Performs HTTP request and returns HTTP response.
 
@@ -45,10 +70,17 @@ class ApiService(object):
         :param data: POST data as dict
         :param params: URL parameters as dict
         :param json_response: Return `aiohttp.ClientResponse` object or JSON
+        :param model: Return model (see `aiociscospark.models`) instead of dict
         :param kwargs: named arguments passed to underlying HTTP client
         :return: dict (if json_response == True) or
         HTTP Response object (eg. `aiohttp.ClientResponse`)
         """
+        cacheable = self.cache is not None and id_or_path is not None
+        if cacheable and method == 'GET' and json_response and not params:
+            cached = self.cache.get(id_or_path)
+            if cached is not None:
+                return self._to_model(cached) if model else dict(cached)
+
         resource_url = self.get_resource_url(id_or_path=id_or_path)
         normalized_params = self._normalize_params(params)
         resp = await self.http_client.request(method,
@@ -56,7 +88,17 @@ class ApiService(object):
                                               params=normalized_params,
                                               json=data,
                                               **kwargs)
-        return await resp.json() if json_response else resp
+        if cacheable and method in ('PUT', 'DELETE'):
+            self.cache.pop(id_or_path)
+        if not json_response:
+            return resp
+        data = await resp.json()
+        if cacheable and method in ('GET', 'PUT') and not params:
+            self.cache[id_or_path] = dict(data)
+        return self._to_model(data) if model else data
+
+    def _to_model(self, data):
+        return self._model(data) if self._model is not None else data
 
     @staticmethod
     def _normalize_params(d):
@@ -82,6 +124,8 @@ class ApiService(object):
             paginator = self._paginator(response)
             data = await response.json()
             items = data['items']
+            if self.id_interner is not None:
+                items = [self.id_interner.intern_item(item) for item in items]
             if self._resource.cursor:
                 cursor = paginator.get_cursor(cursor=self._resource.cursor)
                 # Instead of yielding item, yield pairs (item, cursor)
@@ -93,11 +137,101 @@ class ApiService(object):
             if has_more:
                 response = await self.http_client.get(paginator.next_url, **kwargs)
 
-    async def get_items(self, params, paginate=True, **kwargs):
+    async def get_items(self, params, paginate=True, model=False, **kwargs):
         response = await self.list(params=params, json_response=False, **kwargs)
         items = self.paginate_response(response, paginate=paginate, **kwargs)
-        async for item in items:
-            yield item
+        if not model or self._model is None:
+            async for item in items:
+                yield item
+        elif self._resource.cursor:
+            async for item, cursor in items:
+                yield self._model(item), cursor
+        else:
+            async for item in items:
+                yield self._model(item)
+
+    async def delete_items(self, items, concurrency=None, progress=None, **kwargs):
+        """
+        Deletes items concurrently while they are being listed.
+
+        Items are consumed from the stream and deleted by up to `concurrency` concurrent
+        requests, so listing of next pages goes on while items are deleted. Every item is
+        deleted only after the next item is received: the last item of a page may be the
+        cursor of the next page (e.g. "beforeMessage" of messages), so it is kept until the
+        next page is fetched. Items that are already deleted (404) are counted as "missing",
+        rate limited requests are retried after "Retry-After" seconds, other failures do not
+        stop the deletion and are reported.
+
+        Usage::
+
+            messages = client.messages.list_messages(room_id, before_date=before_date)
+            report = await client.messages.delete_items(messages, concurrency=20)
+
+        :param items: (async) iterable of ids, items or (item, cursor) pairs, e.g. `get_items`
+        :param concurrency: maximum number of concurrent requests
+        :param progress: (coroutine) function called with the report after each deleted item
+        :return: dict with numbers of "deleted" and "missing" items and "failed" list of
+        (id, exception) pairs
+        """
+        concurrency = concurrency or self.delete_concurrency
+        report = {'deleted': 0, 'missing': 0, 'failed': []}
+
+        async def delete(_id):
+            for attempt in range(1, self.delete_max_attempts + 1):
+                try:
+                    await self.delete(_id, **kwargs)
+                except SparkRateLimitExceeded as e:
+                    if attempt == self.delete_max_attempts:
+                        report['failed'].append((_id, e))
+                        break
+                    await asyncio.sleep(_parse_retry_after(e.headers.get('Retry-After'), 1))
+                except SparkResponseError as e:
+                    if e.status == 404:
+                        report['missing'] += 1
+                    else:
+                        report['failed'].append((_id, e))
+                    break
+                except Exception as e:
+                    report['failed'].append((_id, e))
+                    break
+                else:
+                    report['deleted'] += 1
+                    break
+            if progress is not None:
+                result = progress(report)
+                if inspect.isawaitable(result):
+                    await result
+
+        pending = set()
+
+        async def schedule(_id):
+            nonlocal pending
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            pending.add(asyncio.ensure_future(delete(_id)))
+
+        try:
+            previous_id = None
+            async for item in _aiter(items):
+                if isinstance(item, tuple):
+                    item, _ = item
+                if previous_id is not None:
+                    await schedule(previous_id)
+                previous_id = item if isinstance(item, str) else item['id']
+            if previous_id is not None:
+                await schedule(previous_id)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        logger.debug('Deleted %s items, %s were missing, %s failed', report['deleted'],
+                     report['missing'], len(report['failed']))
+        return report
 
     # A set of aliases to simplify usage of API client.
     def head(self, id_or_path, params=None, **kwargs):
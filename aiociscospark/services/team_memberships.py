@@ -1,15 +1,19 @@
 import logging
 
+from .. import models
+from .bulk import BulkMembershipsMixin
 from .service import ApiResource, ApiService
 
 logger = logging.getLogger(__name__)
 
 
-class ApiServiceTeamMemberships(ApiService):
+class ApiServiceTeamMemberships(BulkMembershipsMixin, ApiService):
     """
     Documentation: https://developer.ciscospark.com/resource-team-memberships.html
     """
     _resource = ApiResource('team/memberships', 'cursor')
+    _parent_param = 'team_id'
+    _model = models.TeamMembership
 
     def list_memberships(self, team_id=None, limit=None, cursor=None, paginate=True, **kwargs):
         """
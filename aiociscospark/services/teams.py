@@ -1,5 +1,6 @@
 import logging
 
+from .. import models
 from .service import ApiResource, ApiService
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,7 @@ class ApiServiceTeams(ApiService):
     Documentation: https://developer.ciscospark.com/resource-teams.html
     """
     _resource = ApiResource('teams', 'cursor')
+    _model = models.Team
 
     def list_teams(self, limit=None, cursor=None, paginate=True, **kwargs):
         """
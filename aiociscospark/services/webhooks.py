@@ -1,5 +1,7 @@
+import asyncio
 import logging
 
+from .. import models
 from .service import ApiResource, ApiService
 
 logger = logging.getLogger(__name__)
@@ -10,6 +12,10 @@ class ApiServiceWebhooks(ApiService):
     Documentation: https://developer.ciscospark.com/resource-webhooks.html
     """
     _resource = ApiResource('webhooks', 'cursor')
+    _model = models.Webhook
+    reconcile_concurrency = 10
+    # Fields that can be changed by `update_webhook`, other fields identify webhooks.
+    updatable_fields = ('targetUrl', 'secret', 'status')
 
     def list_webhooks(self, limit=None, cursor=None, paginate=True, **kwargs):
         """
@@ -41,14 +47,153 @@ class ApiServiceWebhooks(ApiService):
         logger.debug('Creating webhook: %s', data)
         return self.post(data=data, **kwargs)
 
-    def update_webhook(self, webhook_id, name=None, target_url=None, **kwargs):
+    def update_webhook(self, webhook_id, name=None, target_url=None, secret=None, status=None,
+                       **kwargs):
+        """
+        Updates the webhook, `secret` and `status` ("active" re-enables a webhook which was
+        disabled by Spark) are changed only if they are given.
+        """
         data = {
             'name': name,
             'targetUrl': target_url,
         }
+        if secret is not None:
+            data['secret'] = secret
+        if status is not None:
+            data['status'] = status
         logger.debug('Updating webhook: %s. Data: %s', webhook_id, data)
         return self.put(webhook_id, data=data, **kwargs)
 
     def delete_webhook(self, webhook_id, **kwargs):
         logger.debug('Deleting webhook: %s', webhook_id)
         return self.delete(webhook_id, **kwargs)
+
+    @staticmethod
+    def get_webhook_key(webhook):
+        """
+        Returns identity of webhook used by `reconcile`.
+        Resource, event and filter of webhooks can not be updated, so webhooks that differ by
+        them are recreated.
+        """
+        return (webhook.get('name'), webhook.get('resource'), webhook.get('event'),
+                webhook.get('filter'))
+
+    def _is_webhook_changed(self, current, desired):
+        for field in self.updatable_fields:
+            if field == 'status':
+                changed = current.get('status', 'active') != desired.get('status', 'active')
+            elif field == 'secret':
+                changed = desired.get('secret') is not None and \
+                    current.get('secret') != desired['secret']
+            else:
+                changed = current.get(field) != desired.get(field)
+            if changed:
+                return True
+        return False
+
+    def diff_webhooks(self, desired, current, prune=True):
+        """
+        Computes changes required to turn current webhooks into desired ones.
+
+        Webhooks with a different target URL or secret are updated, and so are webhooks whose
+        status differs from the desired one ("active" by default), e.g. webhooks disabled by
+        Spark after failed deliveries. The secret is compared only if it is desired, a desired
+        secret of a webhook listed without its secret is always sent.
+
+        :param desired: iterable of webhooks (dicts with "name", "targetUrl", "resource",
+        "event" and optional "filter", "secret" and "status" keys)
+        :param current: iterable of existing webhooks (as returned by `list_webhooks`)
+        :param prune: whether to delete existing webhooks that are not desired
+        :return: dict with lists of webhooks to "create", "update" (pairs of existing and
+        desired webhooks), "delete" and left "unchanged"
+        """
+        plan = {'create': [], 'update': [], 'delete': [], 'unchanged': []}
+        existing = {}
+        for webhook in current:
+            key = self.get_webhook_key(webhook)
+            if key in existing:
+                # Duplicates of the same webhook are always removed.
+                plan['delete'].append(webhook)
+            else:
+                existing[key] = webhook
+        for webhook in desired:
+            key = self.get_webhook_key(webhook)
+            current_webhook = existing.pop(key, None)
+            if current_webhook is None:
+                plan['create'].append(webhook)
+            elif self._is_webhook_changed(current_webhook, webhook):
+                plan['update'].append((current_webhook, webhook))
+            else:
+                plan['unchanged'].append(current_webhook)
+        if prune:
+            plan['delete'].extend(existing.values())
+        else:
+            plan['unchanged'].extend(existing.values())
+        return plan
+
+    async def reconcile(self, desired, prune=True, dry_run=False, concurrency=None, **kwargs):
+        """
+        Makes your webhooks match the desired set.
+
+        Lists existing webhooks once, computes a minimal diff (see `diff_webhooks`) and
+        applies creates, updates and deletes concurrently. Failed operations do not stop
+        others and are reported.
+
+        :param desired: iterable of webhooks, see `diff_webhooks`
+        :param prune: whether to delete existing webhooks that are not desired
+        :param dry_run: only compute the diff, nothing is changed
+        :param concurrency: maximum number of concurrent requests
+        :return: dict with lists of "created", "updated", "deleted" and "unchanged" webhooks
+        and "failed" list of (action, webhook, exception) triples
+        """
+        current = [webhook async for webhook, _ in self.list_webhooks(**kwargs)]
+        plan = self.diff_webhooks(desired, current, prune=prune)
+        logger.debug('Reconciling webhooks: %s to create, %s to update, %s to delete',
+                     len(plan['create']), len(plan['update']), len(plan['delete']))
+        report = {'created': [], 'updated': [], 'deleted': [], 'unchanged': plan['unchanged'],
+                  'failed': []}
+        if dry_run:
+            report['created'] = plan['create']
+            report['updated'] = [webhook for _, webhook in plan['update']]
+            report['deleted'] = plan['delete']
+            return report
+
+        semaphore = asyncio.Semaphore(concurrency or self.reconcile_concurrency)
+
+        async def apply(action, webhook, coro):
+            async with semaphore:
+                try:
+                    result = await coro
+                except Exception as e:
+                    logger.warning('Failed to %s webhook %s: %s', action, webhook.get('name'), e)
+                    report['failed'].append((action, webhook, e))
+                else:
+                    report[f'{action}d'].append(webhook if action == 'delete' else result)
+
+        coros = [
+            apply('create', webhook, self.create_webhook(
+                name=webhook.get('name'),
+                target_url=webhook.get('targetUrl'),
+                resource_type=webhook.get('resource'),
+                event_type=webhook.get('event'),
+                afilter=webhook.get('filter'),
+                secret=webhook.get('secret'),
+                **kwargs
+            ))
+            for webhook in plan['create']
+        ]
+        coros.extend(
+            apply('update', webhook, self.update_webhook(
+                current_webhook['id'],
+                name=webhook.get('name'),
+                target_url=webhook.get('targetUrl'),
+                secret=webhook.get('secret'),
+                status=webhook.get('status', 'active'),
+                **kwargs
+            ))
+            for current_webhook, webhook in plan['update']
+        )
+        coros.extend(apply('delete', webhook, self.delete_webhook(webhook['id'], **kwargs))
+                     for webhook in plan['delete'])
+        await asyncio.gather(*coros)
+        return report
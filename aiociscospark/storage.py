@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+__all__ = (
+    'ContentStore',
+)
+
+
+class ContentWriter(object):
+    """
+    Writes content to a temporary file of the store and computes its hash on the fly.
+    """
+    def __init__(self, store):
+        self._store = store
+        self._hash = hashlib.new(store.hash_name)
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.tmp_dir)
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self, content_url, info=None):
+        """
+        Moves the written content into the store and indexes it by content URL.
+
+        :return: path of the stored content
+        """
+        self._file.close()
+        digest = self._hash.hexdigest()
+        path = self._store.get_hash_path(digest)
+        if os.path.exists(path):
+            logger.debug('Content is already stored: %s', digest)
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+        self._store.add_to_index(content_url, digest, info)
+        return path
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class ContentStore(object):
+    """
+    Local content-addressed store of downloaded contents.
+
+    Contents are stored as "<root>/objects/<hash[:2]>/<hash>", so the same file posted to many
+    rooms is stored once. "<root>/index.jsonl" maps content URLs to hashes and allows to skip
+    downloading of already stored contents.
+    """
+    hash_name = 'sha256'
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        self.index_path = os.path.join(root, 'index.jsonl')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # The last line may be truncated if the process was killed.
+                        continue
+                    index[entry['url']] = entry
+        return index
+
+    def get_hash_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def get_path(self, content_url):
+        """
+        Returns path of the stored content or `None` if content is not stored.
+        """
+        entry = self._index.get(content_url)
+        if entry is not None:
+            path = self.get_hash_path(entry[self.hash_name])
+            if os.path.exists(path):
+                return path
+        return None
+
+    def get_info(self, content_url):
+        return self._index.get(content_url)
+
+    def has_hash(self, digest):
+        return os.path.exists(self.get_hash_path(digest))
+
+    def add_to_index(self, content_url, digest, info=None):
+        entry = dict(info or {}, url=content_url, **{self.hash_name: digest})
+        with open(self.index_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        self._index[content_url] = entry
+
+    def open_writer(self):
+        return ContentWriter(self)
+
+    def __contains__(self, content_url):
+        return self.get_path(content_url) is not None
+
+    def __len__(self):
+        return len(self._index)
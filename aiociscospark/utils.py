@@ -1,5 +1,7 @@
+import email.utils
 import json
 import os
+import time
 import urllib.parse
 from http.client import HTTPSConnection
 
@@ -12,6 +14,35 @@ __all__ = (
 )
 
 
+async def _aiter(iterable):
+    """
+    Iterates asynchronously over sync or async iterable.
+    """
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+def _parse_retry_after(value, default):
+    """
+    Parses "Retry-After" header, seconds or HTTP date, to seconds; returns `default` if the
+    header is missing or malformed.
+    """
+    if not value:
+        return default
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return default
+
+
 class Credentials(dict):
     """
     This class partially implements python's dictionary api.
@@ -0,0 +1,59 @@
+"""
+Compares memory used by people as dicts returned by `resp.json()` and as
+`aiociscospark.models.Person` objects.
+
+    python examples/benchmark_models.py 300000
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from aiociscospark import models
+
+
+ORG_ID = 'Y2lzY29zcGFyazovL3VzL09SR0FOSVpBVElPTi81Yzc3MWNlMy1lNTAwLTQwMDMtN3Q4Yi01ZTc1YzliYXNzOTA'
+LICENSE_ID = 'Y2lzY29zcGFyazovL3VzL0xJQ0VOU0UvNWM3NzFjZTMtZTUwMC00MDAzLTd0OGItNWU3NWM5YmFzczkw'
+
+
+def make_person(i):
+    # Every item is decoded separately, as it is done for pages of API responses.
+    return json.dumps({
+        'id': f'Y2lzY29zcGFyazovL3VzL1BFT1BMRS9mN2VyNjc1Yi0zMzlkLTVzMGQtZWM0NC1{i:08d}',
+        'emails': [f'user{i}@example.com'],
+        'displayName': f'User {i}',
+        'nickName': f'user{i}',
+        'firstName': 'User',
+        'lastName': str(i),
+        'orgId': ORG_ID,
+        'roles': [],
+        'licenses': [LICENSE_ID],
+        'created': '2017-09-30T19:37:58.808Z',
+        'lastActivity': '2017-10-10T16:22:41.502Z',
+        'status': 'active',
+        'invitePending': False,
+        'loginEnabled': True,
+        'type': 'person',
+    })
+
+
+def measure(name, raw_items, func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    items = [func(json.loads(raw)) for raw in raw_items]
+    elapsed = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:>6}: {size / 2 ** 20:8.1f} MiB, {size / len(items):6.0f} bytes/item, '
+          f'{elapsed:.2f}s')
+    return items
+
+
+def main(count):
+    raw_items = [make_person(i) for i in range(count)]
+    measure('dict', raw_items, lambda data: data)
+    measure('model', raw_items, models.Person)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if sys.argv[1:] else 300000)
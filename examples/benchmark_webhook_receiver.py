@@ -0,0 +1,55 @@
+"""
+Measures throughput of `aiociscospark.WebhookReceiver`: signature verification, parsing,
+queueing and dispatching of events to a handler on a single core.
+
+    python examples/benchmark_webhook_receiver.py 50000
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import sys
+import time
+
+import aiociscospark
+
+SECRET = b'asecret'
+
+
+def make_request(i):
+    body = json.dumps({
+        'id': 'Y2lzY29zcGFyazovL3VzL1dFQkhPT0svMjExNDE2NzEtZDJjOC00NzhjLWEwM2MtNTZlM2NiY2FiNWFj',
+        'name': 'webhook1',
+        'resource': 'messages',
+        'event': 'created',
+        'data': {
+            'id': f'message{i}',
+            'roomId': 'Y2lzY29zcGFyazovL3VzL1JPT00vYzYyMDQyYTUtYWMyMS0zZWQyLWFlMjItOGk4MXJlNjU1NTFk',
+            'personEmail': 'admin@example.com',
+        },
+    }).encode()
+    return body, hmac.new(SECRET, body, hashlib.sha1).hexdigest()
+
+
+async def main(count):
+    receiver = aiociscospark.WebhookReceiver(SECRET, queue_size=1000, workers=4)
+    handled = 0
+
+    @receiver.on('messages', 'created')
+    async def handler(event):
+        nonlocal handled
+        handled += 1
+
+    requests = [make_request(i) for i in range(count)]
+    await receiver.start()
+    started = time.perf_counter()
+    for body, signature in requests:
+        await receiver.receive(body, signature)
+    await receiver.stop()
+    elapsed = time.perf_counter() - started
+    print(f'{handled} events in {elapsed:.2f}s: {handled / elapsed:.0f} events/s')
+    print(dict(receiver.stats))
+
+
+if __name__ == '__main__':
+    asyncio.get_event_loop().run_until_complete(main(int(sys.argv[1]) if sys.argv[1:] else 50000))
@@ -97,6 +97,9 @@ setup(
     url=URL,
     packages=find_packages(exclude=('tests', 'scripts', 'examples')),
     install_requires=read_req_from_file('requirements.txt'),
+    extras_require={
+        'numpy': ['numpy'],
+    },
     tests_require=read_req_from_file('dev-requirements.txt'),
     include_package_data=True,
     license='MIT',
@@ -175,6 +175,11 @@ def webhooks_list():
     return _load_json_data_file('webhooks.json')
 
 
+@pytest.fixture
+def events_list():
+    return _load_json_data_file('events.json')
+
+
 @pytest.fixture()
 def user_info(people_list):
     # user "fulladmin"
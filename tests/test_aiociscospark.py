@@ -18,3 +18,20 @@ class TestSparkAppClient:
 def test_get_client(event_loop, credentials):
     client = aiociscospark.get_client(credentials, loop=event_loop)
     assert isinstance(client, aiociscospark.APIClient)
+
+
+def test_enable_cache(event_loop, credentials):
+    client = aiociscospark.get_client(credentials, loop=event_loop)
+    client.enable_cache(ttl=60, services=('people', 'rooms'))
+    assert isinstance(client.people.cache, aiociscospark.TTLCache)
+    assert client.rooms.cache.ttl == 60
+    assert client.messages.cache is None
+
+
+def test_intern_ids(event_loop, credentials):
+    client = aiociscospark.get_client(credentials, loop=event_loop, intern_ids=True)
+    assert isinstance(client.id_interner, aiociscospark.IdInterner)
+    assert client.people.id_interner is client.messages.id_interner is client.id_interner
+    client = aiociscospark.get_client(credentials, loop=event_loop)
+    assert client.id_interner is None
+    assert client.people.id_interner is None
@@ -0,0 +1,102 @@
+import gzip
+import os
+
+import mock
+import pytest
+
+from .context import aiociscospark
+
+
+class TestMessageArchive:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self, tmpdir):
+        self.root = str(tmpdir)
+        self.messages = {
+            'room1': [{'id': f'm{i}', 'roomId': 'room1', 'text': str(i)} for i in range(5, 0, -1)],
+            'room2': [{'id': 'x1', 'roomId': 'room2', 'files': ['url']}],
+        }
+        self.fail_after = None
+        self.client = mock.Mock()
+        self.client.messages.list_messages = mock.Mock(side_effect=self._list_messages)
+        self.client.rooms.list_rooms = mock.Mock(side_effect=self._list_rooms)
+
+    async def _list_rooms(self, **kwargs):
+        for room_id in self.messages:
+            yield {'id': room_id}, None
+
+    async def _list_messages(self, room_id, before_message=None, **kwargs):
+        if room_id not in self.messages:
+            raise aiociscospark.SparkResponseError(mock.Mock(status=404, reason='Not found'))
+        ids = [message['id'] for message in self.messages[room_id]]
+        start = ids.index(before_message) + 1 if before_message else 0
+        for count, message in enumerate(self.messages[room_id][start:]):
+            if self.fail_after is not None and count == self.fail_after:
+                raise aiociscospark.SparkResponseNotReceived('Interrupted')
+            yield message, None
+
+    def _archive(self, **kwargs):
+        archive = aiociscospark.MessageArchive(self.client, self.root, **kwargs)
+        archive.batch_size = 2
+        return archive
+
+    async def test_archive(self):
+        archive = self._archive()
+        report = await archive.archive()
+        assert report == {'archived': {'room1': 5, 'room2': 1}, 'failed': {}}
+        assert list(archive.iter_messages('room1')) == self.messages['room1']
+        with gzip.open(os.path.join(self.root, 'rooms', 'room1.jsonl.gz'), 'rt') as f:
+            assert len(f.readlines()) == 5
+        assert archive.get_checkpoint('room1') == {
+            'before_message': 'm1', 'size': os.path.getsize(archive.get_path('room1')),
+            'count': 5, 'done': True}
+        # Archived rooms are skipped.
+        report = await archive.archive(['room1', 'room3'])
+        assert report['archived'] == {'room1': 0}
+        assert list(report['failed']) == ['room3']
+
+    async def test_resume(self):
+        self.fail_after = 3
+        archive = self._archive(codec='xz')
+        report = await archive.archive(['room1'])
+        assert isinstance(report['failed']['room1'], aiociscospark.SparkResponseNotReceived)
+        checkpoint = archive.get_checkpoint('room1')
+        assert checkpoint['before_message'] == 'm4'
+        assert checkpoint['count'] == 2
+        # Data written after the checkpoint is dropped.
+        with open(archive.get_path('room1'), 'ab') as f:
+            f.write(b'garbage')
+
+        self.fail_after = None
+        report = await archive.archive(['room1'])
+        assert report['archived'] == {'room1': 3}
+        assert list(archive.iter_messages('room1')) == self.messages['room1']
+        assert self.client.messages.list_messages.call_args[1] == {'before_message': 'm4'}
+
+    async def test_attachments(self):
+        async def download_attachments(messages, store):
+            return {message['id']: [] for message in messages}
+
+        self.client.contents.download_attachments = mock.Mock(
+            side_effect=download_attachments)
+        store = mock.Mock()
+        archive = self._archive(codec='none', store=store)
+        await archive.archive_room('room2')
+        self.client.contents.download_attachments.assert_called_once_with(
+            self.messages['room2'], store)
+
+    async def test_attachments_failure(self):
+        error = aiociscospark.SparkResponseNotReceived()
+
+        async def download_attachments(messages, store):
+            return {message['id']: [error] for message in messages}
+
+        self.client.contents.download_attachments = mock.Mock(
+            side_effect=download_attachments)
+        archive = self._archive(codec='none', store=mock.Mock())
+        report = await archive.archive(['room2'])
+        assert report['failed'] == {'room2': error}
+        assert archive.get_checkpoint('room2') is None
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError):
+            self._archive(codec='unknown')
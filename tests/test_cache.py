@@ -0,0 +1,103 @@
+import pytest
+
+from .context import aiociscospark
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self):
+        self.timer = FakeTimer()
+        self.cache = aiociscospark.TTLCache(maxsize=2, ttl=10, timer=self.timer)
+
+    def test_get_and_set(self):
+        self.cache['a'] = 1
+        assert self.cache['a'] == 1
+        assert self.cache.get('b') is None
+        assert 'a' in self.cache
+        assert 'b' not in self.cache
+        with pytest.raises(KeyError):
+            self.cache['b']
+
+    def test_entries_expire(self):
+        self.cache['a'] = 1
+        self.cache.set('b', 2, ttl=20)
+        self.timer.now = 10
+        assert 'a' not in self.cache
+        assert self.cache['b'] == 2
+        assert len(self.cache) == 1
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache['a'] = 1
+        self.cache['b'] = 2
+        self.cache.get('a')
+        self.cache['c'] = 3
+        assert 'b' not in self.cache
+        assert self.cache['a'] == 1
+        assert self.cache['c'] == 3
+
+    def test_pop(self):
+        self.cache['a'] = 1
+        assert self.cache.pop('a') == 1
+        assert self.cache.pop('a', 'default') == 'default'
+        assert len(self.cache) == 0
+
+    def test_clear(self):
+        self.cache['a'] = 1
+        self.cache.clear()
+        assert len(self.cache) == 0
+
+
+class TestCacheInvalidator:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self, credentials, event_loop):
+        self.client = aiociscospark.get_client(credentials, loop=event_loop)
+        self.client.enable_cache()
+        self.invalidator = aiociscospark.CacheInvalidator(self.client)
+
+    def test_membership_events(self, events_list, room_membership_info):
+        event = events_list['items'][0]
+        membership_id = event['data']['id']
+        self.client.room_memberships.cache[membership_id] = room_membership_info
+        event['event'] = 'updated'
+        event['data']['isModerator'] = True
+        self.invalidator.handle(event)
+        assert self.client.room_memberships.cache[membership_id]['isModerator'] is True
+
+        event['event'] = 'deleted'
+        self.invalidator.handle(event)
+        assert membership_id not in self.client.room_memberships.cache
+
+    def test_membership_created_event_does_not_populate_cache(self, events_list):
+        event = events_list['items'][1]
+        self.invalidator.handle(event)
+        assert len(self.client.room_memberships.cache) == 0
+
+    def test_message_events(self, events_list, message_info, room_info):
+        event = events_list['items'][3]
+        self.client.rooms.cache[event['data']['roomId']] = room_info
+        self.client.messages.cache[event['data']['id']] = message_info
+        event['event'] = 'deleted'
+        self.invalidator.handle(event)
+        assert len(self.client.rooms.cache) == 0
+        assert len(self.client.messages.cache) == 0
+
+    def test_room_events(self, room_info):
+        self.client.rooms.cache[room_info['id']] = room_info
+        data = dict(room_info, title='New title')
+        self.invalidator.handle({'resource': 'rooms', 'event': 'updated', 'data': data})
+        assert self.client.rooms.cache[room_info['id']] == data
+
+    def test_events_are_ignored_if_cache_is_disabled(self, events_list, credentials, event_loop):
+        client = aiociscospark.get_client(credentials, loop=event_loop)
+        invalidator = aiociscospark.CacheInvalidator(client)
+        for event in events_list['items']:
+            invalidator.handle(event)
+        assert client.rooms.cache is None
@@ -0,0 +1,66 @@
+import asyncio
+
+import mock
+import pytest
+
+from .context import aiociscospark
+
+
+class TestCoalescingSender:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self, message_info):
+        self.message_info = message_info
+        self.client = mock.Mock()
+        self.client.messages.create_message = mock.Mock(side_effect=self._create_message)
+
+    async def _create_message(self, **kwargs):
+        return self.message_info
+
+    def test_merge_messages(self):
+        assert aiociscospark.merge_messages([{'text': 'a'}, {'text': 'b'}]) == {'text': 'a\nb'}
+        assert aiociscospark.merge_messages([{'text': 'a'}, {'markdown': '**b**'}]) == {
+            'markdown': 'a\n\n**b**'}
+
+    async def test_window(self):
+        sender = aiociscospark.CoalescingSender(self.client, window=0.01)
+        futures = [sender.send(room_id='room', text=str(i), return_future=True)
+                   for i in range(3)]
+        assert sender.send(to_person_email='user@example.com', text='other') is None
+        assert await asyncio.gather(*futures) == [self.message_info] * 3
+        await sender.close()
+        assert self.client.messages.create_message.call_count == 2
+        self.client.messages.create_message.assert_any_call(
+            room_id='room', to_person_id=None, to_person_email=None, text='0\n1\n2')
+        assert sender.stats == {'received': 4, 'sent': 2}
+
+    async def test_max_messages_and_length(self):
+        sender = aiociscospark.CoalescingSender(self.client, window=60, max_messages=2)
+        sender.max_length = 10
+        for text in ('a', 'b', 'c', 'd' * 10):
+            sender.send(room_id='room', text=text)
+        await asyncio.sleep(0)
+        assert self.client.messages.create_message.call_count == 2
+        await sender.close()
+        texts = [call[1]['text'] for call in self.client.messages.create_message.call_args_list]
+        assert texts == ['a\nb', 'c', 'd' * 10]
+
+    async def test_max_length_counts_separators(self):
+        sender = aiociscospark.CoalescingSender(self.client, window=60)
+        sender.max_length = 10
+        for markdown in ('**a**', '**b**'):
+            sender.send(room_id='room', markdown=markdown)
+        await sender.close()
+        markdowns = [call[1]['markdown']
+                     for call in self.client.messages.create_message.call_args_list]
+        assert markdowns == ['**a**', '**b**']
+
+    async def test_failure(self):
+        error = aiociscospark.SparkResponseError(mock.Mock(status=404, reason='Not found'))
+        self.client.messages.create_message.side_effect = error
+        sender = aiociscospark.CoalescingSender(self.client, window=60)
+        future = sender.send(room_id='room', text='a', return_future=True)
+        sender.send(room_id='room', text='b')
+        await sender.close()
+        with pytest.raises(aiociscospark.SparkResponseError):
+            await future
+        assert sender.stats['failed'] == 2
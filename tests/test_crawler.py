@@ -0,0 +1,103 @@
+import asyncio
+
+import mock
+import pytest
+
+from .context import aiociscospark
+
+ROOMS = {
+    'team1': ['room1', 'room2'],
+    'team2': ['room3'],
+}
+MEMBERS = {
+    'room1': ['alice', 'bob'],
+    'room2': ['alice'],
+    'room3': ['carol'],
+}
+
+
+class TestOrgCrawler:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self):
+        self.failing = set()
+        self.active = {'rooms': 0, 'memberships': 0}
+        self.max_active = {'rooms': 0, 'memberships': 0}
+        self.client = mock.Mock()
+        self.client.teams.list_teams = mock.Mock(side_effect=self._list_teams)
+        self.client.rooms.list_rooms = mock.Mock(side_effect=self._list_rooms)
+        self.client.room_memberships.list_memberships = mock.Mock(
+            side_effect=self._list_memberships)
+
+    async def _list(self, level, items):
+        self.active[level] += 1
+        self.max_active[level] = max(self.max_active[level], self.active[level])
+        try:
+            for item in items:
+                await asyncio.sleep(0)
+                yield item, None
+        finally:
+            self.active[level] -= 1
+
+    async def _list_teams(self, **kwargs):
+        for team_id in ROOMS:
+            yield {'id': team_id}, None
+
+    def _list_rooms(self, team_id=None, **kwargs):
+        return self._list('rooms', [{'id': room_id, 'teamId': team_id}
+                                    for room_id in ROOMS[team_id]])
+
+    def _list_memberships(self, room_id=None, **kwargs):
+        if room_id in self.failing:
+            raise aiociscospark.SparkResponseNotReceived('Failed')
+        return self._list('memberships', [{'id': f'{room_id}-{person_id}', 'roomId': room_id,
+                                           'personId': person_id}
+                                          for person_id in MEMBERS[room_id]])
+
+    async def test_crawl(self):
+        crawler = aiociscospark.OrgCrawler(self.client, concurrency=4, shares=(1, 1, 2))
+        assert crawler.limits == [1, 1, 2]
+        results = [result async for result in crawler.crawl()]
+        assert [r.item['id'] for r in results if r.level == 'teams'] == ['team1', 'team2']
+        assert sorted(r.item['id'] for r in results if r.level == 'rooms') == [
+            'room1', 'room2', 'room3']
+        memberships = [r for r in results if r.level == 'memberships']
+        assert len(memberships) == 4
+        assert all(r.parent_id == r.item['roomId'] for r in memberships)
+        assert self.max_active == {'rooms': 1, 'memberships': 2}
+        assert crawler.stats == {'teams': 2, 'rooms': 3, 'memberships': 4}
+        assert crawler.errors == []
+
+    async def test_backpressure(self):
+        crawler = aiociscospark.OrgCrawler(self.client, concurrency=4, shares=(1, 1, 2))
+        crawler.max_queued_results = 1
+        consumed = 0
+        async for _ in crawler.crawl():
+            consumed += 1
+            # Every listing waits with at most one item while the queue is full.
+            assert sum(crawler.stats.values()) - consumed <= 1 + sum(crawler.limits)
+            await asyncio.sleep(0.01)
+        assert consumed == 9
+
+    async def test_max_depth(self):
+        crawler = aiociscospark.OrgCrawler(self.client, max_depth=2)
+        results = [result async for result in crawler.crawl()]
+        assert {r.level for r in results} == {'teams', 'rooms'}
+        assert not self.client.room_memberships.list_memberships.called
+        with pytest.raises(ValueError):
+            aiociscospark.OrgCrawler(self.client, max_depth=4)
+
+    async def test_resume(self, tmpdir):
+        checkpoint = str(tmpdir.join('crawl.jsonl'))
+        self.failing = {'room2'}
+        crawler = aiociscospark.OrgCrawler(self.client, checkpoint=checkpoint)
+        results = [result async for result in crawler.crawl()]
+        assert len(results) == 2 + 3 + 3
+        assert [(level, parent_id) for level, parent_id, _ in crawler.errors] == [
+            ('memberships', 'room2')]
+
+        self.failing = set()
+        self.client.rooms.list_rooms.reset_mock()
+        crawler = aiociscospark.OrgCrawler(self.client, checkpoint=checkpoint)
+        results = [result async for result in crawler.crawl()]
+        assert not self.client.rooms.list_rooms.called
+        assert [(r.level, r.item['id']) for r in results] == [('memberships', 'room2-alice')]
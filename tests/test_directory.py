@@ -0,0 +1,78 @@
+import mock
+import pytest
+
+from .context import aiociscospark
+
+
+class TestPeopleDirectory:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self, people_list):
+        self.people = people_list['items']
+        self.client = mock.Mock()
+        self.client.people.list_people = mock.Mock(side_effect=self._list_people)
+        self.directory = aiociscospark.PeopleDirectory(self.client)
+
+    async def _list_people(self, email=None, model=False, **kwargs):
+        for person in self.people:
+            if email is None or email in person['emails']:
+                yield aiociscospark.models.Person(person) if model else person, 'cursor'
+
+    async def test_build(self, user_info):
+        await self.directory.build()
+        assert len(self.directory) == len(self.people)
+        assert user_info['id'] in self.directory
+        person = self.directory.get(user_info['id'])
+        assert isinstance(person, aiociscospark.models.Person)
+        assert person == user_info
+        assert self.directory.get_by_email(user_info['emails'][0].upper()) is person
+        assert self.directory.get('unknown') is None
+
+    async def test_search(self):
+        self.people = [
+            {'id': '1', 'displayName': 'Bob', 'emails': []},
+            {'id': '2', 'displayName': 'alice', 'emails': []},
+            {'id': '3', 'displayName': 'Alex', 'emails': []},
+            {'id': '4', 'emails': []},
+        ]
+        await self.directory.build()
+        assert [p.id for p in self.directory.search('AL')] == ['3', '2']
+        assert [p.id for p in self.directory.search('al', limit=1)] == ['3']
+        assert [p.id for p in self.directory.search('b')] == ['1']
+        assert self.directory.search('c') == []
+
+    async def test_refresh(self, user_info):
+        await self.directory.build()
+        removed = self.people[1]
+        self.people = [dict(user_info, displayName='Renamed'), self.people[2],
+                       {'id': 'new', 'displayName': 'New', 'emails': ['new@example.com']}]
+        assert await self.directory.refresh() == {'added': 1, 'changed': 1, 'removed': 1}
+        assert removed['id'] not in self.directory
+        assert self.directory.get(user_info['id']).display_name == 'Renamed'
+        assert [p.id for p in self.directory.search('renamed')] == [user_info['id']]
+        assert self.directory.search(user_info['displayName']) == []
+        assert self.directory.get_by_email('new@example.com').id == 'new'
+        assert self.directory.get_by_email(removed['emails'][0]) is None
+
+    async def test_find_person_falls_back_to_api(self, user_info):
+        email = user_info['emails'][0]
+        person = await self.directory.find_person(email)
+        assert person == user_info
+        assert await self.directory.find_person(email) is person
+        assert self.client.people.list_people.call_count == 1
+
+        assert await self.directory.find_person('unknown@example.com') is None
+        assert await self.directory.find_person('unknown@example.com') is None
+        assert self.client.people.list_people.call_count == 2
+
+    async def test_get_person_falls_back_to_api(self, user_info):
+        async def get_person(person_id, **kwargs):
+            if person_id == user_info['id']:
+                return user_info
+            raise aiociscospark.SparkResponseError(mock.Mock(status=404, reason='Not found'))
+
+        self.client.people.get_person = mock.Mock(side_effect=get_person)
+        assert await self.directory.get_person(user_info['id']) == user_info
+        assert await self.directory.get_person(user_info['id']) == user_info
+        assert await self.directory.get_person('unknown') is None
+        assert await self.directory.get_person('unknown') is None
+        assert self.client.people.get_person.call_count == 2
@@ -0,0 +1,100 @@
+import mock
+import pytest
+
+from .context import aiociscospark
+
+
+class TestEventEnricher:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self, credentials, event_loop):
+        self.client = aiociscospark.get_client(credentials, loop=event_loop)
+        self.enricher = aiociscospark.EventEnricher(self.client, window=0.01)
+
+    def test_get_references(self, events_list):
+        membership_event, message_event = events_list['items'][0], events_list['items'][3]
+        assert self.enricher.get_references(message_event) == [
+            ('message', 'messages', message_event['data']['id']),
+            ('room', 'rooms', message_event['data']['roomId']),
+            ('person', 'people', message_event['data']['personId']),
+        ]
+        assert self.enricher.get_references(membership_event) == [
+            ('room', 'rooms', membership_event['data']['roomId']),
+            ('person', 'people', membership_event['data']['personId']),
+        ]
+        assert self.enricher.get_references({'resource': 'rooms', 'data': {'id': 'room'}}) == [
+            ('room', 'rooms', 'room'),
+        ]
+
+    async def test_enrich(self, events_list, message_info, room_info, people_list):
+        events = events_list['items']
+        people = {person['id']: person for person in people_list['items']}
+
+        async def get_message(message_id):
+            return message_info
+
+        async def get_room(room_id):
+            return room_info
+
+        async def list_people_by_ids(person_ids):
+            for person_id in person_ids:
+                if person_id in people:
+                    yield people[person_id], None
+
+        with mock.patch.object(self.client.messages, 'get_message',
+                               side_effect=get_message) as get_message_mock, \
+             mock.patch.object(self.client.rooms, 'get_room',
+                               side_effect=get_room) as get_room_mock, \
+             mock.patch.object(self.client.people, 'list_people_by_ids',
+                               side_effect=list_people_by_ids) as list_people_mock:  # noqa
+            await self.enricher.enrich(events)
+
+        get_message_mock.assert_called_once_with(events[3]['data']['id'])
+        # All events refer to the same room.
+        get_room_mock.assert_called_once_with(room_info['id'])
+        list_people_mock.assert_called_once_with(
+            sorted({event['data']['personId'] for event in events})
+        )
+        assert events[3]['resolved'] == {
+            'message': message_info,
+            'room': room_info,
+            'person': people[events[3]['data']['personId']],
+        }
+        for event in events:
+            assert event['resolved']['person'] == people.get(event['data']['personId'])
+
+    async def test_enrich_resolves_missing_objects_to_none(self, events_list,
+                                                           response_not_found_error):
+        event = events_list['items'][3]
+        error = aiociscospark.SparkResponseError(mock.Mock(status=404, reason='Not found'),
+                                                 json=response_not_found_error)
+
+        async def not_found(*args):
+            raise error
+
+        async def list_people_by_ids(person_ids):
+            if False:
+                yield
+
+        with mock.patch.object(self.client.messages, 'get_message', side_effect=not_found), \
+             mock.patch.object(self.client.rooms, 'get_room', side_effect=not_found), \
+             mock.patch.object(self.client.people, 'list_people_by_ids',
+                               side_effect=list_people_by_ids):  # noqa
+            await self.enricher.enrich([event])
+        assert event['resolved'] == {'message': None, 'room': None, 'person': None}
+
+    async def test_receiver_enriches_events(self, events_list):
+        receiver = aiociscospark.WebhookReceiver(enricher=self.enricher, workers=1)
+        received = []
+        receiver.add_handler(received.append)
+
+        async def enrich(events):
+            for event in events:
+                event['resolved'] = len(events)
+
+        await receiver.start()
+        with mock.patch.object(self.enricher, 'enrich', side_effect=enrich) as enrich_mock:
+            for event in events_list['items']:
+                await receiver.enqueue(event)
+            await receiver.stop()
+        enrich_mock.assert_called_once_with(events_list['items'])
+        assert [event['resolved'] for event in received] == [4, 4, 4, 4]
@@ -0,0 +1,176 @@
+import asyncio
+import os
+
+import pytest
+
+from .context import aiociscospark
+
+
+def _event(i, event_type='created'):
+    return {'resource': 'messages', 'event': event_type, 'data': {'id': f'msg{i}'}}
+
+
+class TestEventLog:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self, tmpdir):
+        self.directory = str(tmpdir.join('log'))
+
+    def _get_log(self, **kwargs):
+        return aiociscospark.EventLog(self.directory, **kwargs)
+
+    def test_append_and_read(self):
+        log = self._get_log()
+        assert [log.append(_event(i)) for i in range(3)] == [0, 1, 2]
+        assert log.next_offset == 3
+        assert list(log.read()) == [(i, _event(i)) for i in range(3)]
+        assert list(log.read(1)) == [(1, _event(1)), (2, _event(2))]
+        assert list(log.read(1, limit=1)) == [(1, _event(1))]
+        assert list(log.read(3)) == []
+
+    def test_append_skips_duplicates(self):
+        log = self._get_log()
+        assert log.append(_event(1)) == 0
+        assert log.contains(_event(1))
+        assert log.append(_event(1)) is None
+        # The same entity with another event type is a different event.
+        assert log.append(_event(1, 'deleted')) == 1
+        assert log.next_offset == 2
+
+    def test_dedup_window(self):
+        now = [1000]
+        log = self._get_log(dedup_window=60, timer=lambda: now[0])
+        log.append(_event(0))
+        now[0] += 30
+        log.append(_event(1))
+        now[0] += 31
+        assert not log.contains(_event(0))
+        assert log.contains(_event(1))
+        # The state that returns to an earlier value after the window is not a duplicate.
+        assert log.append(_event(0)) == 2
+        log.close()
+
+        log = self._get_log(dedup_window=60, timer=lambda: now[0])
+        assert log.contains(_event(0))
+        assert log.contains(_event(1))
+        now[0] += 30
+        assert not log.contains(_event(1))
+
+    def test_segments(self):
+        log = self._get_log(segment_size=100)
+        for i in range(10):
+            log.append(_event(i))
+        assert len(log.segments) > 1
+        assert [segment.base_offset for segment in log.segments][0] == 0
+        assert list(log.read()) == [(i, _event(i)) for i in range(10)]
+        assert list(log.read(7)) == [(i, _event(i)) for i in range(7, 10)]
+
+    def test_reopen(self):
+        log = self._get_log(segment_size=100)
+        for i in range(5):
+            log.append(_event(i))
+        log.close()
+
+        log = self._get_log(segment_size=100)
+        assert log.next_offset == 5
+        assert log.append(_event(4)) is None
+        assert log.append(_event(5)) == 5
+        assert list(log.read()) == [(i, _event(i)) for i in range(6)]
+
+    def test_reopen_truncates_incomplete_record(self):
+        log = self._get_log()
+        log.append(_event(0))
+        log.append(_event(1))
+        log.close()
+        path = log.segments[-1].path
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 3)
+
+        log = self._get_log()
+        assert log.next_offset == 1
+        assert log.append(_event(1)) == 1
+        assert list(log.read()) == [(0, _event(0)), (1, _event(1))]
+
+    def test_retention_by_size(self):
+        log = self._get_log(segment_size=100, retention_bytes=250)
+        for i in range(20):
+            log.append(_event(i))
+        assert sum(segment.size for segment in log.segments) <= 250 + 100
+        assert log.first_offset > 0
+        events = list(log.read())
+        assert events[0][0] == log.first_offset
+        assert events[-1] == (19, _event(19))
+
+    def test_retention_by_age(self):
+        log = self._get_log(segment_size=100, retention_seconds=60)
+        for i in range(5):
+            log.append(_event(i))
+        old_segments = log.segments[:-1]
+        for segment in old_segments:
+            os.utime(segment.path, (0, 0))
+        log.apply_retention()
+        assert len(old_segments) > 0
+        assert len(log.segments) == 1
+        assert all(not os.path.exists(segment.path) for segment in old_segments)
+
+    async def test_follow(self):
+        log = self._get_log()
+        log.append(_event(0))
+        received = []
+
+        async def follow():
+            async for offset, event in log.follow():
+                received.append((offset, event))
+                if len(received) == 3:
+                    break
+
+        task = asyncio.ensure_future(follow())
+        await asyncio.sleep(0)
+        log.append(_event(1))
+        await asyncio.sleep(0)
+        log.append(_event(2))
+        await asyncio.wait_for(task, 1)
+        assert received == [(i, _event(i)) for i in range(3)]
+
+    async def test_follow_concurrently(self):
+        log = self._get_log()
+        log.append(_event(0))
+        received = {'a': [], 'b': []}
+        paused = asyncio.Event()
+        resume = asyncio.Event()
+
+        async def follow(name):
+            async for offset, _ in log.follow():
+                received[name].append(offset)
+                if name == 'b' and offset == 0:
+                    # Follower "b" is busy while the next event is appended.
+                    paused.set()
+                    await resume.wait()
+                if len(received[name]) == 2:
+                    break
+
+        tasks = [asyncio.ensure_future(follow(name)) for name in received]
+        await paused.wait()
+        log.append(_event(1))
+        await asyncio.sleep(0)
+        resume.set()
+        await asyncio.wait_for(asyncio.gather(*tasks), 1)
+        assert received == {'a': [0, 1], 'b': [0, 1]}
+
+
+class TestEventLogConsumer:
+    def test_poll_and_commit(self, tmpdir):
+        directory = str(tmpdir.join('log'))
+        log = aiociscospark.EventLog(directory)
+        for i in range(3):
+            log.append(_event(i))
+
+        consumer1 = log.consumer('consumer1')
+        consumer2 = log.consumer('consumer2')
+        assert consumer1.poll(limit=2) == [(0, _event(0)), (1, _event(1))]
+        consumer1.commit(1)
+        assert consumer1.poll() == [(2, _event(2))]
+        assert consumer2.poll() == [(i, _event(i)) for i in range(3)]
+
+        log.close()
+        log = aiociscospark.EventLog(directory)
+        assert log.consumer('consumer1').poll() == [(2, _event(2))]
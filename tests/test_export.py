@@ -0,0 +1,70 @@
+import pytest
+
+from .context import aiociscospark
+
+export = aiociscospark.export
+
+
+async def _aiter(items, cursor=None):
+    for item in items:
+        yield (item, cursor) if cursor is not None else item
+
+
+async def _collect(batches):
+    return [batch async for batch in batches]
+
+
+class TestIterBatches:
+    async def test_batches(self, people_list):
+        items = people_list['items']
+        batches = await _collect(export.iter_batches(_aiter(items, 'cursor'), batch_size=2))
+        assert [len(batch['id']) for batch in batches] == [2, 1]
+        assert batches[0]['id'] == [item['id'] for item in items[:2]]
+        assert batches[1]['displayName'] == [items[2]['displayName']]
+        assert set(batches[0]) == set(batches[1])
+
+    async def test_fields(self, people_list):
+        items = people_list['items']
+        batches = await _collect(export.iter_batches(_aiter(items), fields=['id', 'firstName']))
+        assert batches == [{
+            'id': [item['id'] for item in items],
+            'firstName': [None] * len(items),
+        }]
+
+    async def test_new_field_is_backfilled(self):
+        items = [{'id': '1'}, {'id': '2', 'title': 'Room'}, {'id': '3'}]
+        batches = await _collect(export.iter_batches(_aiter(items), batch_size=2))
+        assert batches == [
+            {'id': ['1', '2'], 'title': [None, 'Room']},
+            {'id': ['3'], 'title': [None]},
+        ]
+
+    async def test_model(self, people_list):
+        items = [aiociscospark.models.Person(item) for item in people_list['items']]
+        batches = await _collect(export.iter_batches(_aiter(items),
+                                                     model=aiociscospark.models.Person))
+        assert set(batches[0]) == set(aiociscospark.models.Person._keys)
+        assert batches[0]['created'] == [item['created'] for item in people_list['items']]
+
+    async def test_use_numpy(self, people_list):
+        numpy = pytest.importorskip('numpy')
+        items = people_list['items']
+        batches = await _collect(export.iter_batches(_aiter(items),
+                                                     model=aiociscospark.models.Person,
+                                                     use_numpy=True))
+        batch = batches[0]
+        assert batch['created'].dtype == numpy.dtype('datetime64[ms]')
+        assert str(batch['created'][0]) == items[0]['created'].rstrip('Z')
+        assert numpy.isnat(batch['created']).sum() == 0
+        # Booleans with missing values are not converted.
+        assert isinstance(batch['loginEnabled'], list)
+        assert isinstance(batch['id'], list)
+
+    def test_to_arrays(self):
+        numpy = pytest.importorskip('numpy')
+        arrays = export.to_arrays({'created': ['2017-09-30T19:37:58.808Z', None],
+                                   'isLocked': [True, False]},
+                                  datetime_fields=('created',))
+        assert numpy.isnat(arrays['created'][1])
+        assert arrays['isLocked'].dtype == bool
+        assert arrays['isLocked'].tolist() == [True, False]
@@ -0,0 +1,91 @@
+import mock
+import pytest
+
+from .context import aiociscospark
+
+MEMBERSHIPS = {
+    'room1': ['alice', 'bob'],
+    'room2': ['alice', 'bob', 'carol'],
+    'room3': ['carol'],
+}
+
+
+class TestMembershipGraph:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self):
+        self.rooms = [{'id': room_id, 'lastActivity': f'2017-10-1{i}T00:00:00.000Z'}
+                      for i, room_id in enumerate(MEMBERSHIPS)]
+        self.memberships = dict(MEMBERSHIPS)
+        self.client = mock.Mock()
+        self.client.rooms.list_rooms = mock.Mock(side_effect=self._list_rooms)
+        self.client.room_memberships.list_memberships = mock.Mock(
+            side_effect=self._list_memberships)
+        self.graph = aiociscospark.MembershipGraph(self.client, concurrency=2)
+
+    async def _list_rooms(self, **kwargs):
+        for room in sorted(self.rooms, key=lambda r: r['lastActivity'], reverse=True):
+            yield room, 'cursor'
+
+    async def _list_memberships(self, room_id=None, **kwargs):
+        for person_id in self.memberships[room_id]:
+            yield {'roomId': room_id, 'personId': person_id}, 'cursor'
+
+    async def test_crawl(self):
+        await self.graph.crawl()
+        assert self.client.room_memberships.list_memberships.call_count == 3
+        assert self.graph.get_room_people('room2') == {'alice', 'bob', 'carol'}
+        assert self.graph.get_person_rooms('carol') == {'room2', 'room3'}
+        assert self.graph.get_person_rooms('unknown') == set()
+        assert self.graph.is_member('room1', 'bob')
+        assert not self.graph.is_member('room3', 'bob')
+        assert not self.graph.is_member('room3', 'unknown')
+        assert self.graph.count_room_people('room2') == 3
+        assert self.graph.count_person_rooms('alice') == 2
+
+    async def test_set_queries(self):
+        await self.graph.crawl()
+        assert self.graph.shared_rooms(['alice', 'bob']) == {'room1', 'room2'}
+        assert self.graph.shared_rooms(['alice', 'carol']) == {'room2'}
+        assert self.graph.shared_rooms(['alice', 'unknown']) == set()
+        assert self.graph.shared_rooms([]) == set()
+        assert self.graph.any_rooms(['bob', 'carol']) == {'room1', 'room2', 'room3'}
+        assert self.graph.common_people(['room1', 'room2']) == {'alice', 'bob'}
+        assert self.graph.all_people(['room1', 'room3']) == {'alice', 'bob', 'carol'}
+
+    async def test_apply_event(self):
+        await self.graph.crawl()
+        self.graph.apply_event({'resource': 'memberships', 'event': 'created',
+                                'data': {'roomId': 'room3', 'personId': 'dave'}})
+        assert self.graph.get_room_people('room3') == {'carol', 'dave'}
+        self.graph.apply_event({'resource': 'memberships', 'event': 'deleted',
+                                'data': {'roomId': 'room2', 'personId': 'alice'}})
+        assert self.graph.get_person_rooms('alice') == {'room1'}
+        self.graph.apply_event({'resource': 'rooms', 'event': 'deleted', 'data': {'id': 'room1'}})
+        assert self.graph.get_person_rooms('alice') == set()
+        assert self.graph.get_room_people('room1') == set()
+
+    async def test_refresh(self):
+        await self.graph.crawl()
+        self.client.room_memberships.list_memberships.reset_mock()
+        self.rooms[0]['lastActivity'] = '2018-01-01T00:00:00.000Z'
+        self.memberships['room1'] = ['alice']
+        assert await self.graph.refresh() == ['room1']
+        self.client.room_memberships.list_memberships.assert_called_once_with(room_id='room1')
+        assert self.graph.get_room_people('room1') == {'alice'}
+        assert self.graph.get_person_rooms('bob') == {'room2'}
+        assert await self.graph.refresh() == []
+
+    async def test_refresh_retries_failed_rooms(self):
+        await self.graph.crawl()
+        self.rooms[0]['lastActivity'] = '2018-01-01T00:00:00.000Z'
+        self.memberships['room1'] = ['alice']
+        list_memberships = self.client.room_memberships.list_memberships
+        self.client.room_memberships.list_memberships = mock.Mock(
+            side_effect=aiociscospark.SparkResponseNotReceived('Failed'))
+        with pytest.raises(aiociscospark.SparkResponseNotReceived):
+            await self.graph.refresh()
+
+        self.client.room_memberships.list_memberships = list_memberships
+        assert await self.graph.refresh() == ['room1']
+        assert self.graph.get_room_people('room1') == {'alice'}
+        assert await self.graph.refresh() == []
@@ -0,0 +1,63 @@
+import uuid
+
+import pytest
+
+from .context import aiociscospark
+
+
+def test_parse_id(user_info, room_membership_info):
+    assert aiociscospark.parse_id(user_info['id']) == \
+        ('PEOPLE', 'f7er675b-339d-5s0d-ec44-c7b18f615177')
+    resource_type, value = aiociscospark.parse_id(room_membership_info['id'])
+    assert resource_type == 'MEMBERSHIP'
+    assert value.endswith(':f7er675b-339d-5s0d-ec44-c7b18f615177')
+
+
+@pytest.mark.parametrize('value', ['', 'abc', 'Y2lzY29zcGFyazovL3Vz', '@@@@'])
+def test_parse_invalid_id(value):
+    with pytest.raises(ValueError):
+        aiociscospark.parse_id(value)
+
+
+def test_decode_id(webhook_info):
+    assert aiociscospark.decode_id(webhook_info['id']) == \
+        ('WEBHOOK', uuid.UUID('21141671-d2c8-478c-a03c-56e3cbcab5ac').bytes)
+
+
+def test_decode_id_without_uuid(user_info):
+    # Ids of test data contain invalid UUIDs.
+    with pytest.raises(ValueError):
+        aiociscospark.decode_id(user_info['id'])
+
+
+def test_encode_id(webhook_info, user_info):
+    resource_type, value = aiociscospark.decode_id(webhook_info['id'])
+    assert aiociscospark.encode_id(resource_type, value) == webhook_info['id']
+    assert aiociscospark.encode_id(resource_type, uuid.UUID(bytes=value)) == webhook_info['id']
+    assert aiociscospark.encode_id(*aiociscospark.parse_id(user_info['id'])) == user_info['id']
+
+
+class TestIdInterner:
+    def test_intern(self):
+        interner = aiociscospark.IdInterner()
+        value = ''.join(['a', 'b'])
+        assert interner.intern(value) is value
+        assert interner.intern(''.join(['a', 'b'])) is value
+        assert len(interner) == 1
+        assert 'ab' in interner
+        interner.clear()
+        assert len(interner) == 0
+
+    def test_intern_item(self, room_memberships_list):
+        interner = aiociscospark.IdInterner()
+        # Copies of strings, as if every item was decoded separately.
+        items = [{key: ''.join(value) if isinstance(value, str) else value
+                  for key, value in item.items()} for item in room_memberships_list['items']]
+        for item in items:
+            assert interner.intern_item(item) is item
+        assert items == room_memberships_list['items']
+        assert items[0]['roomId'] is items[1]['roomId']
+        assert items[0]['personEmail'] not in interner
+        assert items[0]['id'] not in interner
+        assert len(interner) == len({item[key] for item in items for key in item
+                                     if key.endswith('Id')})
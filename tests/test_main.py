@@ -0,0 +1,69 @@
+import collections
+import json
+
+import mock
+import pytest
+
+from .context import aiociscospark
+from aiociscospark import __main__ as cli
+
+
+class TestCli:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self, people_list):
+        self.people = people_list['items']
+        self.client = mock.Mock()
+        self.client.people.list_people = mock.Mock(side_effect=self._list_people)
+        self.client.messages.broadcast = mock.Mock(side_effect=self._broadcast)
+        self.client.http_client.close_session = mock.Mock(return_value=None)
+
+    async def _list_people(self, **kwargs):
+        for person in self.people:
+            yield person, None
+
+    async def _broadcast(self, targets, stats=None, **kwargs):
+        for target in targets:
+            stats['sent'] += 1
+            yield {'target': target, 'message': {}, 'error': None, 'attempts': 1}
+
+    async def _run(self, argv):
+        args = cli.get_parser().parse_args(['--access-token', 'token'] + argv)
+        with mock.patch.object(aiociscospark, 'get_client',
+                               return_value=self.client) as get_client_mock:
+            stats = await cli.run(args)
+        assert get_client_mock.call_args[0][0] == {'access_token': 'token'}
+        return stats
+
+    def test_parser(self):
+        args = cli.get_parser().parse_args(['--rate', '5', 'sync-memberships', 'desired.json',
+                                            '--dry-run'])
+        assert args.func is cli.sync_memberships
+        assert args.rate == 5
+        assert args.dry_run
+        with pytest.raises(SystemExit):
+            cli.get_parser().parse_args(['broadcast', 'targets.txt'])
+        assert cli.get_parser().parse_args(['archive', 'root', '--codec', 'xz']).codec == 'xz'
+        with pytest.raises(SystemExit):
+            cli.get_parser().parse_args(['archive', 'root', '--codec', 'unknown'])
+
+    async def test_export(self, tmpdir):
+        output = str(tmpdir.join('people.jsonl'))
+        stats = await self._run(['--page-size', '100', 'export', 'people', '-o', output])
+        self.client.people.list_people.assert_called_once_with(limit=100)
+        with open(output) as f:
+            assert [json.loads(line) for line in f] == self.people
+        assert stats == collections.Counter(exported=len(self.people))
+
+    async def test_broadcast_checkpoint(self, tmpdir):
+        targets = tmpdir.join('targets.txt')
+        targets.write('a@example.com\nb@example.com\n\nc@example.com\n')
+        checkpoint = tmpdir.join('sent.txt')
+        checkpoint.write('b@example.com\n')
+        stats = await self._run(['broadcast', str(targets), '--text', 'Hello',
+                                 '--checkpoint', str(checkpoint)])
+        args, kwargs = self.client.messages.broadcast.call_args
+        assert args == (['a@example.com', 'c@example.com'],)
+        assert kwargs['text'] == 'Hello'
+        assert stats['sent'] == 2
+        assert stats['skipped'] == 1
+        assert checkpoint.read().split() == ['b@example.com', 'a@example.com', 'c@example.com']
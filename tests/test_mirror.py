@@ -0,0 +1,114 @@
+import mock
+import pytest
+
+from .context import aiociscospark
+
+
+def _list_func(items, key=None):
+    async def list_items(**kwargs):
+        for item in items:
+            if key is None or all(item.get(key[name]) == value for name, value in kwargs.items()
+                                  if name in key):
+                yield item, 'cursor'
+    return mock.Mock(side_effect=list_items)
+
+
+class TestOrgMirror:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self, people_list, rooms_list, teams_list, room_memberships_list,
+              team_memberships_list):
+        self.rooms = rooms_list['items']
+        self.client = mock.Mock()
+        self.client.people.list_people = _list_func(people_list['items'])
+        self.client.rooms.list_rooms = _list_func(self.rooms)
+        self.client.teams.list_teams = _list_func(teams_list['items'])
+        self.teams = teams_list['items']
+        self.client.room_memberships.list_memberships = _list_func(
+            room_memberships_list['items'], {'room_id': 'roomId'})
+        self.client.team_memberships.list_memberships = _list_func(
+            team_memberships_list['items'], {'team_id': 'teamId'})
+        self.mirror = aiociscospark.OrgMirror(self.client)
+
+    async def test_crawl(self, user_info, room_membership_info, team_info):
+        await self.mirror.crawl()
+        assert self.client.room_memberships.list_memberships.call_count == len(self.rooms)
+        assert self.mirror.get_person(user_info['id']) == user_info
+        assert self.mirror.find_person(user_info['emails'][0].upper()) == user_info
+
+        room_id = room_membership_info['roomId']
+        members = self.mirror.get_room_members(room_id)
+        assert len(members) == 3
+        assert room_membership_info in members
+        assert self.mirror.is_member(room_id, person_id=room_membership_info['personId'])
+        assert self.mirror.is_member(room_id, person_email=room_membership_info['personEmail'])
+        assert not self.mirror.is_member(self.rooms[0]['id'],
+                                         person_id=room_membership_info['personId'])
+
+        rooms = self.mirror.get_person_rooms(person_id=room_membership_info['personId'])
+        assert [room['id'] for room in rooms] == [room_id]
+        assert self.mirror.get_room_team(room_id) == self.teams[1]
+        assert self.mirror.get_room_team(self.rooms[0]['id']) is None
+        assert self.mirror.get_team(team_info['id']) == team_info
+        assert [room['id'] for room in self.mirror.get_team_rooms(team_info['id'])] == \
+            [self.rooms[2]['id']]
+        assert len(self.mirror.get_team_members(team_info['id'])) == 3
+
+    async def test_refresh(self):
+        await self.mirror.crawl(people=False)
+        assert self.client.people.list_people.call_count == 0
+
+        self.client.room_memberships.list_memberships.reset_mock()
+        updated_room = dict(self.rooms[1], lastActivity='2018-01-01T00:00:00.000Z')
+        # Rooms are listed from the most recently active.
+        self.client.rooms.list_rooms = _list_func([updated_room, *self.rooms[:1],
+                                                   *self.rooms[2:]])
+        assert await self.mirror.refresh() == [updated_room['id']]
+        self.client.rooms.list_rooms.assert_called_once_with(sort_by='lastactivity')
+        self.client.room_memberships.list_memberships.assert_called_once_with(
+            room_id=updated_room['id'])
+        assert self.mirror.get_room(updated_room['id']) == updated_room
+
+    async def test_refresh_retries_failed_rooms(self):
+        await self.mirror.crawl(people=False)
+        list_memberships = self.client.room_memberships.list_memberships
+        updated_room = dict(self.rooms[1], lastActivity='2018-01-01T00:00:00.000Z')
+        self.client.rooms.list_rooms = _list_func([updated_room, *self.rooms[:1],
+                                                   *self.rooms[2:]])
+        self.client.room_memberships.list_memberships = mock.Mock(
+            side_effect=aiociscospark.SparkResponseNotReceived('Failed'))
+        with pytest.raises(aiociscospark.SparkResponseNotReceived):
+            await self.mirror.refresh()
+
+        # Activity moved forward by webhook events does not hide changed rooms.
+        self.mirror.apply_event({'resource': 'messages', 'event': 'created',
+                                 'data': {'id': 'message', 'roomId': self.rooms[0]['id'],
+                                          'created': '2018-02-01T00:00:00.000Z'}})
+        self.client.room_memberships.list_memberships = list_memberships
+        list_memberships.reset_mock()
+        assert await self.mirror.refresh() == [updated_room['id']]
+        list_memberships.assert_called_once_with(room_id=updated_room['id'])
+        assert await self.mirror.refresh() == []
+
+    async def test_apply_event(self, events_list, room_membership_info):
+        await self.mirror.crawl()
+        room_id = room_membership_info['roomId']
+        self.mirror.apply_event({'resource': 'memberships', 'event': 'deleted',
+                                 'data': room_membership_info})
+        assert room_membership_info not in self.mirror.get_room_members(room_id)
+        self.mirror.apply_event({'resource': 'memberships', 'event': 'created',
+                                 'data': room_membership_info})
+        assert room_membership_info in self.mirror.get_room_members(room_id)
+
+        room = dict(self.rooms[0], title='New title')
+        self.mirror.apply_event({'resource': 'rooms', 'event': 'updated', 'data': room})
+        assert self.mirror.get_room(room['id']) == room
+
+        self.mirror.apply_event({'resource': 'messages', 'event': 'created',
+                                 'data': {'id': 'message', 'roomId': room_id,
+                                          'created': '2018-01-01T00:00:00.000Z'}})
+        row = self.mirror.db.execute('SELECT last_activity FROM rooms WHERE id = ?', (room_id,))
+        assert row.fetchone() == ('2018-01-01T00:00:00.000Z',)
+
+        self.mirror.apply_event({'resource': 'rooms', 'event': 'deleted', 'data': {'id': room_id}})
+        assert self.mirror.get_room(room_id) is None
+        assert self.mirror.get_room_members(room_id) == []
@@ -0,0 +1,81 @@
+import datetime
+
+import pytest
+
+from .context import aiociscospark
+
+models = aiociscospark.models
+
+
+def test_parse_datetime():
+    utc = datetime.timezone.utc
+    assert models.parse_datetime('2017-09-30T19:37:58.808Z') == \
+        datetime.datetime(2017, 9, 30, 19, 37, 58, 808000, tzinfo=utc)
+    assert models.parse_datetime('2017-09-30T19:37:58Z') == \
+        datetime.datetime(2017, 9, 30, 19, 37, 58, tzinfo=utc)
+    assert models.parse_datetime(None) is None
+
+
+class TestModel:
+    def test_fields(self, user_info):
+        person = models.Person(user_info)
+        assert not hasattr(person, '__dict__')
+        assert person.id == user_info['id']
+        assert person.display_name == user_info['displayName']
+        assert person.emails == user_info['emails']
+        assert person.invite_pending is False
+        assert person.first_name is None
+        assert person.extra is None
+
+    def test_shared_fields_are_interned(self, user_info):
+        # Decoded JSON contains separate copies of equal strings.
+        person1 = models.Person(dict(user_info, orgId=''.join(user_info['orgId'])))
+        person2 = models.Person(dict(user_info, orgId=''.join(user_info['orgId'])))
+        assert person1.org_id is person2.org_id
+        assert person1.licenses[0] is person2.licenses[0]
+
+    def test_datetime_fields(self, user_info):
+        person = models.Person(user_info)
+        assert person.created == models.parse_datetime(user_info['created'])
+        assert person.created is person.created
+        assert person['created'] == user_info['created']
+
+    def test_uuid(self, user_info):
+        person = models.Person(user_info)
+        assert person.uuid == 'f7er675b-339d-5s0d-ec44-c7b18f615177'
+        assert models.Person({}).uuid is None
+
+    def test_dict_access(self, user_info):
+        person = models.Person(dict(user_info, phoneNumbers=[]))
+        assert person['displayName'] == user_info['displayName']
+        assert person.get('firstName', 'default') == 'default'
+        assert person['phoneNumbers'] == []
+        assert 'displayName' in person
+        assert 'firstName' not in person
+        with pytest.raises(KeyError):
+            person['unknown']
+
+    def test_to_dict(self, user_info):
+        person = models.Person(user_info)
+        assert person.to_dict() == user_info
+        assert person == user_info
+        assert person == models.Person(user_info)
+        assert person != models.Person(dict(user_info, displayName='Another'))
+
+    @pytest.mark.parametrize('model_class, fixture_name', [
+        (models.License, 'licenses_list'),
+        (models.Membership, 'room_memberships_list'),
+        (models.Message, 'messages_list'),
+        (models.Organization, 'organizations_list'),
+        (models.Person, 'people_list'),
+        (models.Role, 'roles_list'),
+        (models.Room, 'rooms_list'),
+        (models.Team, 'teams_list'),
+        (models.TeamMembership, 'team_memberships_list'),
+        (models.Webhook, 'webhooks_list'),
+    ])
+    def test_models_cover_api_fields(self, request, model_class, fixture_name):
+        for item in request.getfixturevalue(fixture_name)['items']:
+            obj = model_class(item)
+            assert obj.extra is None
+            assert obj.to_dict() == item
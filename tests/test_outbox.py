@@ -0,0 +1,92 @@
+import mock
+import pytest
+
+from .context import aiociscospark
+
+
+class TestOutbox:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self, tmpdir, message_info):
+        self.path = str(tmpdir.join('outbox.sqlite'))
+        self.message_info = message_info
+        self.errors = []
+        self.sent = []
+        self.client = mock.Mock()
+        self.client.messages.create_message = mock.Mock(side_effect=self._create_message)
+        self.outbox = aiociscospark.Outbox(self.client, self.path, workers=2)
+        self.outbox.retry_delay = 0
+
+    async def _create_message(self, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append(kwargs)
+        return self.message_info
+
+    async def test_enqueue_and_drain(self):
+        assert self.outbox.enqueue(room_id='room', text='one', key='1') is not None
+        assert self.outbox.enqueue(room_id='room', text='one', key='1') is None
+        self.outbox.enqueue(to_person_email='user@example.com', markdown='**two**')
+        assert self.outbox.metrics()['pending'] == 2
+        await self.outbox.drain()
+        assert sorted(self.sent, key=len) == [
+            {'room_id': 'room', 'text': 'one'},
+            {'to_person_email': 'user@example.com', 'markdown': '**two**'},
+        ]
+        state = self.outbox.get('1')
+        assert state['status'] == 'sent'
+        assert state['message_id'] == self.message_info['id']
+        metrics = self.outbox.metrics()
+        assert metrics['sent'] == 2
+        assert metrics['pending'] == 0
+        assert metrics['oldest_pending_age'] == 0
+        # Sent messages are not queued again.
+        assert self.outbox.enqueue(room_id='room', text='one', key='1') is None
+
+    async def test_retries(self):
+        self.errors = [
+            aiociscospark.SparkRateLimitExceeded(
+                mock.Mock(status=429, reason='Too Many Requests', headers={'Retry-After': '0'})),
+            aiociscospark.SparkResponseError(
+                mock.Mock(status=503, reason='Service Unavailable', headers={})),
+        ]
+        self.outbox.enqueue(room_id='room', text='one', key='1')
+        await self.outbox.drain()
+        state = self.outbox.get('1')
+        assert state['status'] == 'sent'
+        assert state['attempts'] == 2
+
+    async def test_failure(self):
+        self.errors = [aiociscospark.SparkResponseError(
+            mock.Mock(status=404, reason='Not found', headers={}))]
+        self.outbox.enqueue(room_id='room', text='one', key='1')
+        await self.outbox.drain()
+        assert self.outbox.get('1')['status'] == 'failed'
+        assert self.outbox.metrics()['failed'] == 1
+
+    async def test_unexpected_errors(self):
+        self.outbox.workers = 1
+        self.errors = [
+            aiociscospark.SparkRateLimitExceeded(mock.Mock(
+                status=429, reason='Too Many Requests',
+                headers={'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})),
+            ValueError('bug'),
+        ]
+        self.outbox.enqueue(room_id='room', text='one', key='1')
+        self.outbox.enqueue(room_id='room', text='two', key='2')
+        await self.outbox.drain()
+        states = sorted((self.outbox.get(key) for key in '12'), key=lambda state: state['status'])
+        assert [state['status'] for state in states] == ['failed', 'sent']
+        assert states[0]['error'] == "ValueError('bug')"
+        assert self.outbox.metrics()['sending'] == 0
+
+    async def test_recovery(self):
+        self.outbox.enqueue(room_id='room', text='one', key='1')
+        self.outbox.enqueue(room_id='room', text='two', key='2')
+        self.outbox._claim()
+        self.outbox.close()
+
+        outbox = aiociscospark.Outbox(self.client, self.path)
+        assert outbox.metrics()['pending'] == 2
+        await outbox.drain()
+        assert [kwargs['text'] for kwargs in self.sent] == ['one', 'two']
+        assert outbox.purge(older_than=-1) == 2
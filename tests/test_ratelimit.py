@@ -0,0 +1,71 @@
+import asyncio
+
+from .context import aiociscospark
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter:
+    async def test_acquire(self, monkeypatch):
+        timer = FakeTimer()
+        sleeps = []
+
+        async def sleep(seconds):
+            sleeps.append(seconds)
+            timer.now += seconds
+
+        monkeypatch.setattr(asyncio, 'sleep', sleep)
+        limiter = aiociscospark.RateLimiter(2, burst=2, timer=timer)
+        for _ in range(4):
+            await limiter.acquire()
+        assert sleeps == [0.5, 0.5]
+
+    async def test_pause(self, monkeypatch):
+        timer = FakeTimer()
+        sleeps = []
+
+        async def sleep(seconds):
+            sleeps.append(seconds)
+            timer.now += seconds
+
+        monkeypatch.setattr(asyncio, 'sleep', sleep)
+        limiter = aiociscospark.RateLimiter(10, timer=timer)
+        limiter.pause(3)
+        await limiter.acquire()
+        assert sleeps == [3]
+
+
+class TestAdaptiveLimiter:
+    async def test_limit(self):
+        limiter = aiociscospark.AdaptiveLimiter(initial=2, maximum=3)
+        active = []
+
+        async def run():
+            async with limiter:
+                active.append(limiter._active)
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*[run() for _ in range(5)])
+        assert max(active) == 2
+        assert limiter._active == 0
+
+    def test_on_success_and_rate_limited(self):
+        timer = FakeTimer()
+        limiter = aiociscospark.AdaptiveLimiter(initial=2, minimum=1, maximum=3, timer=timer)
+        for _ in range(2):
+            limiter.on_success()
+        assert limiter.limit == 3
+        for _ in range(10):
+            limiter.on_success()
+        assert limiter.limit == 3
+        limiter.on_rate_limited(5)
+        assert limiter.limit == 1
+        assert limiter._paused_until == 5
+        limiter.on_rate_limited()
+        assert limiter.limit == 1
@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import hmac
+import json
+
+import pytest
+
+from .context import aiociscospark
+
+
+def _sign(secret, body):
+    return hmac.new(secret.encode(), body, hashlib.sha1).hexdigest()
+
+
+class TestWebhookReceiver:
+    secret = 'asecret'
+
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self):
+        self.receiver = aiociscospark.WebhookReceiver(self.secret, queue_size=2, workers=2,
+                                                      enqueue_timeout=0.01)
+
+    def test_verify_signature(self):
+        body = b'{}'
+        assert self.receiver.verify_signature(body, _sign(self.secret, body))
+        assert not self.receiver.verify_signature(body, _sign('another', body))
+        assert not self.receiver.verify_signature(body, None)
+
+    def test_verify_signature_without_secret(self):
+        receiver = aiociscospark.WebhookReceiver()
+        assert receiver.verify_signature(b'{}', None)
+
+    def test_get_handlers(self):
+        def handler1(event):
+            pass
+
+        def handler2(event):
+            pass
+
+        def handler3(event):
+            pass
+
+        self.receiver.add_handler(handler1, 'messages', 'created')
+        self.receiver.add_handler(handler2, 'messages')
+        self.receiver.on()(handler3)
+        assert self.receiver.get_handlers('messages', 'created') == [handler1, handler2, handler3]
+        assert self.receiver.get_handlers('messages', 'deleted') == [handler2, handler3]
+        assert self.receiver.get_handlers('rooms', 'created') == [handler3]
+
+    async def test_receive(self, events_list):
+        received = []
+        memberships = []
+
+        @self.receiver.on()
+        async def handler(event):
+            received.append(event)
+
+        @self.receiver.on('memberships', 'created')
+        def memberships_handler(event):
+            memberships.append(event)
+
+        await self.receiver.start()
+        for event in events_list['items']:
+            body = json.dumps(event).encode()
+            assert await self.receiver.receive(body, _sign(self.secret, body)) == 200
+        await self.receiver.stop()
+        assert sorted(e['id'] for e in received) == sorted(e['id'] for e in events_list['items'])
+        assert len(memberships) == 3
+        assert self.receiver.stats == {'received': 4, 'queued': 4, 'processed': 4}
+
+    async def test_receive_rejects_invalid_requests(self):
+        await self.receiver.start()
+        assert await self.receiver.receive(b'{}', 'invalid') == 401
+        assert await self.receiver.receive(b'{', _sign(self.secret, b'{')) == 400
+        await self.receiver.stop()
+        assert self.receiver.stats == {'received': 2, 'rejected': 2}
+
+    async def test_receive_drops_event_if_queue_is_full(self):
+        release = asyncio.Event()
+
+        @self.receiver.on()
+        async def handler(event):
+            await release.wait()
+
+        await self.receiver.start()
+        body = b'{}'
+        signature = _sign(self.secret, body)
+        # Two events are being handled by workers and two are waiting in the queue.
+        statuses = [await self.receiver.receive(body, signature) for _ in range(5)]
+        release.set()
+        await self.receiver.stop()
+        assert statuses == [200, 200, 200, 200, 503]
+        assert self.receiver.stats['dropped'] == 1
+        assert self.receiver.stats['processed'] == 4
+
+    async def test_failed_handler_does_not_stop_workers(self):
+        @self.receiver.on()
+        def handler(event):
+            raise ValueError
+
+        await self.receiver.start()
+        body = b'{}'
+        for _ in range(3):
+            await self.receiver.receive(body, _sign(self.secret, body))
+        await self.receiver.stop()
+        assert self.receiver.stats['failed'] == 3
+
+    async def test_receive_skips_duplicates(self, events_list, tmpdir):
+        event_log = aiociscospark.EventLog(str(tmpdir.join('log')))
+        receiver = aiociscospark.WebhookReceiver(event_log=event_log)
+        received = []
+        receiver.add_handler(received.append)
+
+        await receiver.start()
+        for event in events_list['items'] + events_list['items'][:2]:
+            assert await receiver.receive(json.dumps(event).encode()) == 200
+        await receiver.stop()
+        assert len(received) == len(events_list['items'])
+        assert receiver.stats['duplicates'] == 2
+        assert [event for _, event in event_log.read()] == events_list['items']
@@ -1,4 +1,8 @@
+import asyncio
+import collections
+import io
 import json
+import mmap
 import mock
 import pytest
 
@@ -59,6 +63,27 @@ class TestBaseApiService:
                                                          params={'email': 'admin@example.com'},
                                                          json=None, **{'timeout': 10})
 
+    async def test_request_uses_cache(self, test_url, response_headers, user_info):
+        self.svc.enable_cache()
+        person_id = user_info['id']
+        with aioresponses() as m, \
+             mock.patch.object(self.svc.http_client, 'request',
+                               side_effect=self.svc.http_client.request) as req_mock:  # noqa
+            m.get(f'{test_url}/{person_id}', headers=response_headers, payload=user_info)
+            data1 = await self.svc.request('GET', person_id)
+            data2 = await self.svc.request('GET', person_id)
+            assert req_mock.call_count == 1
+            assert data1 == data2 == user_info
+
+            m.put(f'{test_url}/{person_id}', headers=response_headers,
+                  payload=dict(user_info, displayName='New name'))
+            await self.svc.request('PUT', person_id, data={'displayName': 'New name'})
+            assert self.svc.cache[person_id]['displayName'] == 'New name'
+
+            m.delete(f'{test_url}/{person_id}', status=204, headers=response_headers)
+            await self.svc.request('DELETE', person_id, json_response=False)
+            assert person_id not in self.svc.cache
+
     async def test_paginate_response(self, test_url, people_list, response_headers):
         items = people_list['items']
         cursor = 'cursor='
@@ -118,6 +143,35 @@ class TestBaseApiService:
                 data.append(item)
         assert data == items[:2]
 
+    async def test_paginate_response_interns_ids(self, test_url, room_memberships_list,
+                                                 response_headers):
+        self.svc.id_interner = aiociscospark.IdInterner()
+        items = room_memberships_list['items']
+        with aioresponses() as m:
+            m.get(f'{test_url}', headers=response_headers, payload={'items': items})
+            resp = await self.svc.request('GET', None, json_response=False)
+            data = [item async for item, _ in self.svc.paginate_response(resp)]
+        assert data == items
+        assert data[0]['roomId'] is data[1]['roomId']
+        assert data[0]['personId'] in self.svc.id_interner
+
+    async def test_get_items_returns_models(self, test_url, people_list, response_headers):
+        self.svc._model = aiociscospark.models.Person
+        items = people_list['items']
+        with aioresponses() as m:
+            m.get(f'{test_url}', headers=response_headers, payload={'items': items})
+            data = [(item, cursor) async for item, cursor in self.svc.get_items({}, model=True)]
+        assert all(isinstance(item, aiociscospark.models.Person) for item, _ in data)
+        assert [item.to_dict() for item, _ in data] == items
+
+    async def test_request_returns_model(self, test_url, response_headers, user_info):
+        self.svc._model = aiociscospark.models.Person
+        with aioresponses() as m:
+            m.get(f'{test_url}/me', headers=response_headers, payload=user_info)
+            person = await self.svc.request('GET', 'me', model=True)
+        assert isinstance(person, aiociscospark.models.Person)
+        assert person.to_dict() == user_info
+
     # Test that aliases pass correct signature to underlying request function.
     def test_head(self):
         id_or_path = None
@@ -179,6 +233,55 @@ class TestBaseApiService:
         svc_request_mock.assert_called_once_with('DELETE', id_or_path, data=None, params=params,
                                                  json_response=False, **kwargs)
 
+    async def test_delete_items(self):
+        not_found_error = aiociscospark.SparkResponseError(
+            mock.Mock(status=404, reason='Not found'))
+        bad_request_error = aiociscospark.SparkResponseError(mock.Mock(status=400, reason='Bad'))
+        rate_limit_error = aiociscospark.SparkRateLimitExceeded(
+            mock.Mock(status=429, reason='Too Many Requests', headers={'Retry-After': '0'}))
+        errors = {'2': [not_found_error], '3': [bad_request_error], '4': [rate_limit_error]}
+
+        async def delete(_id, **kwargs):
+            if errors.get(_id):
+                raise errors[_id].pop(0)
+
+        async def list_items():
+            for _id in ('1', '2', '3', '4', '5'):
+                yield {'id': _id}, 'cursor'
+
+        progress = mock.Mock()
+        with mock.patch.object(self.svc, 'delete', side_effect=delete) as delete_mock:
+            report = await self.svc.delete_items(list_items(), concurrency=2, progress=progress,
+                                                 timeout=300)
+        assert delete_mock.call_count == 6
+        delete_mock.assert_any_call('1', timeout=300)
+        assert report == {'deleted': 3, 'missing': 1, 'failed': [('3', bad_request_error)]}
+        assert progress.call_count == 5
+
+        with mock.patch.object(self.svc, 'delete', side_effect=delete) as delete_mock:
+            report = await self.svc.delete_items(['6', '7'])
+        assert report['deleted'] == 2
+
+    async def test_delete_items_after_next_item_is_listed(self):
+        deleted = []
+
+        async def delete(_id, **kwargs):
+            deleted.append(_id)
+
+        async def list_items():
+            previous_id = None
+            for _id in ('1', '2', '3', '4'):
+                # Fetching of the next page uses the last item of the previous one as cursor.
+                await asyncio.sleep(0)
+                assert previous_id not in deleted
+                yield {'id': _id}, previous_id
+                previous_id = _id
+
+        with mock.patch.object(self.svc, 'delete', side_effect=delete):
+            report = await self.svc.delete_items(list_items(), concurrency=10)
+        assert report['deleted'] == 4
+        assert sorted(deleted) == ['1', '2', '3', '4']
+
 
 class BaseTestApiService:
     svc_class = None
@@ -219,6 +322,42 @@ class TestApiServiceContents(BaseTestApiService):
             'content_type': 'text/plain'
         }
 
+    async def test_get_content_info_many(self, api_base_url, file_content_headers):
+        content_ids = ['content_id1', 'content_id2', 'content_id1']
+        content_url = f'{api_base_url}/contents/content_id2'
+        with aioresponses() as m, \
+             mock.patch.object(self.svc.http_client, 'head',
+                               side_effect=self.svc.http_client.head) as req_mock:  # noqa
+            m.head(f'{api_base_url}/contents/content_id1', headers=file_content_headers)
+            m.head(content_url, headers=file_content_headers)
+            data = await self.svc.get_content_info_many(content_ids=content_ids,
+                                                        content_urls=[content_url])
+            # Cached info is returned without extra HEAD requests.
+            data_cached = await self.svc.get_content_info_many(content_ids=content_ids[:1])
+        info = {
+            'content_name': 'file.txt',
+            'content_size': 33464,
+            'content_type': 'text/plain'
+        }
+        assert data == {'content_id1': info, 'content_id2': info, content_url: info}
+        assert data_cached == {'content_id1': info}
+        assert req_mock.call_count == 2
+
+    async def test_get_content_info_many_failures(self, api_base_url):
+        not_found_error = aiociscospark.SparkResponseError(
+            mock.Mock(status=404, reason='Not found'))
+        info = {'content_name': 'file.txt', 'content_size': 1, 'content_type': 'text/plain'}
+
+        async def get_content_info(content_url, **kwargs):
+            if content_url.endswith('missing'):
+                raise not_found_error
+            return info
+
+        with mock.patch.object(self.svc, 'get_content_info', side_effect=get_content_info):
+            data = await self.svc.get_content_info_many(content_ids=['content_id', 'missing'])
+        assert data == {'content_id': info, 'missing': not_found_error}
+        assert f'{api_base_url}/contents/missing' not in self.svc.content_info_cache
+
     async def test_get_content(self, api_base_url, file_content_headers):
         content_id = 'content_id'
         url = f'{api_base_url}/contents/{content_id}'
@@ -232,6 +371,196 @@ class TestApiServiceContents(BaseTestApiService):
         req_mock.assert_called_once_with(url, **kwargs)
         assert data == content_text
 
+    async def test_download_content_to_path(self, tmpdir, api_base_url, file_content_headers):
+        content_id = 'content_id'
+        url = f'{api_base_url}/contents/{content_id}'
+        content = bytes(range(256)) * 10
+        file_content_headers['Content-Length'] = str(len(content))
+        path = str(tmpdir.join('file.bin'))
+        with aioresponses() as m:
+            m.get(url, headers=file_content_headers, body=content)
+            data = await self.svc.download_content(path, content_id=content_id, chunk_size=100)
+        assert data == {
+            'content_name': 'file.txt',
+            'content_size': len(content),
+            'content_type': 'text/plain',
+            'bytes_written': len(content),
+        }
+        with open(path, 'rb') as f:
+            assert f.read() == content
+
+    async def test_download_content_to_file_object(self, api_base_url, file_content_headers):
+        content_id = 'content_id'
+        url = f'{api_base_url}/contents/{content_id}'
+        content = b'\x00\xff' * 1000
+        f = io.BytesIO()
+        with aioresponses() as m:
+            m.get(url, headers=file_content_headers, body=content)
+            data = await self.svc.download_content(f, content_id=content_id)
+        assert data['bytes_written'] == len(content)
+        assert f.getvalue() == content
+
+    async def test_download_content_to_coro_function(self, api_base_url, file_content_headers):
+        content_id = 'content_id'
+        url = f'{api_base_url}/contents/{content_id}'
+        content = b'content' * 100
+        chunks = []
+
+        async def consume(chunk):
+            chunks.append(chunk)
+
+        with aioresponses() as m:
+            m.get(url, headers=file_content_headers, body=content)
+            data = await self.svc.download_content(consume, content_id=content_id, chunk_size=70)
+        assert data['bytes_written'] == len(content)
+        assert b''.join(chunks) == content
+        assert all(len(chunk) <= 70 for chunk in chunks)
+
+    async def test_download_content_raises_error_on_unsupported_destination(
+            self, api_base_url, file_content_headers):
+        content_id = 'content_id'
+        url = f'{api_base_url}/contents/{content_id}'
+        with aioresponses() as m, pytest.raises(TypeError):
+            m.get(url, headers=file_content_headers, body=b'content')
+            await self.svc.download_content(object(), content_id=content_id)
+
+    async def test_download_attachments(self, tmpdir, api_base_url, file_content_headers):
+        url1 = f'{api_base_url}/contents/content_id1'
+        url2 = f'{api_base_url}/contents/content_id2'
+        url3 = f'{api_base_url}/contents/content_id3'
+        store = aiociscospark.ContentStore(str(tmpdir.join('store')))
+        writer = store.open_writer()
+        writer.write(b'content3')
+        path3 = writer.commit(url3)
+
+        async def messages():
+            yield {'id': 'message1', 'files': [url1, url2]}, 'cursor'
+            yield {'id': 'message2', 'files': [url1, url3]}, 'cursor'
+            yield {'id': 'message3', 'text': 'text'}, 'cursor'
+
+        with aioresponses() as m, \
+             mock.patch.object(self.svc.http_client, 'get',
+                               side_effect=self.svc.http_client.get) as req_mock:  # noqa
+            m.get(url1, headers=file_content_headers, body=b'content1')
+            m.get(url2, headers=file_content_headers, body=b'content1')
+            manifest = await self.svc.download_attachments(messages(), store, concurrency=1)
+        assert req_mock.call_count == 2
+        path1 = store.get_path(url1)
+        assert path1 == store.get_path(url2)
+        assert manifest == {
+            'message1': [path1, path1],
+            'message2': [path1, path3],
+            'message3': [],
+        }
+        with open(path1, 'rb') as f:
+            assert f.read() == b'content1'
+
+    async def test_download_attachments_failures(self, tmpdir, api_base_url):
+        url1 = f'{api_base_url}/contents/content_id1'
+        url2 = f'{api_base_url}/contents/content_id2'
+        store = aiociscospark.ContentStore(str(tmpdir.join('store')))
+        url3 = f'{api_base_url}/contents/content_id3'
+        not_found_error = aiociscospark.SparkResponseError(
+            mock.Mock(status=404, reason='Not found'))
+        cancelled = []
+
+        async def download_content(writer, content_url, **kwargs):
+            if content_url == url2:
+                raise not_found_error
+            if content_url == url3:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.append(content_url)
+                    raise
+            writer.write(b'content1')
+            return {}
+
+        async def messages():
+            yield {'id': 'message1', 'files': [url1, url2]}
+
+        with mock.patch.object(self.svc, 'download_content', side_effect=download_content):
+            manifest = await self.svc.download_attachments(messages(), store)
+        assert manifest == {'message1': [store.get_path(url1), not_found_error]}
+        assert url1 in store
+
+        async def failing_messages():
+            yield {'id': 'message2', 'files': [url3]}
+            await asyncio.sleep(0)
+            raise ValueError('listing failed')
+
+        # Downloads that are running when listing fails are cancelled.
+        with mock.patch.object(self.svc, 'download_content', side_effect=download_content), \
+                pytest.raises(ValueError):
+            await self.svc.download_attachments(failing_messages(), store)
+        assert cancelled == [url3]
+        assert url3 not in store
+
+    async def test_download_content_ranged(self, tmpdir, api_base_url, file_content_headers):
+        content_id = 'content_id'
+        url = f'{api_base_url}/contents/{content_id}'
+        content = bytes(range(30))
+        file_content_headers['Content-Length'] = str(len(content))
+        path = str(tmpdir.join('file.bin'))
+        with aioresponses() as m:
+            m.head(url, headers=file_content_headers)
+            for start in range(0, len(content), 10):
+                m.get(url, status=206, body=content[start:start + 10])
+            data = await self.svc.download_content_ranged(path, content_id=content_id,
+                                                          part_size=10)
+        assert data['bytes_written'] == data['content_size'] == len(content)
+        with open(path, 'rb') as f:
+            assert f.read() == content
+        assert not tmpdir.join('file.bin.part.json').exists()
+
+    async def test_download_content_ranged_if_range_is_not_supported(self, tmpdir, api_base_url,
+                                                                     file_content_headers):
+        content_id = 'content_id'
+        url = f'{api_base_url}/contents/{content_id}'
+        content = bytes(range(30))
+        file_content_headers['Content-Length'] = str(len(content))
+        path = str(tmpdir.join('file.bin'))
+        with aioresponses() as m:
+            m.head(url, headers=file_content_headers)
+            m.get(url, status=200, body=content)
+            data = await self.svc.download_content_ranged(path, content_id=content_id,
+                                                          part_size=10)
+        assert data['bytes_written'] == len(content)
+        with open(path, 'rb') as f:
+            assert f.read() == content
+
+    async def test_download_content_ranged_resumes_download(self, tmpdir, api_base_url,
+                                                            file_content_headers):
+        content_id = 'content_id'
+        url = f'{api_base_url}/contents/{content_id}'
+        content = bytes(range(30))
+        file_content_headers['Content-Length'] = str(len(content))
+        path = str(tmpdir.join('file.bin'))
+        tmpdir.join('file.bin.part').write_binary(content[:20] + b'\x00' * 10)
+        tmpdir.join('file.bin.part.json').write(
+            json.dumps({'size': len(content), 'part_size': 10, 'completed': [0, 10]})
+        )
+        with aioresponses() as m:
+            m.head(url, headers=file_content_headers)
+            m.get(url, status=206, body=content[20:])
+            data = await self.svc.download_content_ranged(path, content_id=content_id,
+                                                          part_size=10)
+        assert data['bytes_written'] == 10
+        with open(path, 'rb') as f:
+            assert f.read() == content
+
+    async def test_download_content_ranged_raises_error_on_short_range(self, tmpdir, api_base_url,
+                                                                       file_content_headers):
+        content_id = 'content_id'
+        url = f'{api_base_url}/contents/{content_id}'
+        file_content_headers['Content-Length'] = '30'
+        path = str(tmpdir.join('file.bin'))
+        with aioresponses() as m, \
+             pytest.raises(aiociscospark.SparkContentDownloadError):  # noqa
+            m.head(url, headers=file_content_headers)
+            m.get(url, status=206, body=b'short')
+            await self.svc.download_content_ranged(path, content_id=content_id, part_size=10)
+
 
 class TestApiServiceLicenses(BaseTestApiService):
     svc_class = aiociscospark.services.ApiServiceLicenses
@@ -270,6 +599,46 @@ class TestApiServiceLicenses(BaseTestApiService):
 class TestApiServiceMessages(BaseTestApiService):
     svc_class = aiociscospark.services.ApiServiceMessages
 
+    def test_get_target_params(self, user_info, room_info):
+        assert self.svc.get_target_params('user@example.com') == {
+            'to_person_email': 'user@example.com'}
+        assert self.svc.get_target_params(user_info['id']) == {'to_person_id': user_info['id']}
+        assert self.svc.get_target_params(room_info['id']) == {'room_id': room_info['id']}
+        assert self.svc.get_target_params('not an id') == {'room_id': 'not an id'}
+        assert self.svc.get_target_params({'room_id': 'room'}) == {'room_id': 'room'}
+
+    async def test_broadcast(self, message_info):
+        rate_limit_error = aiociscospark.SparkRateLimitExceeded(
+            mock.Mock(status=429, reason='Too Many Requests', headers={}))
+        not_found_error = aiociscospark.SparkResponseError(
+            mock.Mock(status=404, reason='Not found', headers={}))
+        errors = {'user1@example.com': [rate_limit_error], 'user2@example.com': [not_found_error]}
+
+        async def create_message(to_person_email=None, **kwargs):
+            if errors.get(to_person_email):
+                raise errors[to_person_email].pop(0)
+            return message_info
+
+        targets = [f'user{i}@example.com' for i in range(5)]
+        stats = collections.Counter()
+        with mock.patch.object(self.svc, 'create_message',
+                               side_effect=create_message) as create_mock:
+            results = [result async for result in
+                       self.svc.broadcast(targets, text='Hello', concurrency=2, stats=stats)]
+        assert create_mock.call_count == 6
+        create_mock.assert_any_call(to_person_email='user0@example.com', text='Hello',
+                                    markdown=None, files=None)
+        results = {result['target']: result for result in results}
+        assert set(results) == set(targets)
+        assert results['user1@example.com']['attempts'] == 2
+        assert results['user1@example.com']['message'] == message_info
+        assert results['user2@example.com']['error'] is not_found_error
+        assert results['user2@example.com']['attempts'] == 1
+        assert stats['sent'] == 4
+        assert stats['failed'] == 1
+        assert stats['retried'] == 1
+        assert stats['rate_limited'] == 1
+
     async def test_list_messages(self, api_base_url, response_headers, messages_list, message_info):
         data = []
         kwargs = {'timeout': 300}
@@ -335,6 +704,89 @@ class TestApiServiceMessages(BaseTestApiService):
         req_mock.assert_called_once_with(message_id, **kwargs)
         assert resp.status == 204
 
+    async def test_create_message_with_file(self, tmpdir, api_base_url, message_info,
+                                            response_headers):
+        path = tmpdir.join('report.pdf')
+        path.write_binary(b'%PDF' * 100)
+        kwargs = {'timeout': 300}
+        with aioresponses() as m, \
+            mock.patch.object(self.svc.http_client, 'post',
+                              side_effect=self.svc.http_client.post) as req_mock:  # noqa
+            m.post(f'{api_base_url}/messages', headers=response_headers, payload=message_info)
+            data = await self.svc.create_message(room_id=message_info['roomId'],
+                                                 text=message_info['text'], file=str(path),
+                                                 **kwargs)
+        assert data == message_info
+        (url, ), call_kwargs = req_mock.call_args
+        body = call_kwargs['data']
+        assert url == f'{api_base_url}/messages'
+        assert call_kwargs['timeout'] == 300
+        assert call_kwargs['headers'] == {'Content-Type': body.content_type}
+        assert body.content_type.startswith('multipart/form-data')
+        payloads = [part[0] for part in body]
+        assert [p.headers['Content-Disposition'] for p in payloads] == [
+            'form-data; name="roomId"',
+            'form-data; name="text"',
+            'form-data; name="files"; filename="report.pdf"; filename*=utf-8\'\'report.pdf',
+        ]
+        assert payloads[-1].content_type == 'application/pdf'
+
+
+class TestFileUploadPayload:
+    class FakeWriter:
+        def __init__(self):
+            self.chunks = []
+
+        async def write(self, chunk):
+            self.chunks.append(chunk)
+
+    @pytest.mark.parametrize('source_type', ['path', 'file', 'buffer', 'mmap', 'async_iterable'])
+    async def test_write(self, tmpdir, source_type):
+        content = bytes(range(256)) * 4
+        path = tmpdir.join('file.bin')
+        path.write_binary(content)
+
+        async def aiter_content():
+            for i in range(0, len(content), 100):
+                yield content[i:i + 100]
+
+        def mmap_content():
+            with open(str(path), 'rb') as f:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        sources = {
+            'path': lambda: str(path),
+            'file': lambda: open(str(path), 'rb'),
+            'buffer': lambda: bytearray(content),
+            'mmap': mmap_content,
+            'async_iterable': aiter_content,
+        }
+        progress = []
+        payload = aiociscospark.services.messages.FileUploadPayload(
+            sources[source_type](), chunk_size=300, progress=lambda *args: progress.append(args)
+        )
+        writer = self.FakeWriter()
+        await payload.write(writer)
+        assert b''.join(writer.chunks) == content
+        expected_size = None if source_type == 'async_iterable' else len(content)
+        assert payload.size == expected_size
+        assert progress[-1] == (len(content), expected_size)
+        if source_type != 'async_iterable':
+            # The request may be retried.
+            writer = self.FakeWriter()
+            await payload.write(writer)
+            assert b''.join(writer.chunks) == content
+
+    async def test_write_replays_file_object(self, tmpdir):
+        path = tmpdir.join('file.bin')
+        path.write_binary(b'content')
+        with open(str(path), 'rb') as f:
+            payload = aiociscospark.services.messages.FileUploadPayload(f)
+            for _ in range(2):
+                writer = self.FakeWriter()
+                await payload.write(writer)
+                assert b''.join(writer.chunks) == b'content'
+
 
 class TestApiServiceOrganizations(BaseTestApiService):
     svc_class = aiociscospark.services.ApiServiceOrganizations
@@ -390,6 +842,20 @@ class TestApiServicePeople(BaseTestApiService):
         )
         assert data == people_list['items']
 
+    async def test_list_people_by_ids(self, api_base_url, response_headers, people_list):
+        data = []
+        kwargs = {'timeout': 300}
+        person_ids = [person['id'] for person in people_list['items']]
+        with aioresponses() as m, \
+             mock.patch.object(self.svc, 'get_items',
+                               side_effect=self.svc.get_items) as get_items_mock:  # noqa
+            m.get(f'{api_base_url}/people', headers=response_headers, payload=people_list)
+            async for item, cursor in self.svc.list_people_by_ids(person_ids, **kwargs):
+                data.append(item)
+        get_items_mock.assert_called_once_with({'id': ','.join(person_ids)}, paginate=True,
+                                               **kwargs)
+        assert data == people_list['items']
+
     async def test_get_person(self, api_base_url, response_headers, user_info):
         person_id = user_info['id']
         kwargs = {'timeout': 300}
@@ -517,6 +983,144 @@ class TestApiServiceRoles(BaseTestApiService):
 class TestApiServiceRoomMemberships(BaseTestApiService):
     svc_class = aiociscospark.services.ApiServiceRoomMemberships
 
+    @staticmethod
+    def _list_memberships(memberships):
+        async def list_memberships(**kwargs):
+            for membership in memberships:
+                yield membership, None
+        return list_memberships
+
+    async def test_bulk_add_members(self, room_memberships_list):
+        memberships = room_memberships_list['items']
+        room_id = memberships[0]['roomId']
+        conflict_error = aiociscospark.SparkResponseError(mock.Mock(status=409, reason='Conflict'))
+        bad_request_error = aiociscospark.SparkResponseError(mock.Mock(status=400, reason='Bad'))
+        rate_limit_error = aiociscospark.SparkRateLimitExceeded(
+            mock.Mock(status=429, reason='Too Many Requests', headers={'Retry-After': '0'}))
+        errors = {'conflict@example.com': [conflict_error], 'bad@example.com': [bad_request_error],
+                  'limited@example.com': [rate_limit_error]}
+
+        async def create_membership(person_email=None, person_id=None, **kwargs):
+            if errors.get(person_email):
+                raise errors[person_email].pop(0)
+            return {'personEmail': person_email, 'personId': person_id}
+
+        people = [memberships[0]['personEmail'].upper(), memberships[1]['personId'],
+                  'new@example.com', 'new@example.com', 'conflict@example.com',
+                  'bad@example.com', 'limited@example.com']
+        with mock.patch.object(self.svc, 'list_memberships',
+                               side_effect=self._list_memberships(memberships)) as list_mock, \
+                mock.patch.object(self.svc, 'create_membership',
+                                  side_effect=create_membership) as create_mock:
+            report = await self.svc.bulk_add_members(room_id, people, concurrency=2)
+        list_mock.assert_called_once_with(room_id=room_id)
+        create_mock.assert_any_call(room_id=room_id, is_moderator=None,
+                                    person_email='new@example.com')
+        assert create_mock.call_count == 5
+        assert report['created'] == [{'personEmail': 'new@example.com', 'personId': None},
+                                     {'personEmail': 'limited@example.com', 'personId': None}]
+        assert report['duplicates'] == people[:2] + ['new@example.com', 'conflict@example.com']
+        assert report['failed'] == [('bad@example.com', bad_request_error)]
+
+    def test_diff_memberships(self):
+        memberships = [
+            {'id': '1', 'personId': 'p1', 'personEmail': 'one@example.com'},
+            {'id': '2', 'personId': 'p2', 'personEmail': 'two@example.com'},
+        ]
+        people = ['ONE@example.com', 'p1', 'three@example.com', 'three@example.com']
+        plan = self.svc.diff_memberships(people, memberships)
+        assert plan == {'create': ['three@example.com'], 'delete': [memberships[1]],
+                        'unchanged': [memberships[0]]}
+        plan = self.svc.diff_memberships(people, memberships, prune=False)
+        assert plan['delete'] == []
+        assert plan['unchanged'] == memberships
+        plan = self.svc.diff_memberships(people, memberships, keep=['TWO@example.com'])
+        assert plan['delete'] == []
+        assert plan['unchanged'] == memberships
+
+    async def test_reconcile_memberships(self):
+        current = {
+            'room1': [{'id': '1', 'roomId': 'room1', 'personId': 'p1',
+                       'personEmail': 'one@example.com'},
+                      {'id': '2', 'roomId': 'room1', 'personId': 'p2',
+                       'personEmail': 'two@example.com'},
+                      {'id': '3', 'roomId': 'room1', 'personId': 'bot',
+                       'personEmail': 'bot@example.com'}],
+            'room2': [],
+        }
+        desired = {
+            'room1': ['one@example.com', 'three@example.com'],
+            'room2': ['p1', 'bad@example.com'],
+            'room3': ['p1'],
+        }
+        bad_request_error = aiociscospark.SparkResponseError(mock.Mock(status=400, reason='Bad'))
+        not_found_error = aiociscospark.SparkResponseError(
+            mock.Mock(status=404, reason='Not found'))
+
+        async def list_memberships(room_id=None, **kwargs):
+            if room_id not in current:
+                raise not_found_error
+            for membership in current[room_id]:
+                yield membership, None
+
+        async def create_membership(room_id=None, person_id=None, person_email=None, **kwargs):
+            if person_email == 'bad@example.com':
+                raise bad_request_error
+            return {'roomId': room_id, 'personId': person_id, 'personEmail': person_email}
+
+        async def delete_membership(membership_id, **kwargs):
+            pass
+
+        async def me(**kwargs):
+            return {'id': 'bot', 'emails': ['bot@example.com']}
+
+        with mock.patch.object(aiociscospark.services.ApiServicePeople, 'me', side_effect=me), \
+                mock.patch.object(self.svc, 'list_memberships', side_effect=list_memberships), \
+                mock.patch.object(self.svc, 'create_membership',
+                                  side_effect=create_membership) as create_mock, \
+                mock.patch.object(self.svc, 'delete_membership',
+                                  side_effect=delete_membership) as delete_mock:
+            plan = await self.svc.reconcile_memberships(desired, dry_run=True)
+            assert create_mock.call_count == delete_mock.call_count == 0
+            assert plan['room1']['created'] == ['three@example.com']
+            assert plan['room1']['deleted'] == [current['room1'][1]]
+            report = await self.svc.reconcile_memberships(desired, concurrency=2)
+        assert report['room1'] == {
+            'created': [{'roomId': 'room1', 'personId': None,
+                         'personEmail': 'three@example.com'}],
+            'deleted': [current['room1'][1]],
+            # Membership of the authenticated person is kept.
+            'unchanged': [current['room1'][0], current['room1'][2]],
+            'failed': [],
+        }
+        assert report['room2']['created'] == [{'roomId': 'room2', 'personId': 'p1',
+                                               'personEmail': None}]
+        assert report['room2']['failed'] == [('create', 'bad@example.com', bad_request_error)]
+        assert report['room3']['failed'] == [('list', None, not_found_error)]
+        delete_mock.assert_called_once_with('2')
+
+    async def test_bulk_remove_members(self, room_memberships_list):
+        memberships = room_memberships_list['items']
+        room_id = memberships[0]['roomId']
+        not_found_error = aiociscospark.SparkResponseError(
+            mock.Mock(status=404, reason='Not found'))
+
+        async def delete_membership(membership_id, **kwargs):
+            if membership_id == memberships[1]['id']:
+                raise not_found_error
+
+        people = [memberships[0]['personEmail'], memberships[0]['personId'],
+                  memberships[1]['personId'], 'unknown@example.com']
+        with mock.patch.object(self.svc, 'list_memberships',
+                               side_effect=self._list_memberships(memberships)), \
+                mock.patch.object(self.svc, 'delete_membership',
+                                  side_effect=delete_membership) as delete_mock:
+            report = await self.svc.bulk_remove_members(room_id, people)
+        assert delete_mock.call_count == 2
+        assert report['deleted'] == [memberships[0]]
+        assert report['missing'] == [people[1], people[3], people[2]]
+        assert report['failed'] == []
+
     async def test_list_memberships(self, api_base_url, response_headers, room_memberships_list):
         data = []
         kwargs = {'timeout': 300}
@@ -666,6 +1270,29 @@ class TestApiServiceRooms(BaseTestApiService):
 class TestApiServiceTeamMemberships(BaseTestApiService):
     svc_class = aiociscospark.services.ApiServiceTeamMemberships
 
+    async def test_bulk_update_moderators(self, team_memberships_list):
+        memberships = team_memberships_list['items']
+        team_id = memberships[0]['teamId']
+
+        async def list_memberships(**kwargs):
+            for membership in memberships:
+                yield membership, None
+
+        async def update_membership(membership_id, is_moderator=None, **kwargs):
+            return {'id': membership_id, 'isModerator': is_moderator}
+
+        people = [membership['personId'] for membership in memberships] + ['unknown@example.com']
+        with mock.patch.object(self.svc, 'list_memberships',
+                               side_effect=list_memberships) as list_mock, \
+                mock.patch.object(self.svc, 'update_membership', side_effect=update_membership):
+            report = await self.svc.bulk_update_moderators(team_id, people, is_moderator=True)
+        list_mock.assert_called_once_with(team_id=team_id)
+        assert report['updated'] == [{'id': m['id'], 'isModerator': True}
+                                     for m in memberships if not m.get('isModerator')]
+        assert report['unchanged'] == [m for m in memberships if m.get('isModerator')]
+        assert report['missing'] == ['unknown@example.com']
+        assert report['failed'] == []
+
     async def test_list_memberships(self, api_base_url, response_headers, team_memberships_list):
         data = []
         kwargs = {'timeout': 300}
@@ -877,6 +1504,16 @@ class TestApiServiceWebhooks(BaseTestApiService):
                                          data={'name': 'New name', 'targetUrl': None}, **kwargs)
         assert data == webhook_info
 
+    async def test_update_webhook_secret_and_status(self):
+        async def put(webhook_id, data=None, **kwargs):
+            return data
+
+        with mock.patch.object(self.svc, 'put', side_effect=put):
+            data = await self.svc.update_webhook('id', name='name', target_url='url',
+                                                 secret='secret', status='active')
+        assert data == {'name': 'name', 'targetUrl': 'url', 'secret': 'secret',
+                        'status': 'active'}
+
     async def test_delete_webhook(self, api_base_url, webhook_info, response_headers):
         webhook_id = webhook_info['id']
         kwargs = {'timeout': 300}
@@ -887,3 +1524,85 @@ class TestApiServiceWebhooks(BaseTestApiService):
             resp = await self.svc.delete_webhook(webhook_id, **kwargs)
         req_mock.assert_called_once_with(webhook_id, **kwargs)
         assert resp.status == 204
+
+    def test_diff_webhooks(self):
+        current = [
+            {'id': '1', 'name': 'a', 'targetUrl': 'url', 'resource': 'messages', 'event': 'all'},
+            {'id': '2', 'name': 'b', 'targetUrl': 'old', 'resource': 'rooms', 'event': 'all'},
+            {'id': '3', 'name': 'c', 'targetUrl': 'url', 'resource': 'rooms', 'event': 'all'},
+            {'id': '4', 'name': 'a', 'targetUrl': 'url', 'resource': 'messages', 'event': 'all'},
+            {'id': '5', 'name': 'e', 'targetUrl': 'url', 'resource': 'rooms', 'event': 'all',
+             'secret': 'old', 'status': 'active'},
+            {'id': '6', 'name': 'f', 'targetUrl': 'url', 'resource': 'rooms', 'event': 'all',
+             'status': 'disabled'},
+        ]
+        desired = [
+            {'name': 'a', 'targetUrl': 'url', 'resource': 'messages', 'event': 'all'},
+            {'name': 'b', 'targetUrl': 'new', 'resource': 'rooms', 'event': 'all'},
+            {'name': 'd', 'targetUrl': 'url', 'resource': 'memberships', 'event': 'all'},
+            {'name': 'e', 'targetUrl': 'url', 'resource': 'rooms', 'event': 'all',
+             'secret': 'new'},
+            {'name': 'f', 'targetUrl': 'url', 'resource': 'rooms', 'event': 'all'},
+        ]
+        plan = self.svc.diff_webhooks(desired, current)
+        assert plan == {
+            'create': [desired[2]],
+            'update': [(current[1], desired[1]), (current[4], desired[3]),
+                       (current[5], desired[4])],
+            'delete': [current[3], current[2]],
+            'unchanged': [current[0]],
+        }
+        plan = self.svc.diff_webhooks(desired, current, prune=False)
+        assert plan['delete'] == [current[3]]
+        assert plan['unchanged'] == [current[0], current[2]]
+        # The secret is compared only if it is desired.
+        plan = self.svc.diff_webhooks([dict(desired[3], secret=None)], current[4:5])
+        assert plan['unchanged'] == current[4:5]
+
+    async def test_reconcile(self):
+        current = [
+            {'id': '1', 'name': 'a', 'targetUrl': 'old', 'resource': 'rooms', 'event': 'all'},
+            {'id': '2', 'name': 'b', 'targetUrl': 'url', 'resource': 'rooms', 'event': 'all'},
+            {'id': '3', 'name': 'c', 'targetUrl': 'url', 'resource': 'rooms', 'event': 'all'},
+        ]
+        desired = [
+            {'name': 'a', 'targetUrl': 'new', 'resource': 'rooms', 'event': 'all'},
+            {'name': 'd', 'targetUrl': 'url', 'resource': 'messages', 'event': 'all'},
+            {'name': 'e', 'targetUrl': 'url', 'resource': 'messages', 'event': 'all'},
+        ]
+
+        async def list_webhooks(**kwargs):
+            for webhook in current:
+                yield webhook, None
+
+        async def create_webhook(name=None, **kwargs):
+            if name == 'e':
+                raise aiociscospark.SparkResponseError(mock.Mock(status=400, reason='Bad'))
+            return {'id': name, 'name': name}
+
+        async def update_webhook(webhook_id, name=None, target_url=None, status=None, **kwargs):
+            return {'id': webhook_id, 'name': name, 'targetUrl': target_url, 'status': status}
+
+        async def delete_webhook(webhook_id, **kwargs):
+            pass
+
+        with mock.patch.object(self.svc, 'list_webhooks', side_effect=list_webhooks), \
+             mock.patch.object(self.svc, 'create_webhook', side_effect=create_webhook), \
+             mock.patch.object(self.svc, 'update_webhook', side_effect=update_webhook), \
+             mock.patch.object(self.svc, 'delete_webhook',
+                               side_effect=delete_webhook) as delete_mock:  # noqa
+            report = await self.svc.reconcile(desired, dry_run=True)
+            assert delete_mock.call_count == 0
+            assert report['created'] == desired[1:]
+            assert report['updated'] == desired[:1]
+            assert report['deleted'] == current[1:]
+
+            report = await self.svc.reconcile(desired, concurrency=2, timeout=300)
+        assert report['created'] == [{'id': 'd', 'name': 'd'}]
+        assert report['updated'] == [{'id': '1', 'name': 'a', 'targetUrl': 'new',
+                                      'status': 'active'}]
+        assert sorted(webhook['id'] for webhook in report['deleted']) == ['2', '3']
+        assert report['unchanged'] == []
+        assert [(action, webhook) for action, webhook, _ in report['failed']] == \
+            [('create', desired[2])]
+        delete_mock.assert_any_call('2', timeout=300)
@@ -0,0 +1,53 @@
+import hashlib
+
+import pytest
+
+from .context import aiociscospark
+
+
+class TestContentStore:
+    @pytest.fixture(scope='function', autouse=True)
+    def setup(self, tmpdir):
+        self.root = str(tmpdir.join('store'))
+        self.store = aiociscospark.ContentStore(self.root)
+
+    def _store_content(self, content_url, content, store=None):
+        writer = (store or self.store).open_writer()
+        writer.write(content)
+        return writer.commit(content_url, {'content_name': 'file.txt'})
+
+    def test_commit(self):
+        path = self._store_content('url1', b'content')
+        digest = hashlib.sha256(b'content').hexdigest()
+        assert path == self.store.get_hash_path(digest)
+        assert path.endswith(f'objects/{digest[:2]}/{digest}')
+        with open(path, 'rb') as f:
+            assert f.read() == b'content'
+        assert self.store.get_path('url1') == path
+        assert self.store.get_info('url1') == {
+            'content_name': 'file.txt', 'url': 'url1', 'sha256': digest
+        }
+        assert self.store.has_hash(digest)
+        assert 'url1' in self.store
+        assert 'url2' not in self.store
+
+    def test_same_content_is_stored_once(self):
+        path1 = self._store_content('url1', b'content')
+        path2 = self._store_content('url2', b'content')
+        assert path1 == path2
+        assert len(self.store) == 2
+
+    def test_discard(self, tmpdir):
+        writer = self.store.open_writer()
+        writer.write(b'content')
+        writer.discard()
+        assert tmpdir.join('store', 'tmp').listdir() == []
+        assert len(self.store) == 0
+
+    def test_index_is_loaded(self):
+        path = self._store_content('url1', b'content')
+        with open(self.store.index_path, 'a') as f:
+            f.write('{"url": "trunc')
+        store = aiociscospark.ContentStore(self.root)
+        assert store.get_path('url1') == path
+        assert len(store) == 1
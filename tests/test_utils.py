@@ -87,3 +87,14 @@ def test_refresh_access_token(client_id, client_secret, refresh_token):
 def test_refresh_access_token_raises_config_error(client_secret, refresh_token):
     with pytest.raises(ValueError):
         aiociscospark.utils.refresh_access_token(None, client_secret, refresh_token)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('30', 30),
+    ('-1', 0),
+    ('Wed, 21 Oct 2015 07:28:00 GMT', 0),
+    ('soon', 5),
+    (None, 5),
+])
+def test_parse_retry_after(value, expected):
+    assert aiociscospark.utils._parse_retry_after(value, 5) == expected